@@ -20,20 +20,26 @@
 #
 
 import logging
-
-from archimedes.clients.dashboard import (DASHBOARD,
-                                          INDEX_PATTERN,
-                                          SEARCH,
-                                          VISUALIZATION)
+import threading
+
+from archimedes.clients.common import (DASHBOARD,
+                                       INDEX_PATTERN,
+                                       MAX_PAYLOAD_BYTES,
+                                       SEARCH,
+                                       VISUALIZATION,
+                                       ImportReport)
 from archimedes.errors import (DataExportError,
                                DataImportError,
                                ObjectTypeError)
-from archimedes.kibana import Kibana
 from archimedes.kibana_obj_meta import KibanaObjMeta
 from archimedes.manager import Manager
 from archimedes.registry import Registry
+from archimedes.spans import timed
 from archimedes.utils import load_json
 
+IMPORT_ORDER = [INDEX_PATTERN, SEARCH, VISUALIZATION, DASHBOARD]
+IMPORT_BATCH_SIZE = 100
+
 logger = logging.getLogger(__name__)
 
 
@@ -46,14 +52,80 @@ class Archimedes:
     Archimedes provides also a registry, in charge of managing the metadata of Kibana objects to which
     the user can assign aliases to simply import and export operations of the corresponding objects.
 
+    The Kibana client, the manager and the registry are created the first time they
+    are used, thus each operation initializes only the components it needs (e.g., listing
+    the objects on disk does not open any connection to Kibana).
+
     ::param url: the Kibana URL
     :param root_path: the folder where visualizations, searches and index patterns are stored
+    :param max_payload_bytes: maximum size of the body of the import requests sent to Kibana
+    :param cassette: Cassette object recording or replaying the requests sent to Kibana
+    :param inventory: Inventory object caching the objects stored in Kibana
+    :param include: glob patterns of other folders storing object files in `root_path`
+    :param exclude: glob patterns of the files and folders in `root_path` to skip
     """
-    def __init__(self, url, root_path):
-        self.kibana = Kibana(url)
-        self.manager = Manager(root_path)
-        self.registry = Registry(root_path)
-
+    def __init__(self, url, root_path, max_payload_bytes=MAX_PAYLOAD_BYTES, cassette=None, inventory=None,
+                 include=None, exclude=None):
+        self.url = url
+        self.root_path = root_path
+        self.include = include
+        self.exclude = exclude
+        self.max_payload_bytes = max_payload_bytes
+        self.cassette = cassette
+        self.inventory = inventory
+        self._kibana = None
+        self._manager = None
+        self._registry = None
+        self._lock = threading.Lock()
+
+    @property
+    def kibana(self):
+        """Kibana client, created on first use."""
+
+        if self._kibana is None:
+            with self._lock:
+                if self._kibana is None:
+                    from archimedes.kibana import Kibana
+                    self._kibana = Kibana(self.url, max_payload_bytes=self.max_payload_bytes,
+                                          cassette=self.cassette, inventory=self.inventory)
+
+        return self._kibana
+
+    @kibana.setter
+    def kibana(self, kibana):
+        self._kibana = kibana
+
+    @property
+    def manager(self):
+        """Manager of the objects on disk, created on first use."""
+
+        if self._manager is None:
+            with self._lock:
+                if self._manager is None:
+                    self._manager = Manager(self.root_path, include=self.include, exclude=self.exclude)
+
+        return self._manager
+
+    @manager.setter
+    def manager(self, manager):
+        self._manager = manager
+
+    @property
+    def registry(self):
+        """Registry of aliases, created (and loaded from disk) on first use."""
+
+        if self._registry is None:
+            with self._lock:
+                if self._registry is None:
+                    self._registry = Registry(self.root_path)
+
+        return self._registry
+
+    @registry.setter
+    def registry(self, registry):
+        self._registry = registry
+
+    @timed('archimedes.import_from_disk')
     def import_from_disk(self, obj_type=None, obj_id=None, obj_title=None, obj_alias=None, find=False, force=False):
         """Import Kibana objects stored on disk.
 
@@ -71,6 +143,8 @@ class Archimedes:
         :param find: find the objects referenced in the file
 
         :param force: overwrite any existing objects on ID conflict
+
+        :returns: an ImportReport object
         """
         if obj_alias:
             alias, meta = self.registry.find(obj_alias)
@@ -98,12 +172,11 @@ class Archimedes:
 
         if not json_content:
             logger.warning("File %s is empty", file_path)
-            return
+            return ImportReport()
 
         if not find:
             logger.info("Do not find related files")
-            self.__import_objects([file_path], force)
-            return
+            return self.__import_objects([file_path], force)
 
         if target_obj_type == DASHBOARD:
             files = self.manager.find_dashboard_files(file_path)
@@ -120,8 +193,50 @@ class Archimedes:
             logger.error(cause)
             raise ObjectTypeError(cause=cause)
 
-        self.__import_objects(files, force=force)
+        return self.__import_objects(files, force=force)
+
+    @timed('archimedes.import_all')
+    def import_all(self, force=False, batch_size=IMPORT_BATCH_SIZE):
+        """Import all Kibana objects stored on disk.
+
+        This method walks once the folder of the `manager` and imports the objects found
+        to Kibana in batches of at most `batch_size` objects. The objects are imported
+        following the order of their dependencies (i.e., index patterns, searches,
+        visualizations and dashboards), thus the objects referenced by a batch are always
+        imported before it. The size of the requests is bounded by the Kibana client,
+        which splits the batches exceeding its payload limit.
+
+        The method can overwrite previous versions of existing objects by setting
+        the parameter `force` to True. Otherwise, the objects already in Kibana are
+        skipped without being uploaded.
+
+        :param force: overwrite any existing objects on ID conflict
+        :param batch_size: maximum number of objects per import request
 
+        :returns: an ImportReport object
+        """
+        obj_paths = {obj_type: [] for obj_type in IMPORT_ORDER}
+        for obj_type, obj_path in self.manager.find_files():
+            obj_paths[obj_type].append(obj_path)
+
+        report = ImportReport()
+        for obj_type in IMPORT_ORDER:
+            for batch in self.__load_batches(obj_paths[obj_type], batch_size):
+                if not force:
+                    existing = self.__find_existing(batch)
+                    report.skipped.extend([obj for obj in batch if (obj['type'], obj['id']) in existing])
+                    batch = [obj for obj in batch if (obj['type'], obj['id']) not in existing]
+                    if not batch:
+                        continue
+
+                logger.info("Importing batch of %s %s objects", len(batch), obj_type)
+                batch_report = self.kibana.import_objects({'objects': batch}, force)
+                report.update(batch_report)
+
+        logger.info("Import completed, %s/%s object(s) imported", len(report.imported), report.total)
+        return report
+
+    @timed('archimedes.export_to_disk')
     def export_to_disk(self, obj_type=None, obj_id=None, obj_title=None, obj_alias=None, force=False, index_pattern=False):
         """Export Kibana objects stored in a Kibana instance to disk.
 
@@ -275,8 +390,13 @@ class Archimedes:
 
         :param obj_paths: target object paths
         :param force: overwrite any existing objects on ID conflict
+
+        :returns: an ImportReport object
         """
+        report = ImportReport()
         logger.info("Importing %s objects", len(obj_paths))
+
+        contents = []
         for obj_path in obj_paths:
             json_content = load_json(obj_path)
 
@@ -289,8 +409,25 @@ class Archimedes:
             else:
                 objects = json_content
 
+            contents.append((obj_path, objects))
+
+        existing = set()
+        if not force:
+            existing = self.__find_existing([obj for _, objects in contents for obj in objects['objects']])
+
+        for obj_path, objects in contents:
+            if existing:
+                objs = [obj for obj in objects['objects'] if (obj['type'], obj['id']) not in existing]
+                report.skipped.extend([obj for obj in objects['objects'] if (obj['type'], obj['id']) in existing])
+                if not objs:
+                    logger.info("Skipping %s, objects already in Kibana", obj_path)
+                    continue
+                objects = dict(objects, objects=objs)
+
             logger.info("Importing %s", obj_path)
-            self.kibana.import_objects(objects, force)
+            report.update(self.kibana.import_objects(objects, force))
+
+        return report
 
     def __export_objects(self, data, force, index_pattern=False):
         """Export Kibana objects to disk.
@@ -311,15 +448,62 @@ class Archimedes:
         else:
             objs = data['objects']
 
+        # index patterns already exported (e.g., included in the references of a dashboard)
+        exported_ids = {obj['id'] for obj in objs if obj['type'] == INDEX_PATTERN}
+
         logger.info("Exporting objects")
         for obj in objs:
             self.manager.save_obj(obj, force)
 
-            if index_pattern:
-                logger.info("Retrieving and exporting index pattern too")
+            if index_pattern and obj['type'] != INDEX_PATTERN:
                 index_pattern_id = self.manager.find_index_pattern(obj)
+                if not index_pattern_id or index_pattern_id in exported_ids:
+                    continue
+
+                logger.info("Retrieving and exporting index pattern too")
                 index_pattern_obj = self.kibana.find_by_id(INDEX_PATTERN, index_pattern_id)
                 self.manager.save_obj(index_pattern_obj, force)
+                exported_ids.add(index_pattern_id)
+
+    def __find_existing(self, objs):
+        """Return the type and ID of the objects already stored in Kibana.
+
+        :param objs: list of Kibana objects
+
+        :returns a set of tuples composed by the type and ID of the existing objects
+        """
+        existing = self.kibana.find_existing(objs)
+
+        for obj_type, obj_id in existing:
+            logger.info("%s with id %s already in Kibana, it won't be imported", obj_type, obj_id)
+
+        return existing
+
+    def __load_batches(self, obj_paths, batch_size):
+        """Load the objects stored in a list of files and group them in batches.
+
+        :param obj_paths: paths of the files to load
+        :param batch_size: maximum number of objects per batch
+
+        :returns a generator of lists of Kibana objects
+        """
+        batch = []
+
+        for obj_path in obj_paths:
+            json_content = load_json(obj_path)
+            if not json_content:
+                logger.warning("No objects in %s", obj_path)
+                continue
+
+            objs = json_content['objects'] if 'objects' in json_content else [json_content]
+            for obj in objs:
+                batch.append(obj)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+
+        if batch:
+            yield batch
 
     def __find_remote_objs(self):
         """Return the meta information of the Kibana objects stored in Kibana."""
@@ -331,6 +515,6 @@ class Archimedes:
     def __find_local_objs(self):
         """Return the meta information of the Kibana objects stored on disk."""
 
-        for path, obj in self.manager.find_all():
+        for path, obj in self.manager.find_all(meta_only=True):
             meta_obj = KibanaObjMeta.create_from_obj(obj)
             yield meta_obj
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import collections
+import concurrent.futures
+import json
+import logging
+import threading
+import time
+
+from archimedes.clients.common import INDEX_PATTERN
+from archimedes.errors import BatchError
+
+IMPORT = 'import'
+EXPORT = 'export'
+INSPECT = 'inspect'
+REGISTRY = 'registry'
+OPERATIONS = [IMPORT, EXPORT, INSPECT, REGISTRY]
+
+SHOW = 'show'
+UPDATE = 'update'
+POPULATE = 'populate'
+CLEAR = 'clear'
+DELETE = 'delete'
+REGISTRY_ACTIONS = [SHOW, UPDATE, POPULATE, CLEAR, DELETE]
+
+OK = 'ok'
+ERROR = 'error'
+
+logger = logging.getLogger(__name__)
+
+
+class Batch:
+    """Batch class.
+
+    This class executes many Archimedes operations within the same process,
+    thus they share the HTTP connection pools to Kibana, the files already
+    located on disk and the registry. Each operation is a dict (or a JSON
+    line) with the key `op` set to `import`, `export`, `inspect` or
+    `registry`, and the same parameters of the command line, for instance:
+
+        {"op": "import", "obj_type": "dashboard", "obj_id": "...", "find": true, "force": true}
+        {"op": "export", "obj_alias": "12", "index_pattern": true}
+        {"op": "inspect", "local": true}
+        {"op": "registry", "action": "update", "alias": "1", "new_alias": "git"}
+
+    The operations are executed by `workers` threads. The results are returned in
+    the order of the operations; the operations on the registry are never run
+    concurrently, neither with each other nor with the resolution of the aliases
+    targeted by imports and exports.
+
+    :param archimedes: Archimedes object executing the operations
+    :param workers: number of operations executed concurrently
+    """
+    def __init__(self, archimedes, workers=1):
+        self.archimedes = archimedes
+        self.workers = max(workers, 1)
+        self.registry_lock = threading.Lock()
+
+    def run(self, lines):
+        """Execute the operations encoded as JSON lines.
+
+        Empty lines and lines starting with `#` are skipped. The lines are consumed
+        while the operations are executed, thus they can be read from a stream.
+
+        :param lines: an iterable of JSON lines
+
+        :returns a generator of results, one per operation
+        """
+        operations = ((number, line) for number, line in enumerate(lines, start=1)
+                      if line.strip() and not line.lstrip().startswith('#'))
+
+        if self.workers == 1:
+            for number, line in operations:
+                yield self.run_line(line, number)
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = collections.deque()
+            for number, line in operations:
+                pending.append(executor.submit(self.run_line, line, number))
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def execute(self, operation):
+        """Execute a single operation.
+
+        A `BatchError` is thrown if the operation is not valid. Any other error
+        raised by Archimedes is propagated.
+
+        :param operation: dict with the name and the parameters of the operation
+
+        :returns the result of the operation, which can be encoded as JSON
+        """
+        op = operation.get('op')
+
+        if op == IMPORT:
+            self.__check_target(operation)
+            if operation.get('obj_alias'):
+                operation = self.__resolve_alias(operation)
+
+            report = self.archimedes.import_from_disk(obj_type=operation.get('obj_type'),
+                                                      obj_id=operation.get('obj_id'),
+                                                      obj_title=operation.get('obj_title'),
+                                                      obj_alias=operation.get('obj_alias'),
+                                                      find=operation.get('find', False),
+                                                      force=operation.get('force', False))
+            return {
+                'imported': len(report.imported),
+                'conflicts': len(report.conflicts),
+                'errors': len(report.errors),
+                'skipped': len(report.skipped)
+            }
+        elif op == EXPORT:
+            self.__check_target(operation)
+            if operation.get('obj_type') == INDEX_PATTERN and operation.get('index_pattern'):
+                self.__fail("Export index_pattern param is not valid for index-pattern objects")
+            if operation.get('obj_alias') and not operation.get('obj_id') and not operation.get('obj_title'):
+                operation = self.__resolve_alias(operation)
+
+            self.archimedes.export_to_disk(obj_type=operation.get('obj_type'),
+                                           obj_id=operation.get('obj_id'),
+                                           obj_title=operation.get('obj_title'),
+                                           obj_alias=operation.get('obj_alias'),
+                                           force=operation.get('force', False),
+                                           index_pattern=operation.get('index_pattern', False))
+            return None
+        elif op == INSPECT:
+            local = operation.get('local', False)
+            remote = operation.get('remote', False)
+            if local == remote:
+                self.__fail("Inspect requires local or remote")
+
+            return [meta.to_dict() for meta in self.archimedes.inspect(local=local, remote=remote)]
+        elif op == REGISTRY:
+            with self.registry_lock:
+                return self.__registry(operation)
+        else:
+            self.__fail("Unknown operation %s" % op)
+
+    def run_line(self, line, number=None):
+        """Execute an operation encoded as a JSON line.
+
+        Any error is reported in the result, which includes the status of the
+        operation, its result or error message and the time it took.
+
+        :param line: JSON line encoding the operation
+        :param number: number of the line, included in the result when set
+
+        :returns a dict with the result of the operation
+        """
+        start = time.perf_counter()
+        result = {} if number is None else {'line': number}
+
+        try:
+            operation = json.loads(line)
+            if not isinstance(operation, dict):
+                self.__fail("Operation must be a JSON object")
+
+            result['op'] = operation.get('op')
+            if 'id' in operation:
+                result['id'] = operation['id']
+
+            result['result'] = self.execute(operation)
+            result['status'] = OK
+        except Exception as error:
+            logger.debug("Operation %s failed", line, exc_info=True)
+            result['status'] = ERROR
+            result['error'] = str(error) or error.__class__.__name__
+
+        result['time'] = time.perf_counter() - start
+
+        return result
+
+    def __registry(self, operation):
+        action = operation.get('action')
+        alias = operation.get('alias')
+
+        if action == SHOW:
+            if alias:
+                alias, meta = self.archimedes.query_registry(alias)
+                return {alias: meta.to_dict()}
+
+            return {alias: meta.to_dict() for alias, meta in self.archimedes.list_registry(operation.get('obj_type'))}
+        elif action == UPDATE:
+            if not alias or not operation.get('new_alias'):
+                self.__fail("Update on registry requires alias and new_alias")
+            self.archimedes.update_registry(alias, operation['new_alias'])
+        elif action == POPULATE:
+            self.archimedes.populate_registry(operation.get('force', False))
+        elif action == CLEAR:
+            self.archimedes.clear_registry()
+        elif action == DELETE:
+            if not alias:
+                self.__fail("Delete on registry requires alias")
+            self.archimedes.delete_registry(alias)
+        else:
+            self.__fail("Unknown registry action %s" % action)
+
+        return None
+
+    def __resolve_alias(self, operation):
+        """Replace the alias of the target object of an operation with its type and ID.
+
+        The alias is read while holding `registry_lock`, thus it is never resolved
+        while an operation on the registry is modifying it.
+
+        :param operation: dict with the name and the parameters of the operation
+
+        :returns a copy of the operation targeting the object by type and ID
+        """
+        with self.registry_lock:
+            _, meta = self.archimedes.query_registry(operation['obj_alias'])
+
+        return dict(operation, obj_type=meta.type, obj_id=meta.id, obj_title=None, obj_alias=None)
+
+    def __check_target(self, operation):
+        if not operation.get('obj_type') and not operation.get('obj_alias'):
+            self.__fail("Import/Export by ID or title requires obj_type")
+
+        if not operation.get('obj_id') and not operation.get('obj_title') and not operation.get('obj_alias'):
+            self.__fail("Import/Export requires obj_id, obj_title or obj_alias")
+
+    @staticmethod
+    def __fail(cause):
+        logger.error(cause)
+        raise BatchError(cause=cause)
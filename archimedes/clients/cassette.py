@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import base64
+import collections
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import urllib.parse
+
+import requests
+
+from archimedes.errors import CassetteError
+
+RECORD = 'record'
+REPLAY = 'replay'
+CASSETTE_MODES = [RECORD, REPLAY]
+
+# replay each response after the time it took when it was recorded
+RECORDED_LATENCY = 'recorded'
+
+CASSETTE_VERSION = 1
+
+# headers not valid for a body stored already decoded
+SKIP_RESPONSE_HEADERS = ['content-encoding', 'content-length', 'transfer-encoding', 'connection']
+
+logger = logging.getLogger(__name__)
+
+
+class Cassette:
+    """Cassette class.
+
+    This class records the HTTP interactions with Kibana to a file and
+    replays them later, without a Kibana instance. In `record` mode the
+    requests are sent to Kibana and their responses are stored together
+    with the time they took; in `replay` mode the responses are served
+    from the file, optionally delayed by a fixed `latency` in seconds or
+    by the recorded one (`recorded`), which allows to run the same
+    operations offline and compare their performance.
+
+    Interactions are matched by method, URL and a hash of the body of
+    the request. Credentials in the URLs and the request headers are
+    never stored.
+
+    :param path: path of the cassette file
+    :param mode: `record` or `replay`
+    :param latency: seconds to wait before replaying each response, or `recorded`
+    """
+    def __init__(self, path, mode=RECORD, latency=None):
+        if mode not in CASSETTE_MODES:
+            raise ValueError("Unknown cassette mode %s" % mode)
+
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.interactions = []
+        self._pending = collections.defaultdict(list)
+        self._lock = threading.Lock()
+
+        if self.mode == REPLAY:
+            self.load()
+
+    def adapter(self, max_retries=None):
+        """Return the transport adapter of the mode of the cassette.
+
+        :param max_retries: retry object used when recording
+
+        :returns a requests adapter
+        """
+        if self.mode == RECORD:
+            return _RecordingAdapter(self, max_retries=max_retries)
+
+        return _ReplayAdapter(self)
+
+    def load(self):
+        """Load the interactions stored in the cassette file."""
+
+        if not os.path.exists(self.path):
+            cause = "Cassette %s not found" % self.path
+            logger.error(cause)
+            raise CassetteError(cause=cause)
+
+        with open(self.path, 'r') as f:
+            content = json.load(f)
+
+        if content.get('version') != CASSETTE_VERSION:
+            cause = "Cassette version %s not supported" % content.get('version')
+            logger.error(cause)
+            raise CassetteError(cause=cause)
+
+        with self._lock:
+            self.interactions = content['interactions']
+            self._pending = collections.defaultdict(list)
+            for interaction in self.interactions:
+                request = interaction['request']
+                self._pending[(request['method'], request['url'])].append(interaction)
+
+        logger.debug("%s interactions loaded from %s", len(self.interactions), self.path)
+
+    def save(self):
+        """Save the recorded interactions to the cassette file."""
+
+        with self._lock:
+            content = {
+                'version': CASSETTE_VERSION,
+                'interactions': list(self.interactions)
+            }
+
+        with open(self.path, 'w') as f:
+            f.write(json.dumps(content, sort_keys=True, indent=4))
+
+        logger.info("%s interactions saved at %s", len(content['interactions']), self.path)
+
+    def record(self, request, response, elapsed):
+        """Record an interaction.
+
+        :param request: the prepared request sent
+        :param response: the response received, with its content already read
+        :param elapsed: seconds spent waiting for the response
+        """
+        content = response.content or b''
+        try:
+            body = {'body': content.decode('utf-8')}
+        except UnicodeDecodeError:
+            body = {'body_base64': base64.b64encode(content).decode('ascii')}
+
+        headers = {name: value for name, value in response.headers.items()
+                   if name.lower() not in SKIP_RESPONSE_HEADERS}
+
+        response_data = {'status': response.status_code, 'reason': response.reason, 'headers': headers}
+        response_data.update(body)
+
+        interaction = {
+            'request': {
+                'method': request.method,
+                'url': _strip_userinfo(request.url),
+                'body_hash': _body_hash(request)
+            },
+            'response': response_data,
+            'elapsed': elapsed
+        }
+
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def play(self, request):
+        """Find the interaction recorded for a request.
+
+        The first interaction not replayed yet with the same method, URL and
+        body is selected. If there is none, the first one not replayed yet
+        with the same method and URL, and otherwise the last one replayed.
+
+        :param request: the prepared request to answer
+
+        :returns the interaction recorded
+        """
+        key = (request.method, _strip_userinfo(request.url))
+        body_hash = _body_hash(request)
+
+        with self._lock:
+            candidates = self._pending.get(key)
+            if not candidates:
+                cause = "No interaction recorded for %s %s in %s" % (key[0], key[1], self.path)
+                logger.error(cause)
+                raise CassetteError(cause=cause)
+
+            pos = next((i for i, interaction in enumerate(candidates)
+                        if interaction['request']['body_hash'] == body_hash), 0)
+            interaction = candidates[pos]
+            if len(candidates) > 1:
+                del candidates[pos]
+
+        return interaction
+
+
+class _RecordingAdapter(requests.adapters.HTTPAdapter):
+    """Adapter sending the requests and recording them in a cassette."""
+
+    def __init__(self, cassette, max_retries=None):
+        super().__init__(max_retries=max_retries if max_retries is not None else 0)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        _read_body(request)
+
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        response.content
+        elapsed = time.perf_counter() - start
+
+        self.cassette.record(request, response, elapsed)
+
+        return response
+
+
+class _ReplayAdapter(requests.adapters.BaseAdapter):
+    """Adapter answering the requests with the responses of a cassette."""
+
+    def __init__(self, cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        _read_body(request)
+        interaction = self.cassette.play(request)
+        recorded = interaction['response']
+
+        latency = self.cassette.latency
+        if latency == RECORDED_LATENCY:
+            latency = interaction['elapsed']
+        if latency:
+            time.sleep(latency)
+
+        if 'body_base64' in recorded:
+            content = base64.b64decode(recorded['body_base64'])
+        else:
+            content = recorded['body'].encode('utf-8')
+
+        response = requests.Response()
+        response.status_code = recorded['status']
+        response.reason = recorded.get('reason')
+        response.headers = requests.structures.CaseInsensitiveDict(recorded['headers'])
+        response.headers['Content-Length'] = str(len(content))
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(content)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+
+        return response
+
+    def close(self):
+        pass
+
+
+def _read_body(request):
+    """Replace an iterable body of a request with its content."""
+
+    if request.body is None or isinstance(request.body, (str, bytes)):
+        return
+
+    body = b''.join(chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in request.body)
+    request.headers.pop('Transfer-Encoding', None)
+    request.prepare_body(body, None)
+
+
+def _strip_userinfo(url):
+    """Remove the credentials from a URL."""
+
+    parsed = urllib.parse.urlsplit(url)
+    netloc = parsed.netloc.rsplit('@', 1)[-1]
+
+    return urllib.parse.urlunsplit(parsed._replace(netloc=netloc))
+
+
+def _body_hash(request):
+    """Hash the body of a request.
+
+    JSON bodies are hashed in a canonical form, thus the order of their keys
+    does not matter, and multipart boundaries are ignored since they are
+    generated randomly.
+    """
+    body = request.body
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+
+    content_type = request.headers.get('Content-Type', '')
+    if 'boundary=' in content_type:
+        boundary = content_type.split('boundary=', 1)[1].encode('utf-8')
+        body = body.replace(boundary, b'boundary')
+
+    try:
+        body = json.dumps(json.loads(body.decode('utf-8')), sort_keys=True).encode('utf-8')
+    except ValueError:
+        pass
+
+    return hashlib.sha256(body).hexdigest()
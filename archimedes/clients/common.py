@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+# Definitions shared by the clients and the components working on disk.
+# This module must not import the HTTP stack (i.e., requests and urllib3),
+# thus the operations that do not contact Kibana can load it cheaply.
+
+DASHBOARD = "dashboard"
+INDEX_PATTERN = "index-pattern"
+SEARCH = "search"
+VISUALIZATION = "visualization"
+
+MAX_PAYLOAD_BYTES = 1048576
+
+CONFLICT_STATUS_CODE = 409
+
+# times the objects not imported because of a transient error are sent again
+IMPORT_MAX_RETRIES = 3
+
+
+def is_transient_status(status_code):
+    """Check whether an HTTP status code reports an error that may not occur when retrying.
+
+    :param status_code: status code returned by Kibana, None if unknown
+
+    :returns True for 429 and 5xx status codes
+    """
+    if status_code is None:
+        return False
+
+    return status_code == 429 or status_code >= 500
+
+
+class ImportReport:
+    """ImportReport class.
+
+    This class collects the outcome of an import operation. The objects
+    are divided into the ones imported, the ones not imported because of
+    an ID conflict, the ones not imported because of other errors and the
+    ones skipped before the import since they already exist in Kibana.
+    """
+    def __init__(self):
+        self.imported = []
+        self.conflicts = []
+        self.errors = []
+        self.skipped = []
+        self.retries = 0
+
+    @property
+    def total(self):
+        return len(self.imported) + len(self.conflicts) + len(self.errors) + len(self.skipped)
+
+    def update(self, report):
+        """Add the content of another report to this one.
+
+        :param report: the report to add
+        """
+        self.imported.extend(report.imported)
+        self.conflicts.extend(report.conflicts)
+        self.errors.extend(report.errors)
+        self.skipped.extend(report.skipped)
+        self.retries += report.retries
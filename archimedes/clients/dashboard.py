@@ -20,18 +20,24 @@
 #
 
 import logging
+import time
 
 import requests
 
-from archimedes.clients.http import HttpClient
+from archimedes import codec
+from archimedes.clients.common import (CONFLICT_STATUS_CODE,
+                                       DASHBOARD,
+                                       IMPORT_MAX_RETRIES,
+                                       INDEX_PATTERN,
+                                       MAX_PAYLOAD_BYTES,
+                                       SEARCH,
+                                       VISUALIZATION,
+                                       ImportReport,
+                                       is_transient_status)
+from archimedes.clients.http import HttpClient, SLEEP_TIME
 from archimedes.errors import DataExportError
 from grimoirelab_toolkit.uris import urijoin
 
-DASHBOARD = "dashboard"
-INDEX_PATTERN = "index-pattern"
-SEARCH = "search"
-VISUALIZATION = "visualization"
-
 logger = logging.getLogger(__name__)
 
 
@@ -42,13 +48,22 @@ class Dashboard(HttpClient):
     as exporting and importing dashboard.
 
     :param base_url: the Kibana URL
+    :param max_payload_bytes: maximum size of the body of an import request,
+        it should not exceed the `server.maxPayloadBytes` setting of Kibana
+    :param import_retries: number of times the objects not imported because of
+        a transient error are sent again
+    :param stats: HttpStats object where the requests are recorded
+    :param cassette: Cassette object recording or replaying the requests
     """
     API_DASHBOARDS_URL = 'api/kibana/dashboards'
     API_IMPORT_COMMAND = 'import'
     API_EXPORT_COMMAND = 'export'
 
-    def __init__(self, base_url):
-        super().__init__(base_url)
+    def __init__(self, base_url, max_payload_bytes=MAX_PAYLOAD_BYTES, import_retries=IMPORT_MAX_RETRIES,
+                 stats=None, cassette=None):
+        super().__init__(base_url, stats=stats, cassette=cassette)
+        self.max_payload_bytes = max_payload_bytes
+        self.import_retries = import_retries
 
     def export_dashboard(self, dashboard_id):
         """Export a dashboard identified by its ID.
@@ -90,7 +105,15 @@ class Dashboard(HttpClient):
         """Import objects from a dictionary to Kibana.
 
         This method import a list of objects to the Kibana instance using the
-        endpoint `import` of the Dashboard API.
+        endpoint `import` of the Dashboard API. The objects are split in several
+        requests (keeping their order) when their serialized size exceeds
+        `max_payload_bytes`. If Kibana rejects a request because its payload
+        is too large, only the objects of that request are split and sent again.
+
+        The objects not imported because of a transient error (i.e., 429 or 5xx
+        status codes) are sent again, grouped in new requests, up to `import_retries`
+        times, waiting longer after each attempt. Objects not imported because of an
+        ID conflict or other errors are not retried.
 
         :param objects: list of objects
         :param exclude_dashboards: do not import dashboards
@@ -98,6 +121,8 @@ class Dashboard(HttpClient):
         :param exclude_visualizations: do not import visualizations
         :param exclude_searches: do not import searchesDataExportError
         :param force: overwrite any existing objects on ID conflict
+
+        :returns an ImportReport object
         """
         url = urijoin(self.base_url, self.API_DASHBOARDS_URL, self.API_IMPORT_COMMAND)
         params = {
@@ -117,14 +142,116 @@ class Dashboard(HttpClient):
         if force:
             params['force'] = 'true'
 
-        response = self.post(url, objects, params)
+        report = ImportReport()
+        pending = objects['objects']
+
+        while True:
+            failed = []
+            for chunk in self._split_objects(objects, pending):
+                for obj in self._import_chunk(url, objects, chunk, params):
+                    if 'error' not in obj:
+                        report.imported.append(obj)
+                    elif obj['error'].get('statusCode') == CONFLICT_STATUS_CODE:
+                        report.conflicts.append(obj)
+                    elif self._is_transient(obj['error']):
+                        failed.append(obj)
+                    else:
+                        report.errors.append(obj)
 
-        total = len(response['objects'])
-        for obj in response['objects']:
-            if 'error' not in obj:
-                continue
+            if not failed or report.retries >= self.import_retries:
+                report.errors.extend(failed)
+                break
 
-            response['objects'].remove(obj)
+            report.retries += 1
+            self.stats.add_retries(self.stats.endpoint('POST', url))
+            failed_keys = {(obj['type'], obj['id']) for obj in failed}
+            pending = [obj for obj in pending if (obj['type'], obj['id']) in failed_keys]
+
+            logger.warning("Retrying %s object(s) not imported, attempt %s/%s",
+                           len(pending), report.retries, self.import_retries)
+            time.sleep(SLEEP_TIME * 2 ** (report.retries - 1))
+
+        for obj in report.conflicts:
+            logger.warning("%s with id %s not imported, %s", obj['type'], obj['id'], obj['error']['message'].lower())
+        for obj in report.errors:
             logger.error("%s with id %s not imported, %s", obj['type'], obj['id'], obj['error']['message'].lower())
 
-        logger.info("%s/%s object(s) imported", len(response['objects']), total)
+        logger.info("%s/%s object(s) imported", len(report.imported), report.total)
+
+        return report
+
+    def _split_objects(self, payload, objects):
+        """Split a list of objects in chunks whose serialized payload is below `max_payload_bytes`.
+
+        The size of each chunk includes the envelope of the `payload` the objects belong to
+        (e.g., `{"objects": [...], "version": ...}`).
+
+        :param payload: the payload the objects belong to
+        :param objects: list of objects
+
+        :returns a generator of lists of objects
+        """
+        envelope_bytes = len(codec.encode(dict(payload, objects=[])))
+
+        chunk = []
+        chunk_bytes = envelope_bytes
+
+        for obj in objects:
+            # each object is preceded by a comma, except the first one
+            obj_bytes = len(codec.encode(obj)) + (1 if chunk else 0)
+
+            if chunk and chunk_bytes + obj_bytes > self.max_payload_bytes:
+                yield chunk
+                chunk = []
+                chunk_bytes = envelope_bytes
+                obj_bytes -= 1
+
+            chunk.append(obj)
+            chunk_bytes += obj_bytes
+
+        if chunk:
+            yield chunk
+
+    def _import_chunk(self, url, payload, chunk, params):
+        """Import a chunk of objects, splitting it when its payload is too large.
+
+        :param url: import URL
+        :param payload: the original payload the chunk belongs to
+        :param chunk: list of objects to import
+        :param params: params of the request
+
+        :returns the list of objects returned by Kibana
+        """
+        try:
+            response = self.post(url, dict(payload, objects=chunk), params)
+        except requests.exceptions.HTTPError as error:
+            if error.response.status_code != 413:
+                raise error
+
+            if len(chunk) == 1:
+                obj = chunk[0]
+                return [{
+                    'id': obj['id'],
+                    'type': obj['type'],
+                    'error': {
+                        'message': 'Payload too large',
+                        'statusCode': 413
+                    }
+                }]
+
+            logger.warning("Payload of %s object(s) too large, splitting it", len(chunk))
+            middle = len(chunk) // 2
+            return self._import_chunk(url, payload, chunk[:middle], params) + \
+                self._import_chunk(url, payload, chunk[middle:], params)
+
+        return response['objects']
+
+    @staticmethod
+    def _is_transient(error):
+        """Check whether an import error may not occur when retrying the import.
+
+        :param error: the error returned by Kibana for an object
+
+        :returns True if the error is transient
+        """
+        return is_transient_status(error.get('statusCode', None))
@@ -19,12 +19,15 @@
 #   Valerio Cosentino <valcos@bitergia.com>
 #
 
-import json
+import threading
+import time
+import urllib.parse
 
 import requests
 import urllib3
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from archimedes import codec
+from archimedes.spans import span
 
 
 HEADERS = {
@@ -37,6 +40,151 @@ MAX_RETRIES = 5
 
 VERIFY = False
 
+# upper bounds (in seconds) of the buckets of the latency histograms
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+API_PREFIX = 'api/'
+SAVED_OBJECTS_PREFIX = 'saved_objects/'
+DASHBOARDS_PREFIX = 'kibana/dashboards/'
+OBJECT_ENDPOINTS = {
+    'GET': 'get_object',
+    'POST': 'create_object',
+    'PUT': 'update_object',
+    'DELETE': 'delete_object'
+}
+
+
+class HttpStats:
+    """Statistics of the HTTP requests sent to Kibana.
+
+    This class records, for each endpoint of the Kibana APIs, the number
+    of requests and errors, the bytes sent and received, the retries and
+    a histogram of the latencies. The endpoints are named after the API
+    operation, for instance `_find`, `get_object`, `dashboards/export`
+    or `dashboards/import`.
+    """
+    def __init__(self):
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def endpoint(method, url):
+        """Get the name of the endpoint targeted by a request.
+
+        :param method: HTTP method of the request
+        :param url: URL of the request
+
+        :returns the name of the endpoint
+        """
+        path = urllib.parse.urlparse(url).path
+        pos = path.find(API_PREFIX)
+        path = path[pos + len(API_PREFIX):] if pos >= 0 else path.strip('/')
+
+        if path.startswith(SAVED_OBJECTS_PREFIX):
+            path = path[len(SAVED_OBJECTS_PREFIX):]
+            if not path.startswith('_'):
+                return OBJECT_ENDPOINTS.get(method, path)
+        elif path.startswith(DASHBOARDS_PREFIX):
+            return 'dashboards/' + path[len(DASHBOARDS_PREFIX):]
+
+        return path
+
+    def record(self, endpoint, latency, bytes_out=0, bytes_in=0, retries=0, error=False):
+        """Record a request sent to an endpoint.
+
+        :param endpoint: name of the endpoint
+        :param latency: seconds spent waiting for the response
+        :param bytes_out: size of the body of the request
+        :param bytes_in: size of the body of the response
+        :param retries: times the request was retried by the transport
+        :param error: True if the request failed
+        """
+        with self._lock:
+            stats = self.__get(endpoint)
+            stats['requests'] += 1
+            stats['errors'] += 1 if error else 0
+            stats['bytes_out'] += bytes_out
+            stats['bytes_in'] += bytes_in
+            stats['retries'] += retries
+
+            latency_stats = stats['latency']
+            latency_stats['total'] += latency
+            latency_stats['min'] = min(latency_stats['min'], latency) if latency_stats['min'] is not None else latency
+            latency_stats['max'] = max(latency_stats['max'], latency)
+
+            bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+            latency_stats['histogram'][bucket] += 1
+
+    def add_bytes_in(self, endpoint, bytes_in):
+        """Add the bytes of a response read after the request was recorded."""
+
+        with self._lock:
+            self.__get(endpoint)['bytes_in'] += bytes_in
+
+    def add_retries(self, endpoint, retries=1):
+        """Add the retries of requests sent again by the clients."""
+
+        with self._lock:
+            self.__get(endpoint)['retries'] += retries
+
+    def reset(self):
+        """Delete the statistics recorded so far."""
+
+        with self._lock:
+            self.endpoints = {}
+
+    def to_dict(self):
+        """Return the statistics as a dict.
+
+        The histogram of each endpoint is a dict whose keys are the upper bounds
+        of the buckets, in milliseconds, and `inf` for the last one.
+
+        :returns a dict of statistics per endpoint
+        """
+        labels = ['%g' % (bound * 1000) for bound in LATENCY_BUCKETS] + ['inf']
+
+        with self._lock:
+            result = {}
+            for endpoint, stats in self.endpoints.items():
+                entry = dict(stats)
+                entry['latency'] = dict(stats['latency'])
+                entry['latency']['histogram'] = dict(zip(labels, stats['latency']['histogram']))
+                result[endpoint] = entry
+
+        return result
+
+    def format(self):
+        """Format the statistics as a table, one row per endpoint."""
+
+        lines = ["%-20s %9s %7s %8s %12s %12s %10s %10s" %
+                 ('endpoint', 'requests', 'errors', 'retries', 'bytes out', 'bytes in', 'avg (ms)', 'max (ms)')]
+        for endpoint, stats in sorted(self.to_dict().items()):
+            latency = stats['latency']
+            lines.append("%-20s %9d %7d %8d %12d %12d %10.1f %10.1f" %
+                         (endpoint, stats['requests'], stats['errors'], stats['retries'],
+                          stats['bytes_out'], stats['bytes_in'],
+                          latency['total'] * 1000 / max(stats['requests'], 1), latency['max'] * 1000))
+
+        return '\n'.join(lines)
+
+    def __get(self, endpoint):
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = {
+                'requests': 0,
+                'errors': 0,
+                'bytes_out': 0,
+                'bytes_in': 0,
+                'retries': 0,
+                'latency': {
+                    'total': 0,
+                    'min': None,
+                    'max': 0,
+                    'histogram': [0] * (len(LATENCY_BUCKETS) + 1)
+                }
+            }
+
+        return self.endpoints[endpoint]
+
 
 class HttpClient:
     """Abstract class for HTTP clients.
@@ -46,11 +194,19 @@ class HttpClient:
     Kibana does not send back a response after retrying a request,
     a RetryError exception is thrown.
 
+    The requests are recorded in `stats`, which can be shared among
+    several clients. When a `cassette` is set, the requests are recorded
+    to it or replayed from it, depending on its mode.
+
     :param base_url: base URL of the Kibana instance
+    :param stats: HttpStats object where the requests are recorded
+    :param cassette: Cassette object recording or replaying the requests
     """
 
-    def __init__(self, base_url):
+    def __init__(self, base_url, stats=None, cassette=None):
         self.base_url = base_url
+        self.stats = stats if stats is not None else HttpStats()
+        self.cassette = cassette
         self.session = self._create_http_session()
 
     def __del__(self):
@@ -65,10 +221,10 @@ class HttpClient:
 
         :returns a response object
         """
-        response = self.session.get(url, params=params, headers=headers, verify=VERIFY)
+        response = self._request('GET', url, params=params, headers=headers)
         response.raise_for_status()
 
-        return response.json()
+        return codec.loads(response.content)
 
     def delete(self, url, headers=None):
         """Delete the target object pointed by the url.
@@ -78,10 +234,10 @@ class HttpClient:
 
         :returns a response object
         """
-        response = self.session.delete(url, headers=headers, verify=VERIFY)
+        response = self._request('DELETE', url, headers=headers)
         response.raise_for_status()
 
-        return response.json()
+        return codec.loads(response.content)
 
     def put(self, url, data, headers=None):
         """Update the target object pointed by the url.
@@ -92,10 +248,10 @@ class HttpClient:
 
         :returns a response object
         """
-        response = self.session.put(url, data=json.dumps(data), headers=headers, verify=VERIFY)
+        response = self._request('PUT', url, data=codec.encode(data), headers=headers)
         response.raise_for_status()
 
-        return response.json()
+        return codec.loads(response.content)
 
     def post(self, url, data, params, headers=None):
         """Update the target object pointed by the url.
@@ -107,22 +263,120 @@ class HttpClient:
 
         :returns a response object
         """
-        response = self.session.post(url, params=params, data=json.dumps(data), headers=headers, verify=VERIFY)
+        response = self._request('POST', url, params=params, data=codec.encode(data), headers=headers)
+        response.raise_for_status()
+
+        return codec.loads(response.content)
+
+    def post_stream(self, url, data, params=None, headers=None):
+        """Upload a body to the target url, possibly generated while it is sent.
+
+        When the body is an iterable, it is sent using a chunked transfer encoding,
+        thus it is never loaded in memory as a whole. When it is bytes, it is sent
+        as is and it can be sent again if the request is retried.
+
+        :param url: link to the resource
+        :param data: bytes, or an iterable of bytes, composing the body of the request
+        :param params: params of the request
+        :param headers: headers of the request
+
+        :returns a response object
+        """
+        response = self._request('POST', url, params=params, data=data, headers=headers)
         response.raise_for_status()
 
-        return response.json()
+        return codec.loads(response.content)
+
+    def post_lines(self, url, data, params=None, headers=None):
+        """Post data to the target url and read the response line by line.
+
+        The response is streamed, thus the lines are returned as soon as they
+        are received, without loading the whole response in memory.
+
+        :param url: link to the resource
+        :param data: data to upload
+        :param params: params of the request
+        :param headers: headers of the request
+
+        :returns a generator of the non-empty lines of the response
+        """
+        response = self._request('POST', url, params=params, data=codec.encode(data), headers=headers, stream=True)
+        bytes_in = 0
+        try:
+            response.raise_for_status()
+
+            for line in response.iter_lines():
+                bytes_in += len(line) + 1
+                if not line:
+                    continue
+                yield line.decode('utf-8') if isinstance(line, bytes) else line
+        finally:
+            response.close()
+            self.stats.add_bytes_in(self.stats.endpoint('POST', url), bytes_in)
+
+    def _request(self, method, url, stream=False, **kwargs):
+        """Send a request and record it in the stats.
+
+        :param method: HTTP method of the request
+        :param url: link to the resource
+        :param stream: do not read the body of the response
+        :param kwargs: arguments of the request
+
+        :returns a response object
+        """
+        endpoint = self.stats.endpoint(method, url)
+
+        sent = [0]
+        data = kwargs.get('data')
+        if data is not None and not isinstance(data, (str, bytes)):
+            kwargs['data'] = self._count_bytes(data, sent)
+        elif data is not None:
+            sent[0] = len(data)
+
+        start = time.perf_counter()
+        try:
+            with span('kibana.' + endpoint):
+                response = self.session.request(method, url, verify=VERIFY, stream=stream, **kwargs)
+                bytes_in = 0 if stream else len(response.content)
+        except requests.exceptions.RequestException:
+            self.stats.record(endpoint, time.perf_counter() - start, bytes_out=sent[0], error=True)
+            raise
+        latency = time.perf_counter() - start
+
+        retries = getattr(response.raw, 'retries', None)
+        retries = len(retries.history) if retries else 0
+
+        self.stats.record(endpoint, latency, bytes_out=sent[0], bytes_in=bytes_in,
+                          retries=retries, error=not response.ok)
+
+        return response
+
+    @staticmethod
+    def _count_bytes(data, counter):
+        """Count the bytes of an iterable body while it is sent."""
+
+        for chunk in data:
+            counter[0] += len(chunk)
+            yield chunk
 
     def _create_http_session(self):
         """Create a http session and initialize the retry object."""
 
+        if not VERIFY:
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
         session = requests.Session()
         session.headers.update(HEADERS)
 
         retries = urllib3.util.Retry(total=MAX_RETRIES,
                                      backoff_factor=SLEEP_TIME)
 
-        session.mount('http://', requests.adapters.HTTPAdapter(max_retries=retries))
-        session.mount('https://', requests.adapters.HTTPAdapter(max_retries=retries))
+        for prefix in ['http://', 'https://']:
+            if self.cassette:
+                adapter = self.cassette.adapter(max_retries=retries)
+            else:
+                adapter = requests.adapters.HTTPAdapter(max_retries=retries)
+            session.mount(prefix, adapter)
 
         return session
 
@@ -20,10 +20,19 @@
 #
 
 import logging
+import time
+import uuid
 
 import requests
 
-from archimedes.clients.http import HttpClient
+from archimedes import codec
+from archimedes.clients.common import (CONFLICT_STATUS_CODE,
+                                       IMPORT_MAX_RETRIES,
+                                       MAX_PAYLOAD_BYTES,
+                                       ImportReport,
+                                       is_transient_status)
+from archimedes.clients.http import HttpClient, SLEEP_TIME
+from archimedes.errors import DataExportError
 from grimoirelab_toolkit.uris import urijoin
 
 logger = logging.getLogger(__name__)
@@ -36,12 +45,25 @@ class SavedObjects(HttpClient):
     as finding, deleting or updating objects stored in Kibana.
 
     :param base_url: the Kibana URL
+    :param max_payload_bytes: maximum size of the body of an import request,
+        it should not exceed the `server.maxPayloadBytes` setting of Kibana
+    :param import_retries: number of times the objects not imported because of
+        a transient error are sent again
+    :param stats: HttpStats object where the requests are recorded
+    :param cassette: Cassette object recording or replaying the requests
     """
     API_SAVED_OBJECTS_URL = 'api/saved_objects'
     API_FIND_ENDPOINT = '_find'
+    API_BULK_GET_ENDPOINT = '_bulk_get'
+    API_EXPORT_ENDPOINT = '_export'
+    API_IMPORT_ENDPOINT = '_import'
+    IMPORT_FILE_NAME = 'export.ndjson'
 
-    def __init__(self, base_url):
-        super().__init__(base_url)
+    def __init__(self, base_url, max_payload_bytes=MAX_PAYLOAD_BYTES, import_retries=IMPORT_MAX_RETRIES,
+                 stats=None, cassette=None):
+        super().__init__(base_url, stats=stats, cassette=cassette)
+        self.max_payload_bytes = max_payload_bytes
+        self.import_retries = import_retries
 
     def find(self, obj_type):
         """Find an object by its type.
@@ -87,6 +109,34 @@ class SavedObjects(HttpClient):
 
             params['page'] = current_page + 1
 
+    def find_page(self, obj_type, page=1, per_page=20, sort_field=None, sort_order=None, fields=None):
+        """Find a page of objects of a given type.
+
+        :param obj_type: type of the target objects
+        :param page: number of the page
+        :param per_page: number of objects per page
+        :param sort_field: attribute used to sort the objects
+        :param sort_order: order of the objects, `asc` or `desc`
+        :param fields: attributes returned for each object, all of them if None
+
+        :returns a dict with the objects (`saved_objects`) and their `total`
+        """
+        params = {
+            'page': page,
+            'per_page': per_page,
+            'type': obj_type
+        }
+        if sort_field:
+            params['sort_field'] = sort_field
+        if sort_order:
+            params['sort_order'] = sort_order
+        if fields:
+            params['fields'] = fields
+
+        find_url = urijoin(self.base_url, self.API_SAVED_OBJECTS_URL, self.API_FIND_ENDPOINT)
+
+        return self.fetch(find_url, params=params)
+
     def get_object(self, obj_type, obj_id):
         """Get the object by its type and id.
 
@@ -108,6 +158,267 @@ class SavedObjects(HttpClient):
 
         return r
 
+    def bulk_get(self, objects, fields=None):
+        """Get a list of objects by their types and ids.
+
+        This method retrieves several objects with a single request. The objects
+        not found are returned with an `error` attribute. If the endpoint is not
+        supported by the Kibana instance, an empty list is returned.
+
+        :param objects: list of dicts containing the `type` and `id` of the target objects
+        :param fields: list of attributes to retrieve, if None all attributes are returned
+
+        :returns the list of objects
+        """
+        url = urijoin(self.base_url, self.API_SAVED_OBJECTS_URL, self.API_BULK_GET_ENDPOINT)
+
+        data = []
+        for obj in objects:
+            entry = {
+                'type': obj['type'],
+                'id': obj['id']
+            }
+            if fields:
+                entry['fields'] = fields
+            data.append(entry)
+
+        r = []
+        try:
+            r_json = self.post(url, data=data, params=None)
+            r = r_json['saved_objects']
+        except requests.exceptions.HTTPError as error:
+            if error.response.status_code in [400, 404]:
+                logger.warning("Impossible to get objects in bulk, url %s", url)
+            else:
+                raise error
+
+        return r
+
+    def export_objects(self, objects, include_references_deep=True):
+        """Export a list of objects using the `_export` endpoint (Kibana 7.x).
+
+        This method exports the target objects and, if `include_references_deep`
+        is True, all the objects they reference (e.g., the visualizations, searches
+        and index patterns of a dashboard) with a single request. The NDJSON response
+        is parsed line by line, while it is received.
+
+        A `DataExportError` is thrown if a 400 or 404 HTTP error occurred. Other HTTP
+        errors are not incapsulated and returned as they are.
+
+        :param objects: list of dicts containing the `type` and `id` of the target objects
+        :param include_references_deep: export also the objects referenced, recursively
+
+        :returns a generator of the exported objects
+        """
+        url = urijoin(self.base_url, self.API_SAVED_OBJECTS_URL, self.API_EXPORT_ENDPOINT)
+        data = {
+            'objects': [{'type': obj['type'], 'id': obj['id']} for obj in objects],
+            'includeReferencesDeep': include_references_deep
+        }
+
+        try:
+            for line in self.post_lines(url, data=data):
+                obj = codec.loads(line)
+
+                # the last line summarizes the export
+                if 'exportedCount' in obj:
+                    continue
+
+                yield obj
+        except requests.exceptions.HTTPError as error:
+            if error.response.status_code in [400, 404]:
+                ids = ', '.join([obj['id'] for obj in objects])
+                cause = "Impossible to export objects with id %s" % ids
+                logger.error(cause)
+                raise DataExportError(cause=cause)
+            else:
+                raise error
+
+    def import_objects(self, objects, overwrite=False):
+        """Import a list of objects using the `_import` endpoint (Kibana 7.x).
+
+        This method uploads the objects as a NDJSON file within multipart requests.
+        The objects are read while the requests are built, thus `objects` can be a
+        generator, and they are split in several requests (keeping their order) when
+        the size of the body exceeds `max_payload_bytes`. If Kibana rejects a request
+        because its payload is too large, only the objects of that request are split
+        and sent again.
+
+        The objects not imported because of a transient error (i.e., 429 or 5xx
+        status codes, returned for the whole request or for a single object) are
+        sent again, grouped in new requests, up to `import_retries` times, waiting
+        longer after each attempt. Objects not imported because of an ID conflict
+        or other errors are not retried.
+
+        :param objects: an iterable of Kibana objects
+        :param overwrite: overwrite any existing objects on ID conflict
+
+        :returns an ImportReport object
+        """
+        url = urijoin(self.base_url, self.API_SAVED_OBJECTS_URL, self.API_IMPORT_ENDPOINT)
+        params = {
+            'overwrite': 'true' if overwrite else 'false'
+        }
+        boundary = uuid.uuid4().hex
+
+        report = ImportReport()
+        pending = objects
+
+        while True:
+            failed = []
+            for chunk in self._split_objects(pending, boundary):
+                for obj, error in self._import_chunk(url, chunk, boundary, params):
+                    entry = {
+                        'id': obj['id'],
+                        'type': obj['type']
+                    }
+                    if not error:
+                        report.imported.append(entry)
+                        continue
+
+                    entry['error'] = error
+                    if error.get('statusCode') == CONFLICT_STATUS_CODE:
+                        report.conflicts.append(entry)
+                    elif is_transient_status(error.get('statusCode')):
+                        failed.append((obj, entry))
+                    else:
+                        report.errors.append(entry)
+
+            if not failed or report.retries >= self.import_retries:
+                report.errors.extend(entry for _, entry in failed)
+                break
+
+            report.retries += 1
+            self.stats.add_retries(self.stats.endpoint('POST', url))
+            pending = [obj for obj, _ in failed]
+
+            logger.warning("Retrying %s object(s) not imported, attempt %s/%s",
+                           len(pending), report.retries, self.import_retries)
+            time.sleep(SLEEP_TIME * 2 ** (report.retries - 1))
+
+        for obj in report.conflicts:
+            logger.warning("%s with id %s not imported, %s", obj['type'], obj['id'], obj['error']['message'].lower())
+        for obj in report.errors:
+            logger.error("%s with id %s not imported, %s", obj['type'], obj['id'], obj['error']['message'].lower())
+
+        logger.info("%s/%s object(s) imported", len(report.imported), report.total)
+
+        return report
+
+    def _split_objects(self, objects, boundary):
+        """Split an iterable of objects in chunks whose multipart body is below `max_payload_bytes`.
+
+        The size of each chunk includes the header and the footer of the multipart
+        body. The objects are read lazily, one chunk at a time.
+
+        :param objects: an iterable of Kibana objects
+        :param boundary: the boundary of the multipart body
+
+        :returns a generator of lists of objects
+        """
+        header, footer = self._multipart_envelope(boundary)
+        envelope_bytes = len(header) + len(footer)
+
+        chunk = []
+        chunk_bytes = envelope_bytes
+
+        for obj in objects:
+            # each object is a line of the NDJSON file
+            obj_bytes = len(codec.encode(obj)) + 1
+
+            if chunk and chunk_bytes + obj_bytes > self.max_payload_bytes:
+                yield chunk
+                chunk = []
+                chunk_bytes = envelope_bytes
+
+            chunk.append(obj)
+            chunk_bytes += obj_bytes
+
+        if chunk:
+            yield chunk
+
+    def _import_chunk(self, url, chunk, boundary, params):
+        """Import a chunk of objects, splitting it when its payload is too large.
+
+        The body is built before sending the request, thus it is sent again
+        when the request is retried.
+
+        :param url: import URL
+        :param chunk: list of objects to import
+        :param boundary: the boundary of the multipart body
+        :param params: params of the request
+
+        :returns a list of (object, error) tuples, where error is None
+            for the objects imported
+        """
+        headers = {
+            'Content-Type': 'multipart/form-data; boundary=' + boundary
+        }
+        body = b''.join(self._ndjson_multipart(chunk, boundary))
+
+        try:
+            response = self.post_stream(url, body, params=params, headers=headers)
+        except requests.exceptions.HTTPError as error:
+            status_code = error.response.status_code
+
+            if status_code == 413 and len(chunk) > 1:
+                logger.warning("Payload of %s object(s) too large, splitting it", len(chunk))
+                middle = len(chunk) // 2
+                return self._import_chunk(url, chunk[:middle], boundary, params) + \
+                    self._import_chunk(url, chunk[middle:], boundary, params)
+            elif status_code == 413:
+                return [(chunk[0], {'message': 'Payload too large', 'statusCode': 413})]
+            elif is_transient_status(status_code):
+                message = 'Import request failed with status {}'.format(status_code)
+                return [(obj, {'message': message, 'statusCode': status_code}) for obj in chunk]
+
+            logger.error("Objects not imported: %s", error)
+            raise error
+
+        errors = {}
+        for obj in response.get('errors', []):
+            error_type = obj['error'].get('type', 'unknown')
+            error = {
+                'message': obj['error'].get('message', error_type)
+            }
+            if error_type in ['conflict', 'ambiguous_conflict']:
+                error['statusCode'] = CONFLICT_STATUS_CODE
+            elif 'statusCode' in obj['error']:
+                error['statusCode'] = obj['error']['statusCode']
+            errors[(obj['type'], obj['id'])] = error
+
+        return [(obj, errors.get((obj['type'], obj['id']))) for obj in chunk]
+
+    def _ndjson_multipart(self, objects, boundary):
+        """Generate the body of a multipart request including the objects as NDJSON file.
+
+        :param objects: an iterable of Kibana objects
+        :param boundary: the boundary of the multipart body
+
+        :returns a generator of bytes
+        """
+        header, footer = self._multipart_envelope(boundary)
+        yield header
+
+        for obj in objects:
+            yield codec.encode(obj) + b'\n'
+
+        yield footer
+
+    def _multipart_envelope(self, boundary):
+        """Build the header and the footer of a multipart body including a NDJSON file.
+
+        :param boundary: the boundary of the multipart body
+
+        :returns a tuple with the header and the footer, as bytes
+        """
+        header = '--{}\r\n' \
+                 'Content-Disposition: form-data; name="file"; filename="{}"\r\n' \
+                 'Content-Type: application/ndjson\r\n\r\n'.format(boundary, self.IMPORT_FILE_NAME)
+        footer = '\r\n--{}--\r\n'.format(boundary)
+
+        return header.encode('utf-8'), footer.encode('utf-8')
+
     def delete_object(self, obj_type, obj_id):
         """Delete the object with a given type and id.
 
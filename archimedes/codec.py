@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+ORJSON = 'orjson'
+UJSON = 'ujson'
+STDLIB = 'json'
+
+# fastest backend installed, `json` of the standard library otherwise
+BACKEND = ORJSON if orjson else UJSON if ujson else STDLIB
+
+
+def loads(content):
+    """Decode a JSON document.
+
+    The document is decoded by the fastest backend installed. When
+    the backend fails (e.g., with `NaN`, integers beyond 64 bits or
+    invalid documents), it is decoded by the standard library, thus
+    the result, and the errors thrown, are the ones of `json.loads`.
+
+    :param content: JSON document, as a string or UTF-8 bytes
+
+    :returns: the object decoded
+    """
+    if BACKEND == ORJSON:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass
+    elif BACKEND == UJSON:
+        try:
+            return ujson.loads(content)
+        except (ValueError, OverflowError):
+            pass
+
+    return json.loads(content)
+
+
+def dumps(obj, sort_keys=False, indent=None):
+    """Encode an object as a JSON string.
+
+    The output is the one of `json.dumps`, which is always used: the
+    other backends do not support its indentation, escaping of non-ASCII
+    characters and format of floats, thus the files written (e.g., with
+    `sort_keys=True, indent=4`) do not change with the backend installed.
+
+    :param obj: object to encode
+    :param sort_keys: sort the keys of the objects
+    :param indent: number of spaces to indent each level, None for a single line
+
+    :returns: a JSON string
+    """
+    return json.dumps(obj, sort_keys=sort_keys, indent=indent)
+
+
+def encode(obj):
+    """Encode an object as compact JSON bytes, to be sent to Kibana.
+
+    The object is encoded by the fastest backend installed, without
+    whitespaces. Thus, the output may change with the backend (e.g.,
+    non-ASCII characters are escaped only by the standard library),
+    and the size of a payload must be computed with this function.
+
+    :param obj: object to encode
+
+    :returns: UTF-8 bytes
+    """
+    if BACKEND == ORJSON:
+        try:
+            return orjson.dumps(obj)
+        except orjson.JSONEncodeError:
+            pass
+    elif BACKEND == UJSON:
+        try:
+            return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+        except (TypeError, ValueError, OverflowError):
+            pass
+
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import http.server
+import json
+import logging
+import os
+import socketserver
+import stat
+import threading
+import time
+
+from archimedes.batch import Batch, ERROR
+from archimedes.errors import DaemonError
+
+UNIX_PREFIX = 'unix:'
+DEFAULT_HOST = '127.0.0.1'
+
+OPERATIONS_PATH = '/operations'
+STATUS_PATH = '/status'
+
+JSON_CONTENT_TYPE = 'application/json'
+LOCAL_HOSTS = ['localhost', '127.0.0.1', '[::1]']
+
+# permissions of the unix socket, only its owner can connect to it
+SOCKET_MODE = 0o600
+
+logger = logging.getLogger(__name__)
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Daemon:
+    """Daemon class.
+
+    This class serves Archimedes operations over HTTP, on a local TCP port or
+    on a unix socket, keeping warm between requests the connection pools to
+    Kibana, the files located and the JSON decoded by the manager, and the
+    registry (which is reloaded only when modified by another process).
+
+    The operations are sent as a JSON object in the body of a `POST` request
+    to `/operations`, with the same format of the batch mode (see `Batch`),
+    and the result is returned as a JSON object. A `GET` request to `/status`
+    returns the uptime and the number of operations served.
+
+    The operations are not authenticated, thus the daemon only accepts them
+    from local clients: the unix socket can be used only by its owner, and
+    the TCP requests must be sent to a local `Host` (which prevents web pages
+    from reaching the daemon by DNS rebinding) with the `application/json`
+    content type (which browsers cannot send to other sites without a CORS
+    preflight, never answered by the daemon).
+
+    :param archimedes: Archimedes object executing the operations
+    :param address: `unix:<path>` of the unix socket, or `[host:]port` of the TCP socket
+    """
+    def __init__(self, archimedes, address):
+        self.archimedes = archimedes
+        self.address = address
+        self.batch = Batch(archimedes)
+        self.server = None
+        self.thread = None
+        self.started_at = None
+        self.served = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def socket_path(self):
+        """Path of the unix socket, None when serving on TCP."""
+
+        if self.address.startswith(UNIX_PREFIX):
+            return self.address[len(UNIX_PREFIX):]
+
+        return None
+
+    @property
+    def url(self):
+        """URL of the daemon when serving on TCP."""
+
+        host, port = self.server.server_address[:2]
+        return 'http://%s:%s' % (host, port)
+
+    def start(self):
+        """Start serving requests in a background thread."""
+
+        self.__bind()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def serve_forever(self):
+        """Serve requests until the process is interrupted."""
+
+        self.__bind()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.__close()
+
+    def stop(self):
+        """Stop serving requests."""
+
+        self.server.shutdown()
+        self.thread.join()
+        self.__close()
+
+    def execute(self, line):
+        """Execute an operation encoded as JSON.
+
+        :param line: JSON encoding the operation
+
+        :returns a dict with the result of the operation
+        """
+        with self.batch.registry_lock:
+            if self.archimedes.registry.refresh():
+                logger.info("Registry modified on disk, reloaded")
+
+        result = self.batch.run_line(line)
+
+        with self._lock:
+            self.served += 1
+            self.failed += 1 if result['status'] == ERROR else 0
+
+        return result
+
+    def status(self):
+        """Return the status of the daemon."""
+
+        with self._lock:
+            return {
+                'uptime': time.time() - self.started_at,
+                'operations': self.served,
+                'errors': self.failed
+            }
+
+    def __bind(self):
+        handler = self.__build_handler()
+
+        socket_path = self.socket_path
+        if socket_path:
+            self.__remove_socket(socket_path)
+
+            umask = os.umask(0o777 & ~SOCKET_MODE)
+            try:
+                self.server = _ThreadingUnixServer(socket_path, handler)
+            finally:
+                os.umask(umask)
+            logger.info("Archimedes daemon listening on %s", socket_path)
+        else:
+            host, _, port = self.address.rpartition(':')
+            self.server = _ThreadingTCPServer((host or DEFAULT_HOST, int(port)), handler)
+            logger.info("Archimedes daemon listening on %s", self.url)
+
+        self.started_at = time.time()
+
+    def __close(self):
+        self.server.server_close()
+
+        socket_path = self.socket_path
+        if socket_path and os.path.exists(socket_path) and stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+            os.remove(socket_path)
+
+    def is_allowed_host(self, host):
+        """Check whether a `Host` header targets the daemon on a local address.
+
+        :param host: value of the `Host` header, with or without port
+
+        :returns True when the host is local or the one the daemon is bound to
+        """
+        if self.socket_path:
+            return True
+        if not host:
+            return False
+
+        name = host.rsplit(':', 1)[0] if not host.endswith(']') else host
+        return name in LOCAL_HOSTS or name == self.server.server_address[0]
+
+    @staticmethod
+    def __remove_socket(socket_path):
+        """Remove a unix socket left by another daemon, but never a regular file."""
+
+        try:
+            mode = os.lstat(socket_path).st_mode
+        except FileNotFoundError:
+            return
+
+        if not stat.S_ISSOCK(mode):
+            cause = "%s already exists and it is not a unix socket" % socket_path
+            logger.error(cause)
+            raise DaemonError(cause=cause)
+
+        os.remove(socket_path)
+
+    def __build_handler(self):
+        daemon = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                # unix sockets have no client address
+                if not self.client_address:
+                    self.client_address = (daemon.address, 0)
+
+            def do_GET(self):
+                if not daemon.is_allowed_host(self.headers.get('Host')):
+                    self.__reply(403, {'status': ERROR, 'error': 'Host not allowed'})
+                    return
+
+                if self.path != STATUS_PATH:
+                    self.__reply(404, {'status': ERROR, 'error': 'Not found'})
+                    return
+
+                self.__reply(200, daemon.status())
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length).decode('utf-8')
+
+                if not daemon.is_allowed_host(self.headers.get('Host')):
+                    self.__reply(403, {'status': ERROR, 'error': 'Host not allowed'})
+                    return
+
+                if self.path != OPERATIONS_PATH:
+                    self.__reply(404, {'status': ERROR, 'error': 'Not found'})
+                    return
+
+                if self.headers.get_content_type() != JSON_CONTENT_TYPE:
+                    self.__reply(415, {'status': ERROR, 'error': 'Content-Type must be ' + JSON_CONTENT_TYPE})
+                    return
+
+                result = daemon.execute(body)
+                self.__reply(200 if result['status'] != ERROR else 400, result)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+            def __reply(self, status, content):
+                content = json.dumps(content, sort_keys=True).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', JSON_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+        return Handler
@@ -36,6 +36,24 @@ class BaseError(Exception):
         return self.msg
 
 
+class BatchError(BaseError):
+    """Error for handling batch operation errors."""
+
+    message = "%(cause)s"
+
+
+class CassetteError(BaseError):
+    """Error for handling record and replay errors."""
+
+    message = "%(cause)s"
+
+
+class DaemonError(BaseError):
+    """Error for handling daemon errors."""
+
+    message = "%(cause)s"
+
+
 class DataImportError(BaseError):
     """Error for handling import errors."""
 
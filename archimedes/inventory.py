@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import hashlib
+import logging
+import os
+import threading
+import time
+import urllib.parse
+
+from archimedes import codec
+from archimedes.utils import load_json
+
+INVENTORY_TTL = 300
+INVENTORY_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+class Inventory:
+    """Inventory class.
+
+    This class caches on disk the saved objects of a Kibana instance, grouped
+    by type. The inventory of a type is complete: it contains all the objects
+    of that type stored in Kibana when it was last validated. It is fresh for
+    `ttl` seconds after its validation; once expired, it must be validated
+    again (e.g., retrieving only the objects updated since `watermark`).
+
+    Each Kibana URL has its own file in `cache_path`, named after a hash of
+    the URL without credentials.
+
+    :param cache_path: folder where the inventories are stored
+    :param url: the Kibana URL
+    :param ttl: seconds an inventory is fresh after its validation
+    """
+    def __init__(self, cache_path, url, ttl=INVENTORY_TTL):
+        self.cache_path = cache_path
+        self.url = strip_userinfo(url)
+        self.ttl = ttl
+        self.path = os.path.join(cache_path, hashlib.sha1(self.url.encode('utf-8')).hexdigest() + '.json')
+        self.lock = threading.RLock()
+        self.content = self.__load()
+
+    def contains(self, obj_type):
+        """Check whether the inventory of `obj_type` was retrieved."""
+
+        return obj_type in self.content
+
+    def is_fresh(self, obj_type):
+        """Check whether the inventory of `obj_type` was validated less than `ttl` seconds ago."""
+
+        entry = self.content.get(obj_type)
+        return entry is not None and time.time() - entry['validated_at'] < self.ttl
+
+    def objects(self, obj_type):
+        """Return the objects of `obj_type`, as a dict indexed by ID."""
+
+        entry = self.content.get(obj_type)
+        return entry['objects'] if entry else {}
+
+    def watermark(self, obj_type):
+        """Return the most recent `updated_at` of the objects of `obj_type`."""
+
+        return max((obj.get('updated_at') or '' for obj in self.objects(obj_type).values()), default='')
+
+    def store(self, obj_type, objs):
+        """Replace the inventory of `obj_type`, validating it.
+
+        :param obj_type: type of the objects
+        :param objs: iterable with all the objects of `obj_type`
+        """
+        with self.lock:
+            self.content[obj_type] = {
+                'validated_at': time.time(),
+                'objects': {obj['id']: obj for obj in objs}
+            }
+            self.__save()
+
+    def update(self, obj_type, objs):
+        """Add or replace some objects in the inventory of `obj_type`, validating it.
+
+        :param obj_type: type of the objects
+        :param objs: iterable with the objects updated
+        """
+        with self.lock:
+            entry = self.content[obj_type]
+            entry['objects'].update((obj['id'], obj) for obj in objs)
+            entry['validated_at'] = time.time()
+            self.__save()
+
+    def expire(self, obj_types=None):
+        """Expire the inventory of some types, thus they are validated on next use.
+
+        :param obj_types: types to expire, all of them if None
+        """
+        with self.lock:
+            for obj_type, entry in self.content.items():
+                if obj_types is None or obj_type in obj_types:
+                    entry['validated_at'] = 0
+            self.__save()
+
+    def __load(self):
+        try:
+            data = load_json(self.path)
+        except FileNotFoundError:
+            return {}
+        except ValueError as error:
+            logger.warning("Inventory %s not valid, it will be rebuilt, %s", self.path, error)
+            return {}
+
+        if data.get('version') != INVENTORY_VERSION or data.get('url') != self.url:
+            logger.warning("Inventory %s not compatible, it will be rebuilt", self.path)
+            return {}
+
+        return data['types']
+
+    def __save(self):
+        os.makedirs(self.cache_path, exist_ok=True)
+
+        data = {
+            'version': INVENTORY_VERSION,
+            'url': self.url,
+            'types': self.content
+        }
+
+        # the file is replaced atomically, thus concurrent runs never read it half written
+        tmp_path = '%s.%s.tmp' % (self.path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            f.write(codec.encode(data))
+        os.replace(tmp_path, self.path)
+
+        logger.debug("Inventory saved at %s", self.path)
+
+
+def strip_userinfo(url):
+    """Remove the credentials from a URL."""
+
+    parts = urllib.parse.urlsplit(url)
+    netloc = parts.netloc.rsplit('@', 1)[-1]
+
+    return urllib.parse.urlunsplit(parts._replace(netloc=netloc))
@@ -20,16 +20,36 @@
 #
 
 import logging
+import threading
+import time
+
+import requests
 
 from archimedes.clients.dashboard import (Dashboard,
                                           DASHBOARD,
                                           INDEX_PATTERN,
+                                          MAX_PAYLOAD_BYTES,
                                           SEARCH,
                                           VISUALIZATION)
+from archimedes.clients.http import HttpStats
 from archimedes.clients.saved_objects import SavedObjects
 from archimedes.errors import NotFoundError, ObjectTypeError
+from archimedes.singleflight import SingleFlight
 from grimoirelab_toolkit.uris import urijoin
 
+SAVED_OBJECTS_API_VERSION = 7
+
+DASHBOARD_API = 'dashboard'
+SAVED_OBJECTS_API = 'saved_objects'
+
+# objects per request when validating an inventory
+INVENTORY_PAGE_SIZE = 100
+INVENTORY_IDS_PAGE_SIZE = 1000
+UPDATED_AT = 'updated_at'
+
+# seconds a lookup of an object not found is answered without querying Kibana again
+NOT_FOUND_TTL = 10
+
 logger = logging.getLogger(__name__)
 
 
@@ -38,14 +58,86 @@ class Kibana:
 
     This class defines operations performed against the Dashboard and
     the SavedObjects APIs, such as exporting and importing objects as well
-    as searching objects by ID or title.
+    as searching objects by ID or title. The requests sent to both
+    APIs are recorded in the same HttpStats object.
+
+    When an `inventory` is given, the objects are searched by ID and title,
+    and listed, using the objects cached in the inventory. The inventory of
+    each type is retrieved the first time it is needed and, once expired,
+    validated retrieving only the objects updated since then.
+
+    Concurrent searches of the same object by ID or title are collapsed
+    into a single one, and the objects not found are remembered for
+    `not_found_ttl` seconds (or until objects are imported).
 
     :param base_url: the Kibana URL
+    :param max_payload_bytes: maximum size of the body of an import request
+    :param cassette: Cassette object recording or replaying the requests
+    :param inventory: Inventory object caching the saved objects
+    :param not_found_ttl: seconds the objects not found are remembered
     """
-    def __init__(self, base_url):
+    API_STATUS_URL = 'api/status'
+
+    def __init__(self, base_url, max_payload_bytes=MAX_PAYLOAD_BYTES, cassette=None, inventory=None,
+                 not_found_ttl=NOT_FOUND_TTL):
         self.base_url = base_url
-        self.dashboard = Dashboard(base_url)
-        self.saved_objects = SavedObjects(base_url)
+        self.inventory = inventory
+        self.not_found_ttl = not_found_ttl
+        self.__lookups = SingleFlight()
+        self.__not_found = {}
+        self.__not_found_lock = threading.Lock()
+        self.stats = HttpStats()
+        self.dashboard = Dashboard(base_url, max_payload_bytes=max_payload_bytes, stats=self.stats, cassette=cassette)
+        self.saved_objects = SavedObjects(base_url, max_payload_bytes=max_payload_bytes,
+                                          stats=self.stats, cassette=cassette)
+        self.version = None
+        self.import_api = None
+        self.__version_lock = threading.Lock()
+
+    def get_stats(self):
+        """Get the statistics of the requests sent to Kibana.
+
+        This method returns, for each endpoint, the number of requests and
+        errors, the bytes sent and received, the retries and a histogram
+        of the latencies.
+
+        :returns a dict of statistics per endpoint
+        """
+        return self.stats.to_dict()
+
+    def reset_stats(self):
+        """Delete the statistics of the requests sent so far."""
+
+        self.stats.reset()
+
+    def get_version(self):
+        """Get the version of the Kibana instance.
+
+        This method retrieves the version number using the status API. The
+        version is retrieved only once and then cached. An empty string is
+        returned if the version cannot be retrieved; in that case, it is not
+        cached and the status API is queried again on the next call.
+
+        :returns the version number of Kibana
+        """
+        if self.version is not None:
+            return self.version
+
+        with self.__version_lock:
+            if self.version is not None:
+                return self.version
+
+            url = urijoin(self.base_url, self.API_STATUS_URL)
+            try:
+                status = self.saved_objects.fetch(url)
+                version = status['version']['number']
+            except (requests.exceptions.HTTPError, KeyError, TypeError, ValueError) as error:
+                logger.warning("Impossible to retrieve the Kibana version, url %s, %s", url, error)
+                return ''
+
+            self.version = version
+
+        return self.version
 
     def export_by_id(self, obj_type, obj_id):
         """Export an object identified by its ID.
@@ -63,7 +155,7 @@ class Kibana:
         :returns the target Kibana object
         """
         if obj_type == DASHBOARD:
-            obj = self.dashboard.export_dashboard(obj_id)
+            obj = self.__export_dashboard(obj_id)
         elif obj_type in [INDEX_PATTERN, SEARCH, VISUALIZATION]:
             obj = self.saved_objects.get_object(obj_type, obj_id)
         else:
@@ -102,7 +194,7 @@ class Kibana:
 
         if obj_type == DASHBOARD:
             obj_id = obj['id']
-            obj = self.dashboard.export_dashboard(obj_id)
+            obj = self.__export_dashboard(obj_id)
 
         if not obj:
             cause = "Impossible to export %s with title %s, not found" % (obj_type, obj_title)
@@ -111,15 +203,103 @@ class Kibana:
 
         return obj
 
+    def __export_dashboard(self, dashboard_id):
+        """Export a dashboard and the objects it references.
+
+        For Kibana 7.x instances, the dashboard is exported together with its
+        visualizations, searches and index patterns with a single request to the
+        `_export` endpoint of the SavedObjects API. For older instances, the
+        Dashboard API is used.
+
+        :param dashboard_id: ID of the dashboard
+
+        :returns a dict with the list of objects exported
+        """
+        if not self.__supports_saved_objects_api():
+            return self.dashboard.export_dashboard(dashboard_id)
+
+        target = [{'type': DASHBOARD, 'id': dashboard_id}]
+        objs = [obj for obj in self.saved_objects.export_objects(target, include_references_deep=True)]
+
+        return {'objects': objs, 'version': self.get_version()}
+
     def import_objects(self, objects, force=False):
         """Import a list of objects to Kibana.
 
-        This method imports a list of Kibana objects to Kibana by using the Dashboard API.
+        This method imports a list of Kibana objects to Kibana. For Kibana 7.x
+        instances, the objects are streamed as NDJSON to the `_import` endpoint
+        of the SavedObjects API, thus `objects['objects']` can be a generator.
+        For older instances, the Dashboard API is used. In both cases, the
+        objects are split in requests below `max_payload_bytes` and the ones
+        not imported because of transient errors are sent again.
 
-        :param objects: list of objects to import
+        :param objects: a dict with the list of objects to import
         :param force: overwrite any existing objects on ID conflict
+
+        :returns an ImportReport object
+        """
+        if self.inventory:
+            # the objects imported are retrieved when the inventory is used again
+            self.inventory.expire()
+
+        with self.__not_found_lock:
+            self.__not_found.clear()
+
+        if self.__select_import_api() == SAVED_OBJECTS_API:
+            return self.saved_objects.import_objects(objects['objects'], overwrite=force)
+
+        if not isinstance(objects['objects'], list):
+            objects = dict(objects, objects=list(objects['objects']))
+
+        return self.dashboard.import_objects(objects, force=force)
+
+    def __select_import_api(self):
+        """Select the API to import objects, based on the Kibana version.
+
+        The API is selected once and then cached, unless the version of
+        Kibana cannot be retrieved; in that case, the Dashboard API is used.
+
+        :returns the name of the API
+        """
+        if self.import_api is not None:
+            return self.import_api
+
+        version = self.get_version()
+        if not version:
+            # the version is unknown, the API is selected again on the next import
+            return DASHBOARD_API
+
+        self.import_api = SAVED_OBJECTS_API if self.__supports_saved_objects_api(version) else DASHBOARD_API
+        logger.debug("Objects will be imported to %s using the %s API", self.base_url, self.import_api)
+
+        return self.import_api
+
+    def __supports_saved_objects_api(self, version=None):
+        """Check whether the Kibana instance supports the import and export of the SavedObjects API.
+
+        :param version: version of Kibana, retrieved when it is not given
+        """
+        version = self.get_version() if version is None else version
+        major = version.split('.')[0]
+        return major.isdigit() and int(major) >= SAVED_OBJECTS_API_VERSION
+
+    def find_existing(self, objects):
+        """Find which objects of a list already exist in Kibana.
+
+        This method checks with a single request the existence of a list of
+        objects, without retrieving their content.
+
+        :param objects: list of Kibana objects (or dicts with their `type` and `id`)
+
+        :returns a set of tuples composed by the type and ID of the existing objects
         """
-        self.dashboard.import_objects(objects, force=force)
+        if not objects:
+            return set()
+
+        saved_objs = self.saved_objects.bulk_get(objects, fields=['title'])
+        existing = {(obj['type'], obj['id']) for obj in saved_objs if 'error' not in obj}
+
+        return existing
 
     def find_by_title(self, obj_type, obj_title):
         """Find an object by its type and title.
@@ -133,14 +313,20 @@ class Kibana:
 
         :returns the target object or None if not found
         """
-        url = urijoin(self.base_url, self.saved_objects.API_SAVED_OBJECTS_URL)
+        return self.__lookup(('title', obj_type, obj_title), self.__find_by_title, obj_type, obj_title)
+
+    def __find_by_title(self, obj_type, obj_title):
         found_obj = None
 
-        for page_objs in self.saved_objects.find(obj_type):
-            for obj in page_objs:
-                if obj['attributes']['title'] == obj_title:
-                    found_obj = obj
-                    break
+        if self.inventory:
+            objs = self.__find_inventory(obj_type).values()
+            found_obj = next((obj for obj in objs if obj['attributes']['title'] == obj_title), None)
+        else:
+            for page_objs in self.saved_objects.find(obj_type):
+                for obj in page_objs:
+                    if obj['attributes']['title'] == obj_title:
+                        found_obj = obj
+                        break
 
         if not found_obj:
             cause = "No %s found with title: %s" % (obj_type, obj_title)
@@ -152,23 +338,32 @@ class Kibana:
     def find_by_id(self, obj_type, obj_id):
         """Find an object by its type and ID.
 
-        This methods returns a Kibana object based on its type and ID.
+        This methods returns a Kibana object based on its type and ID,
+        retrieved with a single request, or from the inventory if the
+        objects of that type are already cached.
 
-        A `NotFoundError` is thrown if the object is not found in the Kibana instance.
+        A `NotFoundError` is thrown if the object is not found in the Kibana instance,
+        including when Kibana rejects the request with a 4xx status code (e.g., when
+        the type is unknown).
 
         :param obj_type: type of the target object
         :param obj_id: ID of the target object
 
-        :returns the target object or None if not found
+        :returns the target object
         """
-        url = urijoin(self.base_url, self.saved_objects.API_SAVED_OBJECTS_URL)
-        found_obj = None
+        return self.__lookup(('id', obj_type, obj_id), self.__find_by_id, obj_type, obj_id)
 
-        for page_objs in self.saved_objects.find(obj_type):
-            for obj in page_objs:
-                if obj['id'] == obj_id:
-                    found_obj = obj
-                    break
+    def __find_by_id(self, obj_type, obj_id):
+        if self.inventory and self.inventory.contains(obj_type):
+            found_obj = self.__find_inventory(obj_type).get(obj_id)
+        else:
+            try:
+                found_obj = self.saved_objects.get_object(obj_type, obj_id)
+            except requests.exceptions.HTTPError as error:
+                # Kibana rejects the unknown types (e.g., with a 400) instead of answering 404
+                if not 400 <= error.response.status_code < 500:
+                    raise error
+                found_obj = None
 
         if not found_obj:
             cause = "No %s found with ID: %s" % (obj_type, obj_id)
@@ -177,6 +372,38 @@ class Kibana:
 
         return found_obj
 
+    def __lookup(self, key, find, obj_type, value):
+        """Search an object, sharing the search with concurrent identical ones.
+
+        A `NotFoundError` is thrown without querying Kibana if the same search
+        did not find the object less than `not_found_ttl` seconds ago.
+
+        :param key: tuple identifying the search
+        :param find: method searching the object
+        :param obj_type: type of the target object
+        :param value: ID or title of the target object
+
+        :returns the target object
+        """
+        with self.__not_found_lock:
+            cached = self.__not_found.get(key)
+            if cached and cached[0] <= time.monotonic():
+                del self.__not_found[key]
+                cached = None
+
+        if cached:
+            cause = cached[1]
+            logger.error(cause)
+            raise NotFoundError(cause=cause)
+
+        try:
+            return self.__lookups.do(key, find, obj_type, value)
+        except NotFoundError as error:
+            if self.not_found_ttl > 0:
+                with self.__not_found_lock:
+                    self.__not_found[key] = (time.monotonic() + self.not_found_ttl, str(error))
+            raise
+
     def find_all(self):
         """Find all objects stored in Kibana.
 
@@ -186,6 +413,102 @@ class Kibana:
         """
         obj_types = [DASHBOARD, INDEX_PATTERN, SEARCH, VISUALIZATION]
         for obj_type in obj_types:
+            if self.inventory:
+                for obj in self.__find_inventory(obj_type).values():
+                    yield obj
+                continue
+
             for page_objs in self.saved_objects.find(obj_type):
                 for obj in page_objs:
                     yield obj
+
+    def __find_inventory(self, obj_type):
+        """Return the objects of a type cached in the inventory.
+
+        The inventory of `obj_type` is retrieved if it is not cached yet, and
+        validated if it expired.
+
+        :param obj_type: type of the objects
+
+        :returns a dict of objects indexed by ID
+        """
+        with self.inventory.lock:
+            if self.inventory.is_fresh(obj_type):
+                logger.debug("Inventory of %s is fresh", obj_type)
+            elif self.inventory.contains(obj_type):
+                self.__validate_inventory(obj_type)
+            else:
+                logger.info("Retrieving inventory of %s", obj_type)
+                self.inventory.store(obj_type, self.__find_type(obj_type))
+
+            return dict(self.inventory.objects(obj_type))
+
+    def __validate_inventory(self, obj_type):
+        """Validate the inventory of a type, retrieving the objects updated since it was cached.
+
+        The objects are retrieved sorted by `updated_at`, from the most recent one,
+        until an object older than the inventory is found. The IDs of the objects in
+        Kibana are compared with the ones in the inventory, listing only their IDs
+        when the pages retrieved do not include all of them. If the IDs do not match
+        (e.g., some objects were deleted), all the objects are retrieved.
+
+        :param obj_type: type of the objects
+        """
+        watermark = self.inventory.watermark(obj_type)
+        known = set(self.inventory.objects(obj_type))
+        updated = []
+        listed = set()
+        page = 1
+
+        try:
+            while True:
+                r_json = self.saved_objects.find_page(obj_type, page=page, per_page=INVENTORY_PAGE_SIZE,
+                                                      sort_field=UPDATED_AT, sort_order='desc')
+                page_objs = r_json['saved_objects']
+                total = r_json['total']
+                listed.update(obj['id'] for obj in page_objs)
+
+                newer = [obj for obj in page_objs if (obj.get(UPDATED_AT) or '') >= watermark]
+                updated.extend(newer)
+
+                if len(newer) < len(page_objs) or page * INVENTORY_PAGE_SIZE >= total:
+                    break
+                page += 1
+
+            if len(listed) < total:
+                listed = self.__find_ids(obj_type)
+        except (requests.exceptions.HTTPError, KeyError, TypeError) as error:
+            logger.warning("Impossible to validate the inventory of %s, %s", obj_type, error)
+            listed = None
+
+        known.update(obj['id'] for obj in updated)
+        if listed != known:
+            logger.info("Inventory of %s out of sync, retrieving all objects", obj_type)
+            self.inventory.store(obj_type, self.__find_type(obj_type))
+            return
+
+        logger.debug("Inventory of %s validated, %s object(s) updated", obj_type, len(updated))
+        self.inventory.update(obj_type, updated)
+
+    def __find_ids(self, obj_type):
+        """Return the IDs of the objects of a type stored in Kibana, without their attributes."""
+
+        ids = set()
+        page = 1
+
+        while True:
+            r_json = self.saved_objects.find_page(obj_type, page=page, per_page=INVENTORY_IDS_PAGE_SIZE, fields='id')
+            ids.update(obj['id'] for obj in r_json['saved_objects'])
+
+            if page * INVENTORY_IDS_PAGE_SIZE >= r_json['total']:
+                break
+            page += 1
+
+        return ids
+
+    def __find_type(self, obj_type):
+        """Return all the objects of a type stored in Kibana."""
+
+        for page_objs in self.saved_objects.find(obj_type):
+            for obj in page_objs:
+                yield obj
@@ -20,8 +20,9 @@
 #
 
 import logging
-import json
 
+from archimedes import codec
+from archimedes.meta_extractor import read_meta
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +47,11 @@ class KibanaObjMeta:
         self.updated_at = updated_at
 
     def __repr__(self):
+        return codec.dumps(self.to_dict(), sort_keys=True, indent=4)
+
+    def to_dict(self):
+        """Return the metadata as a dict, the same serialized by `repr`."""
+
         meta = {
             'id': self.id,
             'type': self.type,
@@ -56,7 +62,7 @@ class KibanaObjMeta:
         if self.updated_at:
             meta['updated_at'] = self.updated_at
 
-        return json.dumps(meta, sort_keys=True, indent=4)
+        return meta
 
     @classmethod
     def create_from_obj(cls, obj):
@@ -75,6 +81,17 @@ class KibanaObjMeta:
 
         return KibanaObjMeta(obj['id'], title, obj['type'], obj['version'], updated_at)
 
+    @classmethod
+    def create_from_file(cls, file_path):
+        """Create meta information corresponding to a Kibana object stored on disk.
+
+        This method reads only the metadata of the object, without decoding
+        the whole file.
+
+        :param file_path: path of the file storing the Kibana object
+        """
+        return cls.create_from_obj(read_meta(file_path))
+
     @classmethod
     def create_from_registry(cls, entry):
         """Create a meta information corresponding to a entry in the registry.
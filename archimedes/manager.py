@@ -19,15 +19,21 @@
 #   Valerio Cosentino <valcos@bitergia.com>
 #
 
+import concurrent.futures
+import fnmatch
+import glob
 import logging
-import json
+import multiprocessing
 import os
 
-from archimedes.clients.dashboard import (DASHBOARD,
-                                          INDEX_PATTERN,
-                                          SEARCH,
-                                          VISUALIZATION)
+from archimedes import codec
+from archimedes.clients.common import (DASHBOARD,
+                                       INDEX_PATTERN,
+                                       SEARCH,
+                                       VISUALIZATION)
 from archimedes.errors import NotFoundError, ObjectTypeError
+from archimedes.meta_extractor import read_meta
+from archimedes.spans import timed
 from archimedes.utils import load_json
 
 VISUALIZATIONS_FOLDER = 'visualizations'
@@ -36,6 +42,22 @@ SEARCHES_FOLDER = 'searches'
 
 JSON_EXT = '.json'
 
+# types of the objects stored on disk, as prefixes of the names of their files
+OBJECT_TYPES = [VISUALIZATION, INDEX_PATTERN, SEARCH, DASHBOARD]
+
+INDEX_PATTERN_REF_NAME = 'kibanaSavedObjectMeta.searchSourceJSON.index'
+
+# nested JSON strings whose decoded value is memoized
+NESTED_JSON_CACHE_SIZE = 1024
+
+# files decoded by each process of the pool, and minimum number of files to start it
+SCAN_CHUNK_SIZE = 64
+PARALLEL_SCAN_MIN_FILES = 512
+
+# start method of the processes of the pool; they are not forked from the
+# caller, which may run other threads (e.g., the batch and the daemon ones)
+SCAN_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
 logger = logging.getLogger(__name__)
 
 
@@ -45,14 +67,26 @@ class Manager:
     This class allows to find and manage dashboard, visualization,
     search and index pattern files saved on disk.
 
+    Only the root folder and the folders of visualizations, searches and index
+    patterns are scanned for object files, thus other folders (e.g., `.git`) are
+    never walked. More folders can be scanned with `include`, while the files
+    and folders matching `exclude` are skipped. Both are lists of glob patterns
+    relative to `root_path` (e.g., `extra/*`, `visualizations/*_draft.json`).
+
     ::param root_path: folder where visualizations, searches and index patterns are stored
+    :param include: glob patterns of other folders storing object files
+    :param exclude: glob patterns of the files and folders to skip
     """
-    def __init__(self, folder_path):
+    def __init__(self, folder_path, include=None, exclude=None):
         self.root_path = folder_path
+        self.include = include or []
+        self.exclude = exclude or []
         self.visualizations_folder = os.path.join(folder_path, VISUALIZATIONS_FOLDER)
         self.searches_folder = os.path.join(folder_path, SEARCHES_FOLDER)
         self.index_patterns_folder = os.path.join(folder_path, INDEX_PATTERNS_FOLDER)
+        self.nested_json = {}
 
+    @timed('manager.resolve')
     def find_dashboard_files(self, dashboard_path):
         """Find the dashboard-related files (visualizations, searches, index patterns) saved on disk.
 
@@ -72,8 +106,7 @@ class Manager:
             dashboard_files.append(dashboard_path)
             return dashboard_files
 
-        panels = json.loads(dash_content['attributes']['panelsJSON'])
-        for panel in panels:
+        for panel in self.find_panels(dash_content):
             if panel['type'] == VISUALIZATION:
                 panel_path = self.find_file_by_name(self.visualizations_folder, self.build_file_name(VISUALIZATION, panel['id']))
                 panel_files = self.find_visualization_files(panel_path)
@@ -91,6 +124,7 @@ class Manager:
 
         return dashboard_files
 
+    @timed('manager.resolve')
     def find_visualization_files(self, visualization_path):
         """Find the visualization-related files (searches, index patterns) saved on disk.
 
@@ -112,8 +146,8 @@ class Manager:
             logger.info("Index patterns won't be loaded for %s, index patterns folder doesn't exist",
                         visualization_path)
 
-        if 'savedSearchId' in vis_content['attributes'] and self.folder_exists(self.searches_folder):
-            search_id = vis_content['attributes']['savedSearchId']
+        search_id = self.find_saved_search(vis_content)
+        if search_id and self.folder_exists(self.searches_folder):
             search_path = self.find_file_by_name(self.searches_folder, self.build_file_name(SEARCH, search_id))
             if search_path not in visualization_files:
                 visualization_files.append(search_path)
@@ -125,6 +159,7 @@ class Manager:
 
         return visualization_files
 
+    @timed('manager.resolve')
     def find_search_files(self, search_path):
         """Find the search-related files (index patterns) saved on disk.
 
@@ -150,19 +185,74 @@ class Manager:
 
         return search_files
 
+    def find_panels(self, dashboard):
+        """Find the panels of a `dashboard`.
+
+        This method extracts the type and ID of the objects shown in a dashboard. The
+        panels are read from the `panelsJSON` attribute; when a panel points to one of
+        the `references` of the dashboard through its `panelRefName`, the type and ID
+        are taken from that reference. Other references (e.g., the index patterns of
+        the filters) are ignored.
+
+        :param dashboard: Kibana dashboard
+
+        :returns the list of panels, as dicts with their `type` and `id`
+        """
+        references = {ref['name']: ref for ref in dashboard.get('references', [])}
+
+        panels = []
+        for panel in self.__load_nested_json(dashboard, 'panelsJSON', dashboard['attributes']['panelsJSON']):
+            ref_name = panel.get('panelRefName')
+            if ref_name is None:
+                panels.append(panel)
+            elif ref_name in references:
+                ref = references[ref_name]
+                panels.append({'type': ref['type'], 'id': ref['id']})
+            else:
+                cause = "Reference %s not found in dashboard %s" % (ref_name, dashboard.get('id'))
+                logger.error(cause)
+                raise NotFoundError(cause=cause)
+
+        return panels
+
+    def find_saved_search(self, obj):
+        """Find the saved search id in an `obj`.
+
+        This method extracts the search a Kibana object is built on. The `references`
+        of the object are used when available, otherwise the search is read from the
+        `savedSearchId` attribute.
+
+        :param obj: Kibana object
+
+        :returns the saved search id
+        """
+        ref_name = obj['attributes'].get('savedSearchRefName')
+        for ref in obj.get('references', []):
+            if ref['type'] == SEARCH and (not ref_name or ref['name'] == ref_name):
+                return ref['id']
+
+        return obj['attributes'].get('savedSearchId')
+
     def find_index_pattern(self, obj):
         """Find the index pattern id in an `obj`.
 
-        This method extracts the index pattern defined in a Kibana object.
+        This method extracts the index pattern defined in a Kibana object. The `references`
+        of the object are used when available, otherwise the index pattern is read from
+        the `searchSourceJSON` attribute.
 
         :param obj: Kibana object
 
         :returns the index pattern id
         """
+        for ref in obj.get('references', []):
+            if ref['type'] == INDEX_PATTERN and ref['name'] == INDEX_PATTERN_REF_NAME:
+                return ref['id']
+
         index_pattern = None
         if 'kibanaSavedObjectMeta' in obj['attributes'] \
                 and 'searchSourceJSON' in obj['attributes']['kibanaSavedObjectMeta']:
-            search_content = json.loads(obj['attributes']['kibanaSavedObjectMeta']['searchSourceJSON'])
+            search_source = obj['attributes']['kibanaSavedObjectMeta']['searchSourceJSON']
+            search_content = self.__load_nested_json(obj, 'searchSourceJSON', search_source)
             if 'index' not in search_content:
                 return index_pattern
 
@@ -170,6 +260,33 @@ class Manager:
 
         return index_pattern
 
+    def __load_nested_json(self, obj, field, value):
+        """Decode a JSON string nested in a Kibana object.
+
+        The decoded value is memoized per object and field, and it is reused
+        as long as the string stored in the object does not change. Up to
+        `NESTED_JSON_CACHE_SIZE` values are kept, the oldest ones are evicted.
+
+        :param obj: Kibana object
+        :param field: name of the field containing the JSON string
+        :param value: the JSON string
+
+        :returns the decoded value
+        """
+        key = (obj.get('type'), obj.get('id'), field)
+
+        cached = self.nested_json.get(key)
+        if cached and cached[0] == value:
+            return cached[1]
+
+        decoded = codec.loads(value)
+        self.nested_json.pop(key, None)
+        if len(self.nested_json) >= NESTED_JSON_CACHE_SIZE:
+            self.nested_json.pop(next(iter(self.nested_json), None), None)
+        self.nested_json[key] = (value, decoded)
+
+        return decoded
+
     def build_folder_path(self, obj_type):
         """Build the path of a folder according to the object type.
 
@@ -197,6 +314,7 @@ class Manager:
         os.makedirs(folder_path, exist_ok=True)
         return folder_path
 
+    @timed('manager.save_obj')
     def save_obj(self, obj, force=False):
         """Save the object to disk.
 
@@ -211,7 +329,7 @@ class Manager:
         folder = self.build_folder_path(obj['type'])
         file_path = os.path.join(self.root_path, folder, self.build_file_name(obj['type'], obj['id']))
 
-        content = json.dumps(obj, sort_keys=True, indent=4)
+        content = codec.dumps(obj, sort_keys=True, indent=4)
 
         if os.path.exists(file_path) and not force:
             logger.warning("Object already exists at %s, it won't be overwritten", file_path)
@@ -222,6 +340,7 @@ class Manager:
             logger.info("Object saved at %s", file_path)
 
     @staticmethod
+    @timed('manager.lookup')
     def find_file_by_content_title(folder_path, content_title):
         """Find a file on disk by its content title.
 
@@ -243,8 +362,8 @@ class Manager:
         found = None
         for file_name in files:
             file_path = os.path.join(folder_path, file_name)
-            content = load_json(file_path)
-            if content['attributes']['title'] == content_title:
+            meta = read_meta(file_path)
+            if meta['attributes'].get('title') == content_title:
                 found = file_path
                 break
 
@@ -256,6 +375,7 @@ class Manager:
         return found
 
     @staticmethod
+    @timed('manager.lookup')
     def find_file_by_name(folder_path, target_name):
         """Find a file on disk by its name.
 
@@ -286,23 +406,128 @@ class Manager:
 
         return found
 
-    def find_all(self):
+    def find_all(self, obj_type=None, meta_only=False, workers=None):
         """Find all objects on disk.
 
         This method returns all objects stored on disk together with their corresponding file paths.
+        If `obj_type` is set, only the objects of that type are returned. If `meta_only` is set,
+        only the metadata of the objects is returned (i.e., `id`, `type`, `version`, `updated_at`
+        and the `title` in `attributes`), which can be used to create a `KibanaObjMeta`. The
+        metadata is scanned from the files without decoding the rest of their content.
+
+        When there are at least `PARALLEL_SCAN_MIN_FILES` files, they are read and decoded
+        by a pool of `workers` processes (as many as CPUs by default), started with the
+        `SCAN_START_METHOD` method. The objects are always returned in the order of
+        `find_files`, while they are decoded. When the generator is closed before the end,
+        the files not decoded yet are discarded.
+
+        :param obj_type: type of the objects to return
+        :param meta_only: return only the metadata of the objects
+        :param workers: number of processes decoding the files
 
         :returns: a generator of tuples composed by Kibana objects and their file paths
         """
-        for path, subdirs, files in os.walk(self.root_path):
-            for name in files:
-                if not any(name.startswith(t) for t in [VISUALIZATION, INDEX_PATTERN, SEARCH, DASHBOARD]):
+        file_paths = [file_path for file_type, file_path in self.find_files()
+                      if not obj_type or file_type == obj_type]
+
+        load = read_meta if meta_only else load_json
+        workers = workers or os.cpu_count() or 1
+
+        if workers == 1 or len(file_paths) < PARALLEL_SCAN_MIN_FILES:
+            for file_path in file_paths:
+                yield file_path, load(file_path)
+            return
+
+        logger.debug("Decoding %s files with %s processes", len(file_paths), workers)
+        context = multiprocessing.get_context(SCAN_START_METHOD)
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+        chunks = [file_paths[i:i + SCAN_CHUNK_SIZE] for i in range(0, len(file_paths), SCAN_CHUNK_SIZE)]
+        futures = [executor.submit(load_files, load, chunk) for chunk in chunks]
+        try:
+            for chunk, future in zip(chunks, futures):
+                for file_path, content in zip(chunk, future.result()):
+                    yield file_path, content
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def find_files(self, folders=None):
+        """Find the paths of all object files on disk.
+
+        This method returns the paths of the files storing Kibana objects, without
+        reading their content. The type of each file is derived from its name. Only
+        the files directly stored in the folders returned by `find_folders` (or in
+        `folders`, when given) are considered. The files in a folder are returned in
+        alphabetical order, thus the paths are always returned in the same order.
+
+        :param folders: folders to scan instead of the ones of `find_folders`
+
+        :returns: a generator of tuples composed by object types and file paths
+        """
+        for folder_path in self.find_folders() if folders is None else folders:
+            try:
+                entries = sorted(os.scandir(folder_path), key=lambda entry: entry.name)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+
+                file_type = self.find_file_type(entry.name)
+                if not file_type or self.is_excluded(entry.path):
                     continue
 
-                file_path = os.path.join(path, name)
-                with open(file_path, 'r') as f:
-                    content = f.read()
-                content = json.loads(content)
-                yield file_path, content
+                yield file_type, entry.path
+
+    @staticmethod
+    def find_file_type(file_name):
+        """Find the type of the objects stored in a file, based on its name.
+
+        :param file_name: name of the file
+
+        :returns: the type of the objects, None if it is not an object file
+        """
+        if not file_name.endswith(JSON_EXT):
+            return None
+
+        return next((obj_type for obj_type in OBJECT_TYPES if file_name.startswith(obj_type)), None)
+
+    def find_folders(self):
+        """Find the folders where object files are stored.
+
+        This method returns the root folder followed, in alphabetical order, by
+        the folders of visualizations, searches and index patterns and the ones
+        matching the `include` patterns. The folders matching the `exclude`
+        patterns are skipped, while the root folder is always returned.
+
+        :returns: a list of folder paths
+        """
+        folders = {self.visualizations_folder, self.searches_folder, self.index_patterns_folder}
+
+        root_pattern = glob.escape(self.root_path)
+        for pattern in self.include:
+            folders.update(os.path.join(self.root_path, os.path.relpath(path, self.root_path))
+                           for path in glob.glob(os.path.join(root_pattern, pattern)) if os.path.isdir(path))
+
+        root = os.path.normpath(self.root_path)
+        folders = [folder for folder in folders
+                   if os.path.normpath(folder) != root and not self.is_excluded(folder)]
+
+        return [self.root_path] + sorted(folders)
+
+    def is_excluded(self, path):
+        """Check whether a file or folder matches the `exclude` patterns.
+
+        :param path: the path of a file or folder under the root folder
+        """
+        if not self.exclude:
+            return False
+
+        relative_path = os.path.relpath(path, self.root_path).replace(os.sep, '/')
+        return any(fnmatch.fnmatchcase(relative_path, pattern) for pattern in self.exclude)
 
     @staticmethod
     def build_file_name(obj_type, obj_id):
@@ -333,3 +558,14 @@ class Manager:
         files = [f for f in os.listdir(folder_path)
                  if os.path.isfile(os.path.join(folder_path, f)) and f.endswith(JSON_EXT)]
         return files
+
+
+def load_files(load, file_paths):
+    """Read and decode a list of files, in a process of the pool of `Manager.find_all`.
+
+    :param load: function to read and decode a file
+    :param file_paths: paths of the files
+
+    :returns: a list with the content of the files
+    """
+    return [load(file_path) for file_path in file_paths]
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import json
+import logging
+
+from archimedes.spans import timed
+from archimedes.utils import load_json
+
+META_KEYS = ['id', 'type', 'version', 'updated_at']
+TITLE = 'title'
+ATTRIBUTES = 'attributes'
+
+_INDENT = '\n    '
+_DECODER = json.JSONDecoder()
+
+logger = logging.getLogger(__name__)
+
+
+@timed('read_meta')
+def read_meta(file_path):
+    """Read the metadata of the Kibana object stored in a file.
+
+    The members of the object are located in the file without decoding
+    it: only the values of the top-level keys in `META_KEYS` and the `title`
+    in `attributes` are decoded, while the others (e.g., the `fields` of
+    index patterns) are skipped. When the file does not follow the layout
+    of the files saved by archimedes (e.g., a list of objects), it is fully
+    decoded.
+
+    :param file_path: the path of a JSON file
+
+    :returns: a dict with the `id`, `type`, `version`, `updated_at` and `title` of the object
+    """
+    with open(file_path, 'r') as f:
+        content = f.read()
+
+    try:
+        return scan_meta(content)
+    except ValueError:
+        logger.debug("Metadata of %s not scanned, decoding the whole file", file_path)
+
+    return extract_meta(load_json(file_path))
+
+
+def scan_meta(content):
+    """Scan the metadata of a Kibana object encoded as JSON with an indent of 4.
+
+    In that layout, every member of the object starts on a new line
+    indented according to its depth, while the new lines within strings
+    are escaped. Thus, the members are found searching backwards their
+    keys preceded by the indentation of their depth: when the keys are
+    sorted, the metadata follows the attributes of the object, so their
+    content is not read. A `ValueError` is thrown if `content` does not
+    follow that layout or it is not a single object.
+
+    :param content: JSON string encoding a Kibana object
+
+    :returns: a dict with the metadata of the object
+    """
+    if not content.startswith('{' + _INDENT + '"'):
+        raise ValueError("layout not supported")
+
+    meta = {}
+    for key in META_KEYS:
+        pos = _find_member(content, key)
+        if pos >= 0:
+            meta[key] = _DECODER.raw_decode(content, pos)[0]
+
+    if 'id' not in meta:
+        raise ValueError("not a Kibana object")
+
+    meta[ATTRIBUTES] = {}
+
+    pos = _find_member(content, TITLE, indent=_INDENT + '    ')
+    if pos < 0:
+        return meta
+
+    parent = content.rfind(_INDENT + '"', 0, pos)
+    if not content.startswith(_INDENT + json.dumps(ATTRIBUTES) + ': {', parent):
+        raise ValueError("title not in attributes")
+
+    meta[ATTRIBUTES][TITLE] = _DECODER.raw_decode(content, pos)[0]
+
+    return meta
+
+
+def extract_meta(obj):
+    """Extract the metadata of a Kibana object.
+
+    The metadata includes the keys of the object in `META_KEYS` and, if set,
+    the `title` in its `attributes`.
+
+    :param obj: Kibana object
+
+    :returns: a dict with the metadata of the object
+    """
+    meta = {key: obj[key] for key in META_KEYS if key in obj}
+
+    attributes = obj.get(ATTRIBUTES) or {}
+    meta[ATTRIBUTES] = {TITLE: attributes[TITLE]} if TITLE in attributes else {}
+
+    return meta
+
+
+def _find_member(content, key, indent=_INDENT):
+    """Return the position of the value of the last member `key`, -1 if not found."""
+
+    member = indent + json.dumps(key) + ': '
+    pos = content.rfind(member)
+
+    return pos if pos < 0 else pos + len(member)
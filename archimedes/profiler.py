@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import collections
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+
+PSTATS = 'pstats'
+COLLAPSED = 'collapsed'
+PROFILE_FORMATS = [PSTATS, COLLAPSED]
+
+PROFILE_TOP = 20
+SAMPLING_INTERVAL = 0.005
+
+logger = logging.getLogger(__name__)
+
+
+class Profiler:
+    """Profiler class.
+
+    This class profiles the code run between `start` and `stop`. With the
+    `pstats` format, the code runs under cProfile and the statistics are
+    saved to `path` as a pstats file. With the `collapsed` format, the
+    stack of the profiled thread is sampled every `interval` seconds and
+    the samples are saved as collapsed stacks (one `frame;frame;... count`
+    line per stack), the input of flame graph tools. In both cases, a
+    summary of the `top` hottest functions is written to `stream`.
+
+    :param path: path of the profile file
+    :param fmt: format of the profile, `pstats` or `collapsed`
+    :param top: number of functions listed in the summary
+    :param interval: seconds between two samples of the `collapsed` format
+    :param stream: where the summary is written, stderr by default
+    """
+    def __init__(self, path, fmt=PSTATS, top=PROFILE_TOP, interval=SAMPLING_INTERVAL, stream=None):
+        if fmt not in PROFILE_FORMATS:
+            raise ValueError("Unknown profile format %s" % fmt)
+
+        self.path = path
+        self.fmt = fmt
+        self.top = top
+        self.interval = interval
+        self.stream = stream
+        self._profile = None
+        self._sampler = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Start profiling the current thread."""
+
+        if self.fmt == PSTATS:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = _Sampler(threading.get_ident(), self.interval)
+            self._sampler.start()
+
+    def stop(self):
+        """Stop profiling, save the profile and write the summary."""
+
+        if self.fmt == PSTATS:
+            self._profile.disable()
+            self._profile.dump_stats(self.path)
+        else:
+            self._sampler.stop()
+            with open(self.path, 'w') as f:
+                for stack, count in sorted(self._sampler.stacks.items()):
+                    f.write("%s %s\n" % (stack, count))
+
+        logger.info("Profile saved at %s", self.path)
+
+        stream = self.stream or sys.stderr
+        stream.write(self.summary())
+
+    def summary(self):
+        """Return a summary of the hottest functions of the profile."""
+
+        if self.fmt == PSTATS:
+            output = io.StringIO()
+            stats = pstats.Stats(self._profile, stream=output)
+            stats.sort_stats('cumulative').print_stats(self.top)
+            return output.getvalue()
+
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in self._sampler.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+
+        n_samples = max(sum(self._sampler.stacks.values()), 1)
+        lines = ["%d samples, every %g ms" % (n_samples, self.interval * 1000),
+                 "%8s %8s  %s" % ('own %', 'total %', 'function')]
+        for frame, count in own.most_common(self.top):
+            lines.append("%8.1f %8.1f  %s" % (count * 100 / n_samples, total[frame] * 100 / n_samples, frame))
+
+        return '\n'.join(lines) + '\n'
+
+
+class _Sampler(threading.Thread):
+    """Thread sampling the stack of another thread."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+
+            stack = []
+            while frame:
+                code = frame.f_code
+                stack.append("%s (%s:%s)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
@@ -19,10 +19,10 @@
 #   Valerio Cosentino <valcos@bitergia.com>
 #
 
-import json
 import logging
 import os
 
+from archimedes import codec
 from archimedes.errors import NotFoundError, RegistryError
 from archimedes.kibana_obj_meta import KibanaObjMeta
 from archimedes.utils import load_json
@@ -66,6 +66,25 @@ class Registry:
             self.__create_registry()
 
         self.content = load_json(self.path)
+        self.mtime = self.__mtime()
+
+    def refresh(self):
+        """Reload the registry if the file was modified by another process.
+
+        The registry file is reloaded only when its modification time changed
+        since it was last loaded or saved.
+
+        :returns True if the registry was reloaded, False otherwise
+        """
+        mtime = self.__mtime()
+        if mtime == self.mtime:
+            return False
+
+        self.content = load_json(self.path) if mtime is not None else {}
+        self.mtime = mtime
+        logger.debug("Registry reloaded from %s", self.path)
+
+        return True
 
     def find_all(self, obj_type=None):
         """Find all meta information related to the Kibana objects stored in the registry.
@@ -150,14 +169,14 @@ class Registry:
 
         if not duplicate_alias:
             next_key = str(len(self.content.keys()) + 1)
-            self.content[next_key] = json.loads(repr(meta_obj))
+            self.content[next_key] = codec.loads(repr(meta_obj))
 
             self.__save_registry(self.content)
             logger.info("Metadata for object %s with alias %s added to the registry", meta_obj.id, next_key)
             return
 
         if force:
-            self.content[duplicate_alias] = json.loads(repr(meta_obj))
+            self.content[duplicate_alias] = codec.loads(repr(meta_obj))
 
             logger.info("Metadata for object %s already exists in the registry. Overwriting alias %s",
                         meta_obj.id, duplicate_alias)
@@ -200,10 +219,18 @@ class Registry:
 
     def __save_registry(self, content):
         with open(self.path, 'w') as f:
-            dumped = json.dumps(content, sort_keys=True, indent=4)
+            dumped = codec.dumps(content, sort_keys=True, indent=4)
             f.write(dumped)
             logger.info("Registry saved")
 
+        self.mtime = self.__mtime()
+
+    def __mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
     def __check_duplicates(self, attr, value):
         alias = None
         for k in self.content.keys():
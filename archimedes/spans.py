@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import datetime
+import functools
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Spans:
+    """Spans class.
+
+    This class measures how long the phases of a run take (e.g., file lookups,
+    JSON loading, dependency resolution, Kibana requests). The time of each
+    phase is aggregated by name: `total` is the time spent inside the phase,
+    counting once the nested spans with the same name (e.g., recursive calls),
+    while `self` excludes the time spent in other nested phases.
+
+    Spans are not measured until `enable` is called, thus the instrumented
+    code pays a single attribute check when no report is requested.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.started_at = None
+        self.phases = {}
+        self._start = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def enable(self):
+        """Start measuring the spans, discarding the previous measures."""
+
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        """Stop measuring the spans."""
+
+        self.enabled = False
+
+    def reset(self):
+        """Discard the measures recorded so far."""
+
+        with self._lock:
+            self.phases = {}
+            self.started_at = datetime.datetime.now(datetime.timezone.utc)
+            self._start = time.perf_counter()
+
+    def span(self, name):
+        """Return a context manager measuring the phase `name`.
+
+        :param name: name of the phase
+        """
+        if not self.enabled:
+            return _NO_SPAN
+
+        return _Span(self, name)
+
+    def to_dict(self):
+        """Return the measures of the run as a dict.
+
+        :returns a dict with the start time, the wall time and the measures of each phase
+        """
+        with self._lock:
+            phases = {name: dict(phase) for name, phase in self.phases.items()}
+
+        return {
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'wall_time': time.perf_counter() - self._start if self._start else 0,
+            'phases': phases
+        }
+
+    def write_report(self, path, extra=None):
+        """Write the measures of the run to a JSON file.
+
+        :param path: path of the report
+        :param extra: dict of additional entries of the report
+        """
+        report = self.to_dict()
+        report.update(extra or {})
+
+        with open(path, 'w') as f:
+            f.write(json.dumps(report, sort_keys=True, indent=4))
+
+        logger.info("Run report saved at %s", path)
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        return stack
+
+    def _record(self, name, elapsed, self_time, outermost):
+        with self._lock:
+            phase = self.phases.get(name)
+            if not phase:
+                phase = self.phases[name] = {'count': 0, 'total': 0, 'self': 0, 'max': 0}
+
+            phase['count'] += 1
+            phase['self'] += self_time
+            if outermost:
+                phase['total'] += elapsed
+                phase['max'] = max(phase['max'], elapsed)
+
+
+class _Span:
+    """Context manager measuring a single span."""
+
+    __slots__ = ('spans', 'name', 'start', 'children', 'outermost')
+
+    def __init__(self, spans, name):
+        self.spans = spans
+        self.name = name
+        self.start = None
+        self.children = 0
+        self.outermost = True
+
+    def __enter__(self):
+        stack = self.spans._stack()
+        self.outermost = all(span.name != self.name for span in stack)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.start
+
+        stack = self.spans._stack()
+        stack.pop()
+        if stack:
+            stack[-1].children += elapsed
+
+        self.spans._record(self.name, elapsed, elapsed - self.children, self.outermost)
+        return False
+
+
+class _NoSpan:
+    """Context manager doing nothing, used when the spans are disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+# spans of the current run
+SPANS = Spans()
+
+
+def span(name):
+    """Measure the phase `name` in the spans of the current run."""
+
+    return SPANS.span(name)
+
+
+def timed(name):
+    """Decorator measuring each call of a function as the phase `name`.
+
+    :param name: name of the phase
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not SPANS.enabled:
+                return func(*args, **kwargs)
+
+            with SPANS.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
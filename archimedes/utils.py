@@ -19,9 +19,12 @@
 #   Valerio Cosentino <valcos@bitergia.com>
 #
 
-import json
+from archimedes import codec
 
+from archimedes.spans import timed
 
+
+@timed('load_json')
 def load_json(file_path):
     """Load JSON content from file.
 
@@ -29,8 +32,8 @@ def load_json(file_path):
 
     :returns: JSON content
     """
-    with open(file_path, 'r') as f:
+    with open(file_path, 'rb') as f:
         content = f.read()
 
-    json_content = json.loads(content)
+    json_content = codec.loads(content)
     return json_content
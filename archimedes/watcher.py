@@ -0,0 +1,452 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import collections
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+from archimedes.archimedes import IMPORT_ORDER
+from archimedes.clients.common import (DASHBOARD,
+                                       INDEX_PATTERN,
+                                       SEARCH,
+                                       VISUALIZATION,
+                                       ImportReport)
+from archimedes.utils import load_json
+
+DEBOUNCE_SECONDS = 0.5
+POLL_INTERVAL = 1.0
+
+# inotify flags, see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+EVENTS_BUFFER_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class Watcher:
+    """Watcher class.
+
+    This class watches the folders of the `manager` (i.e., the root folder,
+    the folders of visualizations, searches and index patterns and the ones
+    included) and re-imports to Kibana the objects stored in the files that
+    change, except the ones excluded by the `manager`.
+
+    The changes are notified by inotify when available, otherwise the
+    folders are polled every `poll_interval` seconds. The changes are
+    debounced: they are collected until no file changes for `debounce`
+    seconds, then the objects changed are re-imported, overwriting the ones
+    in Kibana, with a single batched request. The dashboards affected by
+    the changes are found with a `DependencyIndex`, thus the closure of
+    each dashboard is not resolved again.
+
+    :param archimedes: Archimedes object whose objects are watched
+    :param debounce: seconds without changes before re-importing the objects
+    :param poll_interval: seconds between two scans of the folders when polling
+    :param polling: poll the folders even if inotify is available
+    """
+    def __init__(self, archimedes, debounce=DEBOUNCE_SECONDS, poll_interval=POLL_INTERVAL, polling=False):
+        self.archimedes = archimedes
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.polling = polling
+        self.index = DependencyIndex(archimedes.manager)
+        self.pending = set()
+
+    @property
+    def folders(self):
+        """Folders watched for changes."""
+
+        return self.archimedes.manager.find_folders()
+
+    def run(self, stop=None):
+        """Watch the folders and re-import the objects changed.
+
+        :param stop: threading.Event which stops the watcher when set
+
+        :returns a generator of results, one per batch of changes
+        """
+        stop = stop or threading.Event()
+
+        monitor = self.__create_monitor()
+        self.index.build(path for _, path in self.archimedes.manager.find_files())
+        logger.info("Watching %s for changes", self.archimedes.manager.root_path)
+
+        try:
+            while not stop.is_set():
+                changed = monitor.wait(self.poll_interval)
+                if not changed and not self.pending:
+                    continue
+
+                while not stop.is_set():
+                    pending = monitor.wait(self.debounce)
+                    if not pending:
+                        break
+                    changed |= pending
+
+                yield self.process(changed)
+        finally:
+            monitor.close()
+
+    def process(self, paths):
+        """Re-import the objects stored in a set of changed files.
+
+        The dependency index is updated with the new content of the files. The
+        objects of the files deleted are not removed from Kibana.
+
+        When the import fails (e.g., Kibana is not reachable), the error is
+        reported in the result and the files changed are kept in `pending`,
+        thus they are processed again, together with the next changes, in
+        the next cycle of the watcher.
+
+        :param paths: paths of the files changed
+
+        :returns a dict with the files changed, the dashboards affected and the import report
+        """
+        # requests is imported only when watching, it is not needed to parse the arguments
+        import requests
+
+        paths = set(paths) | self.pending
+        self.pending = set()
+
+        changed = []
+        deleted = []
+        objs = []
+        for path in sorted(paths):
+            if self.archimedes.manager.is_excluded(path):
+                continue
+            if not os.path.isfile(path):
+                self.index.remove(path)
+                deleted.append(path)
+                continue
+
+            path_objs = self.index.update(path)
+            if path_objs is not None:
+                changed.append(path)
+                objs.extend(path_objs)
+
+        order = {obj_type: position for position, obj_type in enumerate(IMPORT_ORDER)}
+        objs.sort(key=lambda obj: order.get(obj['type'], len(order)))
+
+        report = ImportReport()
+        error = None
+        if objs:
+            logger.info("Re-importing %s object(s) from %s changed file(s)", len(objs), len(changed))
+            try:
+                report = self.archimedes.kibana.import_objects({'objects': objs}, force=True)
+            except requests.exceptions.RequestException as exc:
+                error = str(exc)
+                self.pending.update(changed)
+                logger.error("Objects of %s changed file(s) not imported, they will be retried, %s",
+                             len(changed), error)
+
+        dashboards = sorted(self.index.find_dashboards(changed + deleted))
+        if dashboards:
+            logger.info("Dashboards affected: %s", ', '.join(dashboards))
+
+        return {
+            'changed': changed,
+            'deleted': deleted,
+            'dashboards': dashboards,
+            'imported': len(report.imported),
+            'conflicts': len(report.conflicts),
+            'errors': len(report.errors),
+            'error': error,
+            'pending': sorted(self.pending)
+        }
+
+    def __create_monitor(self):
+        if not self.polling:
+            try:
+                return InotifyMonitor(self.archimedes.manager)
+            except OSError as error:
+                logger.warning("inotify not available, polling for changes, %s", error)
+
+        return PollingMonitor(self.archimedes.manager)
+
+
+class DependencyIndex:
+    """Reverse dependency index of the objects on disk.
+
+    This class stores, for each file, the type and ID of the objects it contains
+    and the files of the objects they reference (panels, saved searches and index
+    patterns), and for each file the files referencing it. Thus, the dashboards
+    affected by a change can be found without loading again the files on disk.
+
+    :param manager: Manager of the files on disk
+    """
+    def __init__(self, manager):
+        self.manager = manager
+        self.keys = {}
+        self.dependencies = {}
+        self.dependents = collections.defaultdict(set)
+
+    def build(self, paths):
+        """Index the objects stored in a list of files.
+
+        :param paths: paths of the files
+        """
+        for path in paths:
+            self.update(path)
+
+        logger.debug("Dependency index built, %s file(s)", len(self.keys))
+
+    def update(self, path):
+        """Index again the objects stored in a file.
+
+        The file is not indexed if its content is not valid JSON (e.g., it is
+        being written), in that case the previous version of the file is kept.
+
+        :param path: path of the file
+
+        :returns the list of objects stored in the file, None if it was not indexed
+        """
+        try:
+            content = load_json(path)
+        except (OSError, ValueError) as error:
+            logger.warning("File %s not indexed, %s", path, error)
+            return None
+
+        if not content:
+            objs = []
+        elif 'objects' in content:
+            objs = content['objects']
+        else:
+            objs = [content]
+
+        dependencies = set()
+        for obj in objs:
+            dependencies.update(self.__find_dependencies(obj))
+
+        self.__unlink(path)
+        self.keys[path] = [(obj.get('type'), obj.get('id')) for obj in objs]
+        self.dependencies[path] = dependencies
+        for dependency in dependencies:
+            self.dependents[dependency].add(path)
+
+        return objs
+
+    def remove(self, path):
+        """Remove a file from the index.
+
+        :param path: path of the file
+        """
+        self.__unlink(path)
+        self.keys.pop(path, None)
+
+    def find_dependents(self, paths):
+        """Find the files that depend, directly or not, on a list of files.
+
+        :param paths: paths of the files
+
+        :returns a set of paths, including the ones given
+        """
+        found = set(paths)
+        pending = list(paths)
+        while pending:
+            for dependent in self.dependents.get(pending.pop(), ()):
+                if dependent not in found:
+                    found.add(dependent)
+                    pending.append(dependent)
+
+        return found
+
+    def find_dashboards(self, paths):
+        """Find the IDs of the dashboards affected by changes in a list of files.
+
+        :param paths: paths of the files changed
+
+        :returns a set of dashboard IDs
+        """
+        return {obj_id for path in self.find_dependents(paths)
+                for obj_type, obj_id in self.keys.get(path, []) if obj_type == DASHBOARD}
+
+    def __unlink(self, path):
+        for dependency in self.dependencies.pop(path, ()):
+            self.dependents[dependency].discard(path)
+            if not self.dependents[dependency]:
+                del self.dependents[dependency]
+
+    def __find_dependencies(self, obj):
+        obj_type = obj.get('type')
+        if 'attributes' not in obj:
+            return []
+
+        refs = []
+        if obj_type == DASHBOARD:
+            refs = [(panel['type'], panel['id']) for panel in self.manager.find_panels(obj)]
+        elif obj_type in [VISUALIZATION, SEARCH]:
+            search_id = self.manager.find_saved_search(obj) if obj_type == VISUALIZATION else None
+            if search_id:
+                refs.append((SEARCH, search_id))
+            index_pattern_id = self.manager.find_index_pattern(obj)
+            if index_pattern_id:
+                refs.append((INDEX_PATTERN, index_pattern_id))
+
+        folders = {
+            VISUALIZATION: self.manager.visualizations_folder,
+            SEARCH: self.manager.searches_folder,
+            INDEX_PATTERN: self.manager.index_patterns_folder
+        }
+
+        return [os.path.join(folders[ref_type], self.manager.build_file_name(ref_type, ref_id))
+                for ref_type, ref_id in refs if ref_type in folders]
+
+
+class InotifyMonitor:
+    """Monitor of file changes based on inotify.
+
+    An `OSError` is thrown if inotify is not available.
+
+    :param manager: Manager whose folders are watched; the ones not existing
+        yet are watched once created
+    """
+    def __init__(self, manager):
+        # ctypes is imported only when watching, it is not needed by the other commands
+        import ctypes
+        import ctypes.util
+
+        self.manager = manager
+        self.folders = manager.find_folders()
+        self._get_errno = ctypes.get_errno
+
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            init = self._libc.inotify_init1
+        except (AttributeError, OSError, TypeError):
+            raise OSError("inotify not supported")
+
+        self._fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            errno = self._get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        self._watches = {}
+        for folder in self.folders:
+            if os.path.isdir(folder):
+                self._add_watch(folder)
+
+    def wait(self, timeout):
+        """Wait for changes in the object files.
+
+        :param timeout: maximum number of seconds to wait
+
+        :returns the set of paths changed
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        try:
+            data = os.read(self._fd, EVENTS_BUFFER_SIZE)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+            offset += length
+
+            folder = self._watches.get(wd)
+            if not folder or not name:
+                continue
+
+            path = os.path.join(folder, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and path in self.folders:
+                    self._add_watch(path)
+                    changed.update(file_path for _, file_path in self.manager.find_files([path]))
+            elif self.manager.find_file_type(name) and not (mask & IN_CREATE):
+                changed.add(path)
+
+        return changed
+
+    def close(self):
+        """Stop watching the folders."""
+
+        os.close(self._fd)
+
+    def _add_watch(self, folder):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            errno = self._get_errno()
+            logger.warning("Impossible to watch %s, %s", folder, os.strerror(errno))
+            return
+
+        self._watches[wd] = folder
+
+
+class PollingMonitor:
+    """Monitor of file changes based on polling.
+
+    The changes are detected comparing the modification time and the size
+    of the object files between two scans of the folders.
+
+    :param manager: Manager whose folders are watched
+    """
+    def __init__(self, manager):
+        self.manager = manager
+        self._snapshot = self._scan()
+
+    def wait(self, timeout):
+        """Wait `timeout` seconds and return the object files changed.
+
+        :param timeout: number of seconds to wait
+
+        :returns the set of paths changed
+        """
+        time.sleep(timeout)
+
+        snapshot = self._scan()
+        changed = {path for path, stat in snapshot.items() if self._snapshot.get(path) != stat}
+        changed.update(path for path in self._snapshot if path not in snapshot)
+        self._snapshot = snapshot
+
+        return changed
+
+    def close(self):
+        """Stop watching the folders."""
+
+        self._snapshot = {}
+
+    def _scan(self):
+        snapshot = {}
+        for _, path in self.manager.find_files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return snapshot
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import collections
+import http.server
+import json
+import socketserver
+import threading
+import time
+import urllib.parse
+
+from archimedes.clients.dashboard import (DASHBOARD,
+                                          SEARCH,
+                                          VISUALIZATION)
+
+KIBANA_VERSION = '6.8.6'
+
+STATUS = 'status'
+FIND = '_find'
+BULK_GET = '_bulk_get'
+GET_OBJECT = 'get_object'
+DASHBOARDS_EXPORT = 'dashboards/export'
+DASHBOARDS_IMPORT = 'dashboards/import'
+UNKNOWN = 'unknown'
+
+
+class _ThreadingServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class FakeKibana:
+    """In-process fake Kibana server.
+
+    This class serves a subset of the Kibana 6.x API from an in-memory
+    store of objects: the endpoints `_find` (paginated) and `_bulk_get`
+    and the objects `{type}/{id}` of the SavedObjects API, and the endpoints
+    `export` and `import` of the Dashboard API. Every request is delayed
+    by `latency` seconds and counted per endpoint.
+
+    :param objects: list of Kibana objects stored in the server
+    :param latency: seconds to wait before answering each request
+    :param version: Kibana version returned by the status endpoint
+    """
+    def __init__(self, objects=None, latency=0, version=KIBANA_VERSION):
+        self.latency = latency
+        self.version = version
+        self.objects = {}
+        self.requests = collections.Counter()
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+        for obj in objects or []:
+            self.objects[(obj['type'], obj['id'])] = obj
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return 'http://%s:%s' % (host, port)
+
+    def start(self):
+        """Start serving requests on a random local port."""
+
+        self.server = _ThreadingServer(('127.0.0.1', 0), self.__build_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the server."""
+
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def reset_requests(self):
+        """Reset the request counters and return their previous value."""
+
+        with self.lock:
+            counters = self.requests
+            self.requests = collections.Counter()
+
+        return counters
+
+    def handle(self, method, path, params, body):
+        """Answer a request.
+
+        :param method: HTTP method of the request
+        :param path: path of the request, without the leading slash
+        :param params: dict of query parameters
+        :param body: decoded JSON body of the request, if any
+
+        :returns a tuple composed by the endpoint, the status code and the response
+        """
+        parts = path.strip('/').split('/')
+
+        if parts == ['api', 'status']:
+            return STATUS, 200, {'version': {'number': self.version}}
+        if parts[:2] == ['api', 'saved_objects']:
+            if parts[2:] == [FIND] and method == 'GET':
+                return (FIND,) + self.__find(params)
+            if parts[2:] == [BULK_GET] and method == 'POST':
+                return (BULK_GET,) + self.__bulk_get(body)
+            if len(parts) == 4 and method == 'GET':
+                return (GET_OBJECT,) + self.__get_object(parts[2], parts[3])
+        if parts[:3] == ['api', 'kibana', 'dashboards']:
+            if parts[3:] == ['export'] and method == 'GET':
+                return (DASHBOARDS_EXPORT,) + self.__export(params.get('dashboard'))
+            if parts[3:] == ['import'] and method == 'POST':
+                return (DASHBOARDS_IMPORT,) + self.__import(body, params.get('force') == 'true')
+
+        return UNKNOWN, 404, {'statusCode': 404, 'error': 'Not Found', 'message': 'Not Found'}
+
+    def __find(self, params):
+        page = int(params.get('page', 1))
+        per_page = int(params.get('per_page', 20))
+        obj_type = params.get('type')
+
+        sort_field = params.get('sort_field')
+        reverse = params.get('sort_order') == 'desc'
+
+        with self.lock:
+            objs = sorted((obj for (t, _), obj in self.objects.items() if not obj_type or t == obj_type),
+                          key=lambda obj: obj['id'])
+            if sort_field:
+                objs.sort(key=lambda obj: obj.get(sort_field) or '', reverse=reverse)
+
+        start = (page - 1) * per_page
+        page_objs = objs[start:start + per_page]
+
+        field = params.get('fields')
+        if field:
+            page_objs = [dict(obj, attributes={k: v for k, v in obj['attributes'].items() if k == field})
+                         for obj in page_objs]
+
+        response = {
+            'page': page,
+            'per_page': per_page,
+            'total': len(objs),
+            'saved_objects': page_objs
+        }
+        return 200, response
+
+    def __bulk_get(self, body):
+        saved_objects = []
+        with self.lock:
+            for target in body:
+                obj = self.objects.get((target['type'], target['id']))
+                if not obj:
+                    obj = {
+                        'id': target['id'],
+                        'type': target['type'],
+                        'error': {'statusCode': 404, 'message': 'Not found'}
+                    }
+                saved_objects.append(obj)
+
+        return 200, {'saved_objects': saved_objects}
+
+    def __get_object(self, obj_type, obj_id):
+        with self.lock:
+            obj = self.objects.get((obj_type, obj_id))
+
+        if not obj:
+            return 404, {'statusCode': 404, 'error': 'Not Found',
+                         'message': 'Saved object [%s/%s] not found' % (obj_type, obj_id)}
+
+        return 200, obj
+
+    def __export(self, dashboard_id):
+        with self.lock:
+            dashboard = self.objects.get((DASHBOARD, dashboard_id))
+            if not dashboard:
+                error = {'id': dashboard_id, 'type': DASHBOARD, 'error': {'statusCode': 404}}
+                return 200, {'version': self.version, 'objects': [error]}
+
+            objs = []
+            for panel in json.loads(dashboard['attributes']['panelsJSON']):
+                obj = self.objects.get((panel['type'], panel['id']))
+                if not obj:
+                    continue
+                objs.append(obj)
+
+                search_id = obj['attributes'].get('savedSearchId')
+                search = self.objects.get((SEARCH, search_id))
+                if obj['type'] == VISUALIZATION and search and search not in objs:
+                    objs.append(search)
+
+        objs.append(dashboard)
+        return 200, {'version': self.version, 'objects': objs}
+
+    def __import(self, body, force):
+        results = []
+        with self.lock:
+            for obj in body['objects']:
+                key = (obj['type'], obj['id'])
+                if key in self.objects and not force:
+                    results.append({'id': obj['id'], 'type': obj['type'],
+                                    'error': {'statusCode': 409, 'message': 'version conflict'}})
+                    continue
+
+                self.objects[key] = obj
+                results.append(obj)
+
+        return 200, {'objects': results}
+
+    def __build_handler(self):
+        kibana = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self.__answer()
+
+            def do_POST(self):
+                self.__answer()
+
+            def log_message(self, format, *args):
+                pass
+
+            def __answer(self):
+                url = urllib.parse.urlparse(self.path)
+                params = dict(urllib.parse.parse_qsl(url.query))
+
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length).decode('utf-8')) if length else None
+
+                if kibana.latency:
+                    time.sleep(kibana.latency)
+
+                endpoint, status, response = kibana.handle(self.command, url.path, params, body)
+                with kibana.lock:
+                    kibana.requests[endpoint] += 1
+
+                content = json.dumps(response).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+        return Handler
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import random
+import uuid
+
+from archimedes.clients.dashboard import (DASHBOARD,
+                                          INDEX_PATTERN,
+                                          SEARCH,
+                                          VISUALIZATION)
+from archimedes.kibana_obj_meta import KibanaObjMeta
+from archimedes.manager import INDEX_PATTERN_REF_NAME, Manager
+from archimedes.registry import REGISTRY_NAME
+
+SEED = 0
+DASHBOARDS = 50
+PANELS = 50
+VISUALIZATIONS = 2000
+SEARCHES = 100
+INDEX_PATTERNS = 10
+FIELDS = 5000
+
+SEARCH_PANELS_RATIO = 0.05
+SAVED_SEARCH_RATIO = 0.5
+
+START_DATE = datetime.datetime(2020, 1, 1)
+
+FIELD_TYPES = ['string', 'number', 'date', 'boolean', 'geo_point']
+VISUALIZATION_TYPES = ['histogram', 'line', 'pie', 'table', 'metric', 'area', 'tagcloud']
+WORDS = ['git', 'github', 'gerrit', 'jira', 'issues', 'pull', 'requests', 'commits', 'authors',
+         'organizations', 'projects', 'backlog', 'timing', 'efficiency', 'activity', 'community']
+
+
+def generate_objects(seed=SEED, dashboards=DASHBOARDS, panels=PANELS, visualizations=VISUALIZATIONS,
+                     searches=SEARCHES, index_patterns=INDEX_PATTERNS, fields=FIELDS, references=False):
+    """Generate a set of synthetic Kibana objects.
+
+    The objects are generated from `seed`, thus the same parameters always
+    produce the same objects. Index patterns have `fields` fields, searches
+    are built on an index pattern, visualizations on a search or an index
+    pattern, and each dashboard shows `panels` visualizations and searches
+    picked from the whole set, so they are shared among dashboards.
+
+    :param seed: seed of the random generator
+    :param dashboards: number of dashboards
+    :param panels: number of panels of each dashboard
+    :param visualizations: number of visualizations
+    :param searches: number of searches
+    :param index_patterns: number of index patterns
+    :param fields: number of fields of each index pattern
+    :param references: link the objects using `references`, as Kibana 7.x does
+
+    :returns the list of objects, index patterns first and dashboards last
+    """
+    rng = random.Random(seed)
+
+    ip_objs = [_index_pattern(rng, fields) for _ in range(index_patterns)]
+    search_objs = [_search(rng, rng.choice(ip_objs), references) for _ in range(searches)]
+
+    vis_objs = []
+    for _ in range(visualizations):
+        if search_objs and rng.random() < SAVED_SEARCH_RATIO:
+            vis_objs.append(_visualization(rng, search=rng.choice(search_objs), references=references))
+        else:
+            vis_objs.append(_visualization(rng, index_pattern=rng.choice(ip_objs), references=references))
+
+    dash_objs = [_dashboard(rng, vis_objs, search_objs, panels, references) for _ in range(dashboards)]
+
+    return ip_objs + search_objs + vis_objs + dash_objs
+
+
+def write_repo(root_path, objects):
+    """Write a set of Kibana objects as an Archimedes repository.
+
+    The objects are saved in the folders of `root_path` as `Manager` does,
+    and their metadata is listed in the registry, with aliases assigned
+    in the order of the objects.
+
+    :param root_path: folder of the repository
+    :param objects: list of Kibana objects
+    """
+    manager = Manager(root_path)
+
+    content = {}
+    for alias, obj in enumerate(objects, start=1):
+        manager.save_obj(obj, force=True)
+
+        meta = KibanaObjMeta.create_from_obj(obj)
+        content[str(alias)] = json.loads(repr(meta))
+
+    with open(os.path.join(root_path, REGISTRY_NAME), 'w') as f:
+        f.write(json.dumps(content, sort_keys=True, indent=4))
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _title(rng, words=3):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _obj(rng, obj_type, attributes, references=None):
+    updated_at = START_DATE + datetime.timedelta(seconds=rng.randrange(365 * 24 * 3600))
+
+    obj = {
+        'id': _uuid(rng),
+        'type': obj_type,
+        'version': 1,
+        'updated_at': updated_at.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        'attributes': attributes
+    }
+
+    if references is not None:
+        obj['references'] = references
+
+    return obj
+
+
+def _search_source(index_pattern, references):
+    source = {
+        'highlightAll': True,
+        'query': {'query': '', 'language': 'lucene'},
+        'filter': []
+    }
+
+    if not index_pattern:
+        return source, []
+
+    if references:
+        source['indexRefName'] = INDEX_PATTERN_REF_NAME
+        return source, [{'name': INDEX_PATTERN_REF_NAME, 'type': INDEX_PATTERN, 'id': index_pattern['id']}]
+
+    source['index'] = index_pattern['id']
+    return source, []
+
+
+def _index_pattern(rng, n_fields):
+    fields = []
+    for i in range(n_fields):
+        fields.append({
+            'name': '%s_%s' % (rng.choice(WORDS), i),
+            'type': rng.choice(FIELD_TYPES),
+            'count': 0,
+            'scripted': False,
+            'searchable': True,
+            'aggregatable': True,
+            'readFromDocValues': True
+        })
+
+    attributes = {
+        'title': '%s_%s' % (rng.choice(WORDS), rng.getrandbits(16)),
+        'timeFieldName': 'grimoire_creation_date',
+        'fields': json.dumps(fields),
+        'fieldFormatMap': '{}'
+    }
+
+    return _obj(rng, INDEX_PATTERN, attributes)
+
+
+def _search(rng, index_pattern, references):
+    source, refs = _search_source(index_pattern, references)
+
+    attributes = {
+        'title': _title(rng),
+        'description': '',
+        'hits': 0,
+        'columns': ['_source'],
+        'sort': ['grimoire_creation_date', 'desc'],
+        'version': 1,
+        'kibanaSavedObjectMeta': {'searchSourceJSON': json.dumps(source)}
+    }
+
+    return _obj(rng, SEARCH, attributes, refs if references else None)
+
+
+def _visualization(rng, search=None, index_pattern=None, references=False):
+    source, refs = _search_source(index_pattern, references)
+
+    title = _title(rng)
+    vis_state = {
+        'title': title,
+        'type': rng.choice(VISUALIZATION_TYPES),
+        'params': {'addTooltip': True, 'addLegend': True, 'legendPosition': 'right'},
+        'aggs': [
+            {'id': '1', 'enabled': True, 'type': 'count', 'schema': 'metric', 'params': {}},
+            {'id': '2', 'enabled': True, 'type': 'terms', 'schema': 'segment',
+             'params': {'field': rng.choice(WORDS), 'size': rng.randint(5, 50), 'order': 'desc'}}
+        ]
+    }
+
+    attributes = {
+        'title': title,
+        'visState': json.dumps(vis_state),
+        'uiStateJSON': '{}',
+        'description': '',
+        'version': 1,
+        'kibanaSavedObjectMeta': {'searchSourceJSON': json.dumps(source)}
+    }
+
+    if search and references:
+        attributes['savedSearchRefName'] = 'search_0'
+        refs.append({'name': 'search_0', 'type': SEARCH, 'id': search['id']})
+    elif search:
+        attributes['savedSearchId'] = search['id']
+
+    return _obj(rng, VISUALIZATION, attributes, refs if references else None)
+
+
+def _dashboard(rng, visualizations, searches, n_panels, references):
+    n_searches = min(len(searches), int(n_panels * SEARCH_PANELS_RATIO))
+    targets = rng.sample(visualizations, min(len(visualizations), n_panels - n_searches))
+    targets += rng.sample(searches, n_searches)
+
+    panels = []
+    refs = []
+    for i, target in enumerate(targets):
+        panel = {
+            'panelIndex': str(i + 1),
+            'gridData': {'x': (i % 2) * 24, 'y': (i // 2) * 15, 'w': 24, 'h': 15, 'i': str(i + 1)},
+            'embeddableConfig': {},
+            'version': '6.8.6'
+        }
+        if references:
+            panel['panelRefName'] = 'panel_%s' % i
+            refs.append({'name': 'panel_%s' % i, 'type': target['type'], 'id': target['id']})
+        else:
+            panel['type'] = target['type']
+            panel['id'] = target['id']
+        panels.append(panel)
+
+    source, _ = _search_source(None, references)
+    attributes = {
+        'title': _title(rng, words=2),
+        'hits': 0,
+        'description': '',
+        'panelsJSON': json.dumps(panels),
+        'optionsJSON': json.dumps({'darkTheme': False, 'useMargins': True}),
+        'version': 1,
+        'timeRestore': False,
+        'kibanaSavedObjectMeta': {'searchSourceJSON': json.dumps(source)}
+    }
+
+    return _obj(rng, DASHBOARD, attributes, refs if references else None)
+
+
+def get_params():
+    parser = argparse.ArgumentParser(usage="usage: python -m benchmarks.generator [options] root_path",
+                                     description="Generate a synthetic Archimedes repository")
+
+    parser.add_argument('root_path', help='Archimedes folder')
+    parser.add_argument('--seed', dest='seed', type=int, default=SEED,
+                        help='Seed of the random generator')
+    parser.add_argument('--dashboards', dest='dashboards', type=int, default=DASHBOARDS,
+                        help='Number of dashboards')
+    parser.add_argument('--panels', dest='panels', type=int, default=PANELS,
+                        help='Number of panels of each dashboard')
+    parser.add_argument('--visualizations', dest='visualizations', type=int, default=VISUALIZATIONS,
+                        help='Number of visualizations')
+    parser.add_argument('--searches', dest='searches', type=int, default=SEARCHES,
+                        help='Number of searches')
+    parser.add_argument('--index-patterns', dest='index_patterns', type=int, default=INDEX_PATTERNS,
+                        help='Number of index patterns')
+    parser.add_argument('--fields', dest='fields', type=int, default=FIELDS,
+                        help='Number of fields of each index pattern')
+    parser.add_argument('--references', dest='references', action='store_true',
+                        help='Link the objects using references, as Kibana 7.x does')
+
+    return parser.parse_args()
+
+
+def main():
+    """Generate a synthetic Archimedes repository, including its registry.
+
+    The repository is generated from a seed, thus the same options always
+    produce the same files, making the benchmarks reproducible offline.
+
+    Examples:
+    - Generate a repository with 100 dashboards of 60 panels picked from 5000 visualizations
+        python -m benchmarks.generator /tmp/repo --dashboards 100 --panels 60 --visualizations 5000
+    """
+    args = get_params()
+    logging.basicConfig(level=logging.WARNING)
+
+    objs = generate_objects(seed=args.seed, dashboards=args.dashboards, panels=args.panels,
+                            visualizations=args.visualizations, searches=args.searches,
+                            index_patterns=args.index_patterns, fields=args.fields,
+                            references=args.references)
+    write_repo(args.root_path, objs)
+
+    print("%s objects written to %s" % (len(objs), args.root_path))
+
+
+if __name__ == "__main__":
+    main()
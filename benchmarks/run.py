@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import argparse
+import json
+import logging
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from archimedes.archimedes import Archimedes
+from archimedes.clients.dashboard import DASHBOARD, INDEX_PATTERN
+from benchmarks.fake_kibana import FakeKibana
+from benchmarks.generator import SEED, generate_objects
+from utils.euclid import export_batch, import_batch
+
+OBJECTS = 500
+LATENCY = 0.0
+FIELDS = 50
+
+
+def seed_objects(n, seed=SEED):
+    """Generate `n` Kibana objects composing a set of dashboards.
+
+    About a tenth of the objects are dashboards, a tenth searches and
+    a twentieth index patterns, the rest are visualizations. The objects
+    are built by `generate_objects`, thus the same `n` and `seed` always
+    produce the same objects.
+
+    :param n: number of objects to generate
+    :param seed: seed of the random generator
+
+    :returns the list of objects
+    """
+    n_index_patterns = max(1, n // 20)
+    n_searches = max(1, n // 10)
+    n_dashboards = max(1, n // 10)
+    n_visualizations = max(1, n - n_index_patterns - n_searches - n_dashboards)
+
+    return generate_objects(seed=seed,
+                            dashboards=n_dashboards,
+                            panels=max(1, n_visualizations // n_dashboards),
+                            visualizations=n_visualizations,
+                            searches=n_searches,
+                            index_patterns=n_index_patterns,
+                            fields=FIELDS)
+
+
+def measure(kibana, name, func, trace_memory=True):
+    """Run `func` and measure its wall time, requests and peak memory.
+
+    :param kibana: the FakeKibana serving the requests
+    :param name: name of the phase
+    :param func: function to run
+    :param trace_memory: trace the Python memory allocations
+
+    :returns a dict with the measures of the phase
+    """
+    kibana.reset_requests()
+
+    if trace_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    requests = kibana.reset_requests()
+
+    return {
+        'phase': name,
+        'time': elapsed,
+        'requests': sum(requests.values()),
+        'endpoints': dict(requests),
+        'peak_memory': peak
+    }
+
+
+def run(n_objects=OBJECTS, latency=LATENCY, trace_memory=True):
+    """Run the benchmarks against a fake Kibana seeded with `n_objects`.
+
+    :param n_objects: number of objects stored in Kibana
+    :param latency: seconds the fake Kibana waits before answering
+    :param trace_memory: trace the Python memory allocations of each phase
+
+    :returns a list of dicts with the measures of each phase
+    """
+    objs = seed_objects(n_objects)
+    # the titles generated may be repeated, thus the dashboards are listed by ID
+    dashboards = {obj['id']: obj['id'] for obj in objs if obj['type'] == DASHBOARD}
+    index_patterns = [obj['id'] for obj in objs if obj['type'] == INDEX_PATTERN]
+
+    root_path = tempfile.mkdtemp(prefix='archimedes_bench_')
+    results = []
+
+    try:
+        with FakeKibana(objs, latency=latency) as kibana:
+            archimedes = Archimedes(kibana.url, root_path)
+
+            def export_dashboards():
+                for dashboard_id in dashboards.values():
+                    archimedes.export_to_disk(obj_type=DASHBOARD, obj_id=dashboard_id, force=True)
+                for index_pattern_id in index_patterns:
+                    archimedes.export_to_disk(obj_type=INDEX_PATTERN, obj_id=index_pattern_id, force=True)
+
+            def import_dashboards():
+                for dashboard_id in dashboards.values():
+                    archimedes.import_from_disk(obj_type=DASHBOARD, obj_id=dashboard_id, find=True, force=True)
+
+            phases = [
+                ('inspect', lambda: list(archimedes.inspect(remote=True))),
+                ('populate_registry', lambda: archimedes.populate_registry(force=True)),
+                ('export_to_disk', export_dashboards),
+                ('inspect_local', lambda: list(archimedes.inspect(local=True))),
+                ('import_from_disk', import_dashboards),
+                ('euclid_export_batch', lambda: export_batch(archimedes, dashboards, force=True)),
+                ('euclid_import_batch', lambda: import_batch(archimedes, dashboards, force=True, find=True)),
+                ('euclid_import_all', lambda: archimedes.import_all(force=True))
+            ]
+
+            for name, func in phases:
+                results.append(measure(kibana, name, func, trace_memory=trace_memory))
+    finally:
+        shutil.rmtree(root_path)
+
+    return results
+
+
+def format_results(results):
+    """Format the measures of the phases as a table."""
+
+    lines = ["%-22s %10s %10s %16s" % ('phase', 'time (s)', 'requests', 'peak mem (KiB)')]
+    for result in results:
+        peak = '%.1f' % (result['peak_memory'] / 1024) if result['peak_memory'] is not None else '-'
+        lines.append("%-22s %10.3f %10d %16s" % (result['phase'], result['time'], result['requests'], peak))
+
+    return '\n'.join(lines)
+
+
+def get_params():
+    parser = argparse.ArgumentParser(usage="usage: python -m benchmarks.run [options]",
+                                     description="Benchmark Archimedes against a local fake Kibana")
+
+    parser.add_argument('--objects', dest='objects', type=int, default=OBJECTS,
+                        help='Number of objects stored in Kibana')
+    parser.add_argument('--latency', dest='latency', type=float, default=LATENCY,
+                        help='Seconds Kibana waits before answering each request')
+    parser.add_argument('--no-trace-memory', dest='trace_memory', action='store_false',
+                        help='Do not trace the peak memory, it slows down the phases')
+    parser.add_argument('--json', dest='json_path', default=None,
+                        help='Save the results as JSON to this file')
+
+    return parser.parse_args()
+
+
+def main():
+    """Benchmark the main Archimedes operations against an in-process fake Kibana.
+
+    The fake Kibana is seeded with a set of synthetic dashboards and their
+    visualizations, searches and index patterns. For each phase, the wall time,
+    the number of requests received by Kibana and the peak of the memory
+    allocated by Python are reported.
+
+    Examples:
+    - Run the benchmarks with 1000 objects and 5ms of latency
+        python -m benchmarks.run --objects 1000 --latency 0.005
+    """
+    args = get_params()
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run(n_objects=args.objects, latency=args.latency, trace_memory=args.trace_memory)
+    print(format_results(results))
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, sort_keys=True, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -60,11 +60,14 @@ setup(name="archimedes",
       packages=[
           'archimedes',
           'archimedes.clients',
+          'benchmarks',
           'utils'
       ],
       python_requires='>=3.4',
       setup_requires=['wheel'],
-      extras_require={},
+      extras_require={
+          'fast-json': ['orjson>=3.0']
+      },
       tests_require=[
           'httpretty==0.8.6'
       ],
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import shutil
+import tempfile
+import unittest
+
+from archimedes.manager import Manager
+from benchmarks.generator import generate_objects, write_repo
+
+
+class GeneratedRepoTestCase(unittest.TestCase):
+    """Base class of the tests working on generated objects.
+
+    Before each test, the objects defined by `GENERATOR_PARAMS` are
+    generated in `objs` and, when `WRITE_REPO` is set, saved to the
+    temporary folder `tmp_path`, which is managed by `manager`. The
+    folder is deleted after each test.
+    """
+    GENERATOR_PARAMS = {}
+    WRITE_REPO = True
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='archimedes_')
+        self.objs = generate_objects(**self.GENERATOR_PARAMS)
+        if self.WRITE_REPO:
+            write_repo(self.tmp_path, self.objs)
+        self.manager = Manager(self.tmp_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import collections
+import contextlib
+import threading
+import unittest.mock
+
+from archimedes.clients.http import HttpClient, HttpStats
+
+
+class RequestCounter:
+    """Context manager counting the requests sent by the HTTP clients.
+
+    While active, every request sent through `HttpClient` (and thus by
+    the Dashboard and SavedObjects clients) is listed in `requests` as
+    a tuple composed by the endpoint, the method and the URL.
+    """
+    def __init__(self):
+        self.requests = []
+        self._lock = threading.Lock()
+        self._patcher = None
+
+    def __enter__(self):
+        request = HttpClient._request
+        counter = self
+
+        def counted_request(client, method, url, *args, **kwargs):
+            with counter._lock:
+                counter.requests.append((HttpStats.endpoint(method, url), method, url))
+            return request(client, method, url, *args, **kwargs)
+
+        self._patcher = unittest.mock.patch.object(HttpClient, '_request', counted_request)
+        self._patcher.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._patcher.stop()
+
+    @property
+    def endpoints(self):
+        """Number of requests per endpoint."""
+
+        return collections.Counter(endpoint for endpoint, _, _ in self.requests)
+
+    def format(self):
+        return '\n'.join("  %s %s (%s)" % (method, url, endpoint) for endpoint, method, url in self.requests)
+
+
+class RequestBudgetMixin:
+    """Mixin for test cases asserting the number of requests sent to Kibana."""
+
+    @contextlib.contextmanager
+    def assertMaxRequests(self, total=None, endpoints=None):
+        """Assert upper bounds on the requests sent within the context.
+
+        :param total: maximum number of requests
+        :param endpoints: dict with the maximum number of requests per endpoint
+        """
+        with RequestCounter() as counter:
+            yield counter
+
+        sent = len(counter.requests)
+        if total is not None and sent > total:
+            self.fail("%s request(s) sent, expected at most %s:\n%s" % (sent, total, counter.format()))
+
+        for endpoint, limit in (endpoints or {}).items():
+            sent = counter.endpoints[endpoint]
+            if sent > limit:
+                self.fail("%s request(s) sent to %s, expected at most %s:\n%s"
+                          % (sent, endpoint, limit, counter.format()))
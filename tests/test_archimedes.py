@@ -29,8 +29,10 @@ import unittest.mock
 
 from archimedes.clients.dashboard import (DASHBOARD,
                                           INDEX_PATTERN,
+                                          MAX_PAYLOAD_BYTES,
                                           SEARCH,
-                                          VISUALIZATION)
+                                          VISUALIZATION,
+                                          ImportReport)
 from archimedes.manager import (INDEX_PATTERNS_FOLDER,
                                 VISUALIZATIONS_FOLDER)
 from archimedes.archimedes import (logger,
@@ -43,6 +45,9 @@ from archimedes.errors import (DataExportError,
 from archimedes.kibana import Kibana
 from archimedes.manager import Manager
 from archimedes.registry import REGISTRY_NAME
+from benchmarks.fake_kibana import FakeKibana
+
+from request_budget import RequestBudgetMixin
 
 KIBANA_URL = 'http://example.com/'
 
@@ -112,7 +117,10 @@ class MockedKibana(Kibana):
         super().__init__(base_url)
 
     def import_objects(self, objects, force=False):
-        return
+        return ImportReport()
+
+    def find_existing(self, objects):
+        return set()
 
     def export_by_id(self, obj_type, obj_id):
         obj = read_file('data/object_visualization')
@@ -133,6 +141,29 @@ class MockedKibana(Kibana):
         return [json.loads(index_pattern), json.loads(visualization)]
 
 
+class MockedKibanaBatches(MockedKibana):
+    def __init__(self, base_url):
+        super().__init__(base_url)
+        self.batches = []
+
+    def import_objects(self, objects, force=False):
+        self.batches.append(objects['objects'])
+
+        report = ImportReport()
+        for obj in objects['objects']:
+            if obj['id'] == VISUALIZATION_ID_TITLE:
+                report.errors.append(obj)
+            else:
+                report.imported.append(obj)
+        return report
+
+
+class MockedKibanaExisting(MockedKibanaBatches):
+    def find_existing(self, objects):
+        return {(obj['type'], obj['id']) for obj in objects
+                if obj['type'] in [INDEX_PATTERN, SEARCH]}
+
+
 class TestArchimedes(unittest.TestCase):
     """Archimedes tests"""
 
@@ -161,6 +192,40 @@ class TestArchimedes(unittest.TestCase):
 
         self.assertIsNotNone(archimedes.manager)
         self.assertIsNotNone(archimedes.kibana)
+        self.assertEqual(archimedes.kibana.dashboard.max_payload_bytes, MAX_PAYLOAD_BYTES)
+
+        archimedes = Archimedes(KIBANA_URL, self.tmp_full, max_payload_bytes=1024)
+        self.assertEqual(archimedes.kibana.dashboard.max_payload_bytes, 1024)
+        self.assertListEqual(archimedes.manager.include, [])
+        self.assertListEqual(archimedes.manager.exclude, [])
+
+        archimedes = Archimedes(KIBANA_URL, self.tmp_full, include=['extra/*'], exclude=['searches'])
+        self.assertListEqual(archimedes.manager.include, ['extra/*'])
+        self.assertListEqual(archimedes.manager.exclude, ['searches'])
+
+    def test_lazy_initialization(self):
+        """Test whether the components are created only when used"""
+
+        root_path = os.path.join(self.tmp_path, 'lazy')
+
+        with unittest.mock.patch('archimedes.kibana.Kibana') as mock_kibana:
+            archimedes = Archimedes(KIBANA_URL, root_path)
+            self.assertFalse(os.path.exists(root_path))
+
+            objs = [obj for obj in archimedes.inspect(local=True)]
+            self.assertListEqual(objs, [])
+            self.assertFalse(os.path.exists(root_path))
+            mock_kibana.assert_not_called()
+
+            _ = [entry for entry in archimedes.list_registry()]
+            self.assertTrue(os.path.exists(os.path.join(root_path, REGISTRY_NAME)))
+            mock_kibana.assert_not_called()
+
+            self.assertIs(archimedes.kibana, archimedes.kibana)
+            mock_kibana.assert_called_once_with(KIBANA_URL, max_payload_bytes=MAX_PAYLOAD_BYTES,
+                                                cassette=None, inventory=None)
+
+        shutil.rmtree(root_path)
 
     def test_import_from_disk_dashboard_by_title(self):
         """Test whether the method to import Kibana dashboard by title properly works"""
@@ -527,6 +592,102 @@ class TestArchimedes(unittest.TestCase):
             self.assertEqual(cm.output[0], 'WARNING:archimedes.archimedes:File ' + archimedes.manager.root_path +
                              '/dashboard_Maniphest-Backlog.json is empty')
 
+    def test_import_all(self):
+        """Test whether all objects on disk are imported in batches following their dependencies"""
+
+        archimedes = MockedArchimedes(KIBANA_URL, self.tmp_full)
+        archimedes.kibana = MockedKibanaBatches(KIBANA_URL)
+
+        report = archimedes.import_all()
+
+        self.assertEqual(len(archimedes.kibana.batches), 4)
+        types = [[obj['type'] for obj in batch] for batch in archimedes.kibana.batches]
+        self.assertListEqual(types[0], [INDEX_PATTERN])
+        self.assertListEqual(types[1], [SEARCH])
+        self.assertListEqual(types[2], [VISUALIZATION] * 8)
+        self.assertListEqual(types[3], [DASHBOARD])
+
+        self.assertEqual(report.total, 11)
+        self.assertEqual(len(report.imported), 10)
+        self.assertEqual(len(report.errors), 1)
+        self.assertEqual(report.errors[0]['id'], VISUALIZATION_ID_TITLE)
+
+    def test_import_all_batch_limits(self):
+        """Test whether the batches are bounded by the number of objects"""
+
+        archimedes = MockedArchimedes(KIBANA_URL, self.tmp_full)
+        archimedes.kibana = MockedKibanaBatches(KIBANA_URL)
+
+        archimedes.import_all(batch_size=3)
+
+        sizes = [len(batch) for batch in archimedes.kibana.batches]
+        self.assertListEqual(sizes, [1, 1, 3, 3, 2, 1])
+
+    def test_import_all_single_walk(self):
+        """Test whether the Archimedes folder is walked only once"""
+
+        archimedes = MockedArchimedes(KIBANA_URL, self.tmp_full)
+        archimedes.kibana = MockedKibanaBatches(KIBANA_URL)
+
+        with unittest.mock.patch('archimedes.manager.os.scandir', wraps=os.scandir) as mock_scandir:
+            archimedes.import_all()
+
+        folders = [call[0][0] for call in mock_scandir.call_args_list]
+        self.assertEqual(len(folders), len(set(folders)))
+        self.assertIn(self.tmp_full, folders)
+
+    def test_import_all_skip_existing(self):
+        """Test whether the objects already in Kibana are skipped when force is not set"""
+
+        archimedes = MockedArchimedes(KIBANA_URL, self.tmp_full)
+        archimedes.kibana = MockedKibanaExisting(KIBANA_URL)
+
+        report = archimedes.import_all()
+
+        types = [[obj['type'] for obj in batch] for batch in archimedes.kibana.batches]
+        self.assertListEqual(types, [[VISUALIZATION] * 8, [DASHBOARD]])
+
+        self.assertEqual(report.total, 11)
+        self.assertEqual(len(report.imported), 8)
+        self.assertEqual(len(report.errors), 1)
+        self.assertListEqual(sorted([obj['type'] for obj in report.skipped]), [INDEX_PATTERN, SEARCH])
+
+        archimedes.kibana = MockedKibanaExisting(KIBANA_URL)
+        report = archimedes.import_all(force=True)
+
+        self.assertEqual(len(archimedes.kibana.batches), 4)
+        self.assertListEqual(report.skipped, [])
+
+    def test_import_from_disk_skip_existing(self):
+        """Test whether the files whose objects are already in Kibana are not uploaded"""
+
+        archimedes = MockedArchimedes(KIBANA_URL, self.tmp_full)
+        archimedes.kibana = MockedKibanaExisting(KIBANA_URL)
+
+        with self.assertLogs(logger, level='INFO') as cm:
+            report = archimedes.import_from_disk(SEARCH, obj_id=SEARCH_ID, find=True)
+
+            self.assertEqual(cm.output[0], 'INFO:archimedes.archimedes:Importing 2 objects')
+            self.assertIn('INFO:archimedes.archimedes:Skipping ' + archimedes.manager.root_path +
+                          '/index-patterns/index-pattern_maniphest.json, objects already in Kibana', cm.output)
+            self.assertIn('INFO:archimedes.archimedes:Skipping ' + archimedes.manager.root_path +
+                          '/searches/search_Maniphest-Search:_status:Open.json, objects already in Kibana', cm.output)
+
+        self.assertListEqual(archimedes.kibana.batches, [])
+        self.assertListEqual(sorted([obj['type'] for obj in report.skipped]), [INDEX_PATTERN, SEARCH])
+
+    def test_import_from_disk_report(self):
+        """Test whether the import of the objects on disk returns a report"""
+
+        archimedes = MockedArchimedes(KIBANA_URL, self.tmp_full)
+        archimedes.kibana = MockedKibanaBatches(KIBANA_URL)
+
+        report = archimedes.import_from_disk(VISUALIZATION, obj_id=VISUALIZATION_ID_TITLE, find=True)
+
+        self.assertEqual(report.total, 3)
+        self.assertEqual(len(report.imported), 2)
+        self.assertListEqual([obj['id'] for obj in report.errors], [VISUALIZATION_ID_TITLE])
+
     def test_export_to_disk_by_id(self):
         """Test whether the method to export a Kibana object by id properly works"""
 
@@ -542,6 +703,29 @@ class TestArchimedes(unittest.TestCase):
 
         shutil.rmtree(self.tmp_empty)
 
+    def test_export_to_disk_by_id_ip_included(self):
+        """Test whether the index pattern is not retrieved again when already included in the exported objects"""
+
+        os.mkdir(self.tmp_empty)
+
+        archimedes = MockedArchimedes(KIBANA_URL, self.tmp_empty)
+        ip_path = os.path.join(self.tmp_empty, INDEX_PATTERNS_FOLDER,
+                               INDEX_PATTERN + '_' + INDEX_PATTERN_ID_EXPORT + '.json')
+
+        visualization = json.loads(read_file('data/object_visualization'))
+        index_pattern = json.loads(read_file('data/object_index-pattern'))
+        exported = {'objects': [visualization, visualization, index_pattern]}
+
+        with unittest.mock.patch.object(archimedes.kibana, 'export_by_id', return_value=exported), \
+                unittest.mock.patch.object(archimedes.kibana, 'find_by_id') as mock_find_by_id:
+            archimedes.export_to_disk(DASHBOARD, obj_id=DASHBOARD_ID, index_pattern=True)
+
+            mock_find_by_id.assert_not_called()
+
+        self.assertTrue(os.path.exists(ip_path))
+
+        shutil.rmtree(self.tmp_empty)
+
     def test_export_to_disk_by_alias(self):
         """Test whether the method to export a Kibana object by alias properly works"""
 
@@ -912,5 +1096,38 @@ class TestArchimedes(unittest.TestCase):
         os.remove(archimedes.registry.path)
 
 
+class TestArchimedesRequestBudget(RequestBudgetMixin, unittest.TestCase):
+    """Tests of the number of requests sent by Archimedes"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='archimedes_')
+
+        def build_obj(obj_type, obj_id, attributes):
+            return {'id': obj_id, 'type': obj_type, 'version': 1, 'attributes': attributes}
+
+        search_source = {'kibanaSavedObjectMeta': {'searchSourceJSON': json.dumps({'index': 'ip-1'})}}
+        panels = [{'panelIndex': str(i), 'type': VISUALIZATION, 'id': 'vis-%s' % i} for i in range(3)]
+
+        self.objects = [build_obj(INDEX_PATTERN, 'ip-1', {'title': 'ip_1'})]
+        self.objects += [build_obj(VISUALIZATION, 'vis-%s' % i, dict(search_source, title='Vis %s' % i))
+                         for i in range(3)]
+        self.objects.append(build_obj(DASHBOARD, 'dash-1', {'title': 'Dash 1', 'panelsJSON': json.dumps(panels)}))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_export_dashboard_index_pattern(self):
+        """Test whether a dashboard is exported with its index pattern in at most 3 requests"""
+
+        with FakeKibana(self.objects) as fake:
+            archimedes = Archimedes(fake.url, self.tmp_path)
+
+            with self.assertMaxRequests(3, endpoints={'dashboards/export': 1, 'get_object': 1}):
+                archimedes.export_to_disk(DASHBOARD, obj_id='dash-1', index_pattern=True)
+
+        ip_path = os.path.join(self.tmp_path, INDEX_PATTERNS_FOLDER, INDEX_PATTERN + '_ip-1.json')
+        self.assertTrue(os.path.exists(ip_path))
+
+
 if __name__ == "__main__":
     unittest.main(warnings='ignore')
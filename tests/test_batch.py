@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import unittest
+
+from archimedes.archimedes import Archimedes
+from archimedes.batch import Batch, ERROR, OK
+from archimedes.clients.common import (DASHBOARD,
+                                       INDEX_PATTERN,
+                                       SEARCH)
+from archimedes.errors import BatchError
+from benchmarks.fake_kibana import FakeKibana
+from generated_repo import GeneratedRepoTestCase
+
+KIBANA_URL = 'http://example.com/'
+ARCHIMEDES_BIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin', 'archimedes')
+
+PARAMS = {
+    'dashboards': 3,
+    'panels': 5,
+    'visualizations': 10,
+    'searches': 3,
+    'index_patterns': 2,
+    'fields': 3
+}
+
+
+class TestBatch(GeneratedRepoTestCase):
+    """Batch tests"""
+
+    GENERATOR_PARAMS = PARAMS
+
+    def test_initialization(self):
+        """Test whether attributes are initialized"""
+
+        archimedes = Archimedes(KIBANA_URL, self.tmp_path)
+
+        batch = Batch(archimedes)
+        self.assertEqual(batch.archimedes, archimedes)
+        self.assertEqual(batch.workers, 1)
+
+        batch = Batch(archimedes, workers=0)
+        self.assertEqual(batch.workers, 1)
+
+    def test_execute_local(self):
+        """Test whether local operations are executed"""
+
+        batch = Batch(Archimedes(KIBANA_URL, self.tmp_path))
+
+        metas = batch.execute({'op': 'inspect', 'local': True})
+        self.assertEqual(len(metas), len(self.objs))
+        self.assertSetEqual({meta['id'] for meta in metas}, {obj['id'] for obj in self.objs})
+
+        entries = batch.execute({'op': 'registry', 'action': 'show'})
+        self.assertEqual(len(entries), len(self.objs))
+        self.assertEqual(entries['1']['id'], self.objs[0]['id'])
+
+        self.assertIsNone(batch.execute({'op': 'registry', 'action': 'update', 'alias': '1', 'new_alias': 'ip'}))
+        entries = batch.execute({'op': 'registry', 'action': 'show', 'alias': 'ip'})
+        self.assertDictEqual(entries, {'ip': {'id': self.objs[0]['id'], 'title': self.objs[0]['attributes']['title'],
+                                              'type': INDEX_PATTERN, 'version': 1,
+                                              'updated_at': self.objs[0]['updated_at']}})
+
+        entries = batch.execute({'op': 'registry', 'action': 'show', 'obj_type': SEARCH})
+        self.assertEqual(len(entries), PARAMS['searches'])
+
+        self.assertIsNone(batch.execute({'op': 'registry', 'action': 'delete', 'alias': 'ip'}))
+        self.assertIsNone(batch.execute({'op': 'registry', 'action': 'clear'}))
+        self.assertDictEqual(batch.execute({'op': 'registry', 'action': 'show'}), {})
+
+    def test_execute_invalid(self):
+        """Test whether an error is thrown when an operation is not valid"""
+
+        batch = Batch(Archimedes(KIBANA_URL, self.tmp_path))
+
+        invalid = [
+            ({'op': 'rename'}, "Unknown operation rename"),
+            ({'op': 'import', 'obj_id': '1'}, "Import/Export by ID or title requires obj_type"),
+            ({'op': 'export', 'obj_type': DASHBOARD}, "Import/Export requires obj_id, obj_title or obj_alias"),
+            ({'op': 'export', 'obj_type': INDEX_PATTERN, 'obj_id': '1', 'index_pattern': True},
+             "Export index_pattern param is not valid for index-pattern objects"),
+            ({'op': 'inspect'}, "Inspect requires local or remote"),
+            ({'op': 'registry', 'action': 'update', 'alias': '1'}, "Update on registry requires alias and new_alias"),
+            ({'op': 'registry', 'action': 'delete'}, "Delete on registry requires alias"),
+            ({'op': 'registry', 'action': 'rename'}, "Unknown registry action rename")
+        ]
+
+        for operation, cause in invalid:
+            with self.assertLogs() as cm:
+                with self.assertRaises(BatchError):
+                    batch.execute(operation)
+            self.assertEqual(cm.output[0], 'ERROR:archimedes.batch:' + cause)
+
+    def test_execute_alias_locked(self):
+        """Test whether the aliases are resolved while no registry operation is running"""
+
+        dashboard = [obj for obj in self.objs if obj['type'] == DASHBOARD][0]
+
+        with FakeKibana(self.objs) as fake:
+            archimedes = Archimedes(fake.url, self.tmp_path)
+            batch = Batch(archimedes, workers=2)
+            alias = [alias for alias, meta in archimedes.list_registry(DASHBOARD) if meta.id == dashboard['id']][0]
+
+            results = []
+            operations = [
+                {'op': 'export', 'obj_alias': alias, 'force': True},
+                {'op': 'import', 'obj_alias': alias, 'force': True}
+            ]
+            threads = [threading.Thread(target=lambda op=op: results.append(batch.execute(op))) for op in operations]
+
+            with batch.registry_lock:
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join(0.2)
+                    self.assertTrue(thread.is_alive())
+                self.assertListEqual(results, [])
+
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(results), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_path, 'dashboard_%s.json' % dashboard['id'])))
+
+    def test_run(self):
+        """Test whether a result is returned for each line, in order"""
+
+        lines = [
+            '# list the objects on disk',
+            '{"op": "inspect", "local": true, "id": "inspect"}',
+            '',
+            '{"op": "registry", "action": "show", "alias": "1"}',
+            'not json',
+            '{"op": "registry", "action": "show", "alias": "unknown"}',
+            '["op"]'
+        ]
+
+        batch = Batch(Archimedes(KIBANA_URL, self.tmp_path))
+        results = [result for result in batch.run(lines)]
+
+        self.assertListEqual([result['line'] for result in results], [2, 4, 5, 6, 7])
+        self.assertListEqual([result['status'] for result in results], [OK, OK, ERROR, ERROR, ERROR])
+
+        self.assertEqual(results[0]['op'], 'inspect')
+        self.assertEqual(results[0]['id'], 'inspect')
+        self.assertEqual(len(results[0]['result']), len(self.objs))
+        self.assertGreaterEqual(results[0]['time'], 0)
+        self.assertListEqual(list(results[1]['result'].keys()), ['1'])
+        self.assertNotIn('op', results[2])
+        self.assertEqual(results[3]['error'], "Alias unknown not found in registry")
+        self.assertEqual(results[4]['error'], "Operation must be a JSON object")
+
+        for result in results:
+            json.dumps(result)
+
+    def test_run_remote(self):
+        """Test whether remote operations share the same Kibana connections and run concurrently"""
+
+        dashboards = [obj for obj in self.objs if obj['type'] == DASHBOARD]
+
+        with FakeKibana(self.objs) as fake:
+            archimedes = Archimedes(fake.url, self.tmp_path)
+            batch = Batch(archimedes, workers=4)
+
+            lines = [json.dumps({'op': 'import', 'obj_type': DASHBOARD, 'obj_id': obj['id'],
+                                 'find': True, 'force': True}) for obj in dashboards]
+            lines += [json.dumps({'op': 'export', 'obj_type': DASHBOARD, 'obj_id': obj['id'],
+                                  'force': True}) for obj in dashboards]
+            lines.append(json.dumps({'op': 'export', 'obj_type': DASHBOARD, 'obj_id': 'unknown'}))
+
+            results = [result for result in batch.run(lines)]
+
+        self.assertListEqual([result['line'] for result in results], list(range(1, len(lines) + 1)))
+        for result in results[:len(dashboards)]:
+            self.assertEqual(result['status'], OK)
+            self.assertEqual(result['result']['errors'], 0)
+            self.assertGreater(result['result']['imported'], 0)
+        for result in results[len(dashboards):-1]:
+            self.assertEqual(result['status'], OK)
+            self.assertIsNone(result['result'])
+        self.assertEqual(results[-1]['status'], ERROR)
+
+        # the Kibana version is retrieved once for all the operations
+        self.assertEqual(archimedes.kibana.get_stats()['status']['requests'], 1)
+
+    def test_bin(self):
+        """Test whether bin/archimedes prints a JSON line per operation read from stdin"""
+
+        lines = '\n'.join([
+            '{"op": "registry", "action": "show", "alias": "2"}',
+            '{"op": "registry", "action": "delete"}'
+        ])
+
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(ARCHIMEDES_BIN)))
+        result = subprocess.run([sys.executable, ARCHIMEDES_BIN, KIBANA_URL, self.tmp_path, '--batch', '-'],
+                                input=lines.encode('utf-8'), stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+
+        self.assertEqual(result.returncode, 1)
+
+        output = [json.loads(line) for line in result.stdout.decode('utf-8').splitlines()]
+        self.assertEqual(len(output), 2)
+        self.assertEqual(output[0]['status'], OK)
+        self.assertEqual(output[0]['result']['2']['id'], self.objs[1]['id'])
+        self.assertEqual(output[1]['status'], ERROR)
+        self.assertEqual(output[1]['error'], "Delete on registry requires alias")
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
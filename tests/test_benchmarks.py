@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import unittest
+
+from archimedes.clients.dashboard import (DASHBOARD,
+                                          INDEX_PATTERN,
+                                          SEARCH,
+                                          VISUALIZATION)
+from archimedes.errors import DataExportError, NotFoundError
+from archimedes.kibana import Kibana
+from benchmarks.fake_kibana import (DASHBOARDS_EXPORT,
+                                    DASHBOARDS_IMPORT,
+                                    FIND,
+                                    GET_OBJECT,
+                                    FakeKibana)
+from benchmarks.run import format_results, run, seed_objects
+
+
+class TestFakeKibana(unittest.TestCase):
+    """FakeKibana tests"""
+
+    def test_seed_objects(self):
+        """Test whether the objects of a set of dashboards are built"""
+
+        objs = seed_objects(100)
+
+        types = [obj['type'] for obj in objs]
+        self.assertEqual(len(objs), 100)
+        self.assertEqual(types.count(INDEX_PATTERN), 5)
+        self.assertEqual(types.count(SEARCH), 10)
+        self.assertEqual(types.count(DASHBOARD), 10)
+        self.assertEqual(types.count(VISUALIZATION), 75)
+        self.assertListEqual(seed_objects(100), objs)
+        self.assertNotEqual(seed_objects(100, seed=1), objs)
+
+    def test_api(self):
+        """Test whether the fake Kibana answers to the requests of the Kibana class"""
+
+        objs = seed_objects(40)
+        search = [obj for obj in objs if obj['type'] == SEARCH][1]
+        dashboard_id = [obj['id'] for obj in objs if obj['type'] == DASHBOARD][1]
+
+        with FakeKibana(objs) as fake:
+            kibana = Kibana(fake.url)
+
+            found = [obj for obj in kibana.find_all()]
+            self.assertEqual(len(found), 40)
+            self.assertEqual(fake.reset_requests()[FIND], 40 + 4)
+
+            obj = kibana.saved_objects.get_object(SEARCH, search['id'])
+            self.assertEqual(obj['attributes']['title'], search['attributes']['title'])
+            self.assertIsNone(kibana.saved_objects.get_object(SEARCH, 'unknown'))
+            self.assertEqual(fake.reset_requests()[GET_OBJECT], 2)
+
+            with self.assertRaises(NotFoundError):
+                _ = kibana.find_by_id(SEARCH, 'unknown')
+            self.assertEqual(fake.reset_requests()[GET_OBJECT], 1)
+
+            dashboard = kibana.dashboard.export_dashboard(dashboard_id)
+            types = {obj['type'] for obj in dashboard['objects']}
+            self.assertTrue({DASHBOARD, VISUALIZATION}.issubset(types))
+            self.assertEqual(dashboard['objects'][-1]['id'], dashboard_id)
+            with self.assertRaises(DataExportError):
+                _ = kibana.dashboard.export_dashboard('unknown')
+            self.assertEqual(fake.reset_requests()[DASHBOARDS_EXPORT], 2)
+
+            new_obj = dict(objs[0], id='new-index-pattern')
+            report = kibana.dashboard.import_objects({'objects': [objs[0], new_obj]})
+            self.assertEqual(len(report.imported), 1)
+            self.assertEqual(len(report.conflicts), 1)
+            self.assertIn((INDEX_PATTERN, 'new-index-pattern'), fake.objects)
+            self.assertEqual(fake.reset_requests()[DASHBOARDS_IMPORT], 1)
+
+    def test_run(self):
+        """Test whether the benchmarks measure every phase"""
+
+        results = run(n_objects=20, trace_memory=False)
+
+        phases = [result['phase'] for result in results]
+        self.assertListEqual(phases, ['inspect', 'populate_registry', 'export_to_disk', 'inspect_local',
+                                      'import_from_disk', 'euclid_export_batch', 'euclid_import_batch',
+                                      'euclid_import_all'])
+        for result in results:
+            if result['phase'] == 'inspect_local':
+                self.assertEqual(result['requests'], 0)
+            else:
+                self.assertGreater(result['requests'], 0)
+            self.assertEqual(result['requests'], sum(result['endpoints'].values()))
+            self.assertIsNone(result['peak_memory'])
+
+        table = format_results(results)
+        self.assertEqual(len(table.split('\n')), len(results) + 1)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
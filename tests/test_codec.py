@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import json
+import math
+import unittest
+import unittest.mock
+
+from archimedes import codec
+from generated_repo import GeneratedRepoTestCase
+
+PARAMS = {
+    'dashboards': 2,
+    'panels': 2,
+    'visualizations': 2,
+    'searches': 1,
+    'index_patterns': 1,
+    'fields': 5
+}
+
+SPECIAL_OBJ = {
+    'title': 'Acción </script>   \U0001F600',
+    'floats': [0.1, 1e16, 1e-05, -0.0, 1 / 3],
+    'big': 2 ** 70,
+    'empty': [{}, []],
+    'none': None
+}
+
+
+class TestCodec(GeneratedRepoTestCase):
+    """Codec tests"""
+
+    GENERATOR_PARAMS = PARAMS
+    WRITE_REPO = False
+
+    def backends(self):
+        """Backends installed, including the standard library"""
+
+        backends = [codec.STDLIB]
+        if codec.orjson:
+            backends.append(codec.ORJSON)
+        if codec.ujson:
+            backends.append(codec.UJSON)
+
+        return backends
+
+    def test_loads(self):
+        """Test whether the documents are decoded as the standard library does"""
+
+        docs = [json.dumps(obj, sort_keys=True, indent=4) for obj in self.objs]
+        docs.append(json.dumps(SPECIAL_OBJ))
+
+        for backend in self.backends():
+            with unittest.mock.patch('archimedes.codec.BACKEND', backend):
+                for doc in docs:
+                    self.assertEqual(codec.loads(doc), json.loads(doc))
+                    self.assertEqual(codec.loads(doc.encode('utf-8')), json.loads(doc))
+
+                self.assertTrue(math.isnan(codec.loads('[NaN]')[0]))
+                self.assertEqual(codec.loads('"\\ud800"'), '\ud800')
+
+    def test_loads_error(self):
+        """Test whether the errors are the ones of the standard library"""
+
+        for backend in self.backends():
+            with unittest.mock.patch('archimedes.codec.BACKEND', backend):
+                with self.assertRaises(json.JSONDecodeError) as cm:
+                    codec.loads('{"id": ')
+                self.assertEqual(cm.exception.msg, 'Expecting value')
+                self.assertEqual(cm.exception.pos, 7)
+
+    def test_dumps(self):
+        """Test whether the output is byte-identical to the one of the standard library"""
+
+        for backend in self.backends():
+            with unittest.mock.patch('archimedes.codec.BACKEND', backend):
+                for obj in self.objs + [SPECIAL_OBJ]:
+                    self.assertEqual(codec.dumps(obj, sort_keys=True, indent=4),
+                                     json.dumps(obj, sort_keys=True, indent=4))
+                    self.assertEqual(codec.dumps(obj), json.dumps(obj))
+
+    def test_encode(self):
+        """Test whether the objects are encoded as compact UTF-8 bytes"""
+
+        for backend in self.backends():
+            with unittest.mock.patch('archimedes.codec.BACKEND', backend):
+                for obj in self.objs + [SPECIAL_OBJ, {'surrogate': '\ud800'}]:
+                    encoded = codec.encode(obj)
+                    self.assertIsInstance(encoded, bytes)
+                    self.assertEqual(json.loads(encoded.decode('utf-8')), obj)
+
+                self.assertEqual(codec.encode({'a': [1, 'b']}), b'{"a":[1,"b"]}')
+
+        with unittest.mock.patch('archimedes.codec.BACKEND', codec.STDLIB):
+            self.assertEqual(codec.encode({'title': 'Acción'}), b'{"title":"Acci\\u00f3n"}')
+
+    @unittest.skipIf(codec.orjson is None, "orjson not installed")
+    def test_backend(self):
+        """Test whether the fastest backend installed is selected"""
+
+        self.assertEqual(codec.BACKEND, codec.ORJSON)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
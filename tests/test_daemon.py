@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import http.client
+import json
+import os
+import socket
+import stat
+import time
+import unittest
+
+from archimedes.archimedes import Archimedes
+from archimedes.batch import ERROR, OK
+from archimedes.clients.common import DASHBOARD
+from archimedes.daemon import Daemon, OPERATIONS_PATH, SOCKET_MODE, STATUS_PATH
+from archimedes.errors import DaemonError
+from archimedes.registry import REGISTRY_NAME
+from benchmarks.fake_kibana import FakeKibana
+from generated_repo import GeneratedRepoTestCase
+
+KIBANA_URL = 'http://example.com/'
+
+PARAMS = {
+    'dashboards': 2,
+    'panels': 4,
+    'visualizations': 6,
+    'searches': 2,
+    'index_patterns': 1,
+    'fields': 3
+}
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a unix socket"""
+
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def send(conn, method, path, body=None, headers=None):
+    if headers is None:
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    return response.status, json.loads(response.read().decode('utf-8'))
+
+
+class TestDaemon(GeneratedRepoTestCase):
+    """Daemon tests"""
+
+    GENERATOR_PARAMS = PARAMS
+
+    def test_initialization(self):
+        """Test whether attributes are initialized"""
+
+        archimedes = Archimedes(KIBANA_URL, self.tmp_path)
+        daemon = Daemon(archimedes, 'unix:/tmp/archimedes.sock')
+
+        self.assertEqual(daemon.archimedes, archimedes)
+        self.assertEqual(daemon.batch.archimedes, archimedes)
+        self.assertEqual(daemon.socket_path, '/tmp/archimedes.sock')
+        self.assertEqual(daemon.served, 0)
+
+        daemon = Daemon(archimedes, '127.0.0.1:8080')
+        self.assertIsNone(daemon.socket_path)
+
+    def test_tcp(self):
+        """Test whether operations are served on a local port, reusing the same components"""
+
+        dashboard = next(obj for obj in self.objs if obj['type'] == DASHBOARD)
+
+        with FakeKibana(self.objs) as fake:
+            archimedes = Archimedes(fake.url, self.tmp_path)
+
+            with Daemon(archimedes, '127.0.0.1:0') as daemon:
+                host, port = daemon.server.server_address
+                conn = http.client.HTTPConnection(host, port)
+
+                operation = {'op': 'import', 'obj_type': DASHBOARD, 'obj_id': dashboard['id'],
+                             'find': True, 'force': True, 'id': 'first'}
+                status, result = send(conn, 'POST', OPERATIONS_PATH, operation)
+                self.assertEqual(status, 200)
+                self.assertEqual(result['status'], OK)
+                self.assertEqual(result['id'], 'first')
+                self.assertEqual(result['result']['errors'], 0)
+
+                kibana = archimedes.kibana
+                manager = archimedes.manager
+
+                status, result = send(conn, 'POST', OPERATIONS_PATH, dict(operation, id='second'))
+                self.assertEqual(status, 200)
+                self.assertEqual(result['id'], 'second')
+                self.assertIs(archimedes.kibana, kibana)
+                self.assertIs(archimedes.manager, manager)
+
+                status, result = send(conn, 'POST', OPERATIONS_PATH, {'op': 'inspect'})
+                self.assertEqual(status, 400)
+                self.assertEqual(result['status'], ERROR)
+                self.assertEqual(result['error'], "Inspect requires local or remote")
+
+                status, result = send(conn, 'GET', STATUS_PATH)
+                self.assertEqual(status, 200)
+                self.assertEqual(result['operations'], 3)
+                self.assertEqual(result['errors'], 1)
+                self.assertGreater(result['uptime'], 0)
+
+                status, _ = send(conn, 'GET', '/unknown')
+                self.assertEqual(status, 404)
+                conn.close()
+
+        self.assertEqual(kibana.get_stats()['status']['requests'], 1)
+
+    def test_unix_socket(self):
+        """Test whether operations are served on a unix socket, which is removed when stopped"""
+
+        socket_path = os.path.join(self.tmp_path, 'archimedes.sock')
+        archimedes = Archimedes(KIBANA_URL, self.tmp_path)
+
+        with Daemon(archimedes, 'unix:' + socket_path):
+            self.assertTrue(os.path.exists(socket_path))
+
+            conn = UnixHTTPConnection(socket_path)
+            status, result = send(conn, 'POST', OPERATIONS_PATH, {'op': 'inspect', 'local': True})
+            self.assertEqual(status, 200)
+            self.assertEqual(len(result['result']), len(self.objs))
+            conn.close()
+
+        self.assertFalse(os.path.exists(socket_path))
+
+    def test_unix_socket_permissions(self):
+        """Test whether only the owner can use the unix socket, and a stale socket is replaced"""
+
+        socket_path = os.path.join(self.tmp_path, 'archimedes.sock')
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(socket_path)
+        stale.close()
+
+        archimedes = Archimedes(KIBANA_URL, self.tmp_path)
+
+        with Daemon(archimedes, 'unix:' + socket_path):
+            mode = os.stat(socket_path).st_mode
+            self.assertTrue(stat.S_ISSOCK(mode))
+            self.assertEqual(stat.S_IMODE(mode), SOCKET_MODE)
+
+    def test_unix_socket_regular_file(self):
+        """Test whether an existing file is not removed to create the unix socket"""
+
+        file_path = os.path.join(self.tmp_path, 'archimedes.sock')
+        with open(file_path, 'w') as f:
+            f.write('data')
+
+        daemon = Daemon(Archimedes(KIBANA_URL, self.tmp_path), 'unix:' + file_path)
+
+        with self.assertLogs('archimedes.daemon', level='ERROR') as cm:
+            with self.assertRaises(DaemonError):
+                daemon.start()
+            self.assertEqual(cm.output[0],
+                             'ERROR:archimedes.daemon:%s already exists and it is not a unix socket' % file_path)
+
+        with open(file_path) as f:
+            self.assertEqual(f.read(), 'data')
+
+    def test_requests_rejected(self):
+        """Test whether the requests without a JSON body or to a remote host are rejected"""
+
+        archimedes = Archimedes(KIBANA_URL, self.tmp_path)
+        operation = {'op': 'inspect', 'local': True}
+
+        with Daemon(archimedes, '127.0.0.1:0') as daemon:
+            host, port = daemon.server.server_address
+            conn = http.client.HTTPConnection(host, port)
+
+            for content_type in ['text/plain', 'application/x-www-form-urlencoded']:
+                status, result = send(conn, 'POST', OPERATIONS_PATH, operation, headers={'Content-Type': content_type})
+                self.assertEqual(status, 415)
+                self.assertEqual(result['error'], 'Content-Type must be application/json')
+
+            status, _ = send(conn, 'POST', OPERATIONS_PATH, operation,
+                             headers={'Content-Type': 'application/json; charset=utf-8'})
+            self.assertEqual(status, 200)
+
+            for path, body in [(OPERATIONS_PATH, operation), (STATUS_PATH, None)]:
+                status, result = send(conn, 'POST' if body else 'GET', path, body,
+                                      headers={'Content-Type': 'application/json', 'Host': 'attacker.example.com'})
+                self.assertEqual(status, 403)
+                self.assertEqual(result['error'], 'Host not allowed')
+
+            status, _ = send(conn, 'GET', STATUS_PATH, headers={'Host': 'localhost:%s' % port})
+            self.assertEqual(status, 200)
+            conn.close()
+
+            self.assertEqual(daemon.status()['operations'], 1)
+
+    def test_registry_reloaded(self):
+        """Test whether the registry is reloaded when modified by another process"""
+
+        archimedes = Archimedes(KIBANA_URL, self.tmp_path)
+        daemon = Daemon(archimedes, '127.0.0.1:0')
+
+        result = daemon.execute(json.dumps({'op': 'registry', 'action': 'show', 'alias': '1'}))
+        self.assertEqual(result['status'], OK)
+
+        # the registry saved by the daemon is not reloaded
+        registry = archimedes.registry
+        daemon.execute(json.dumps({'op': 'registry', 'action': 'update', 'alias': '1', 'new_alias': 'ip'}))
+        self.assertFalse(registry.refresh())
+
+        time.sleep(0.01)
+        with open(os.path.join(self.tmp_path, REGISTRY_NAME), 'w') as f:
+            json.dump({'other': registry.content['ip']}, f)
+
+        result = daemon.execute(json.dumps({'op': 'registry', 'action': 'show'}))
+        self.assertListEqual(list(result['result'].keys()), ['other'])
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -22,6 +22,7 @@
 import json
 import os
 import unittest
+import unittest.mock
 
 import httpretty
 import requests
@@ -175,16 +176,18 @@ class TestDashboard(unittest.TestCase):
                                body=dashboard_objs,
                                status=200)
 
-        client = Dashboard(KIBANA_URL)
+        client = Dashboard(KIBANA_URL, import_retries=0)
 
         with self.assertLogs(logger, level='INFO') as cm:
-            _ = client.import_objects(dashboard_objs_json)
+            report = client.import_objects(dashboard_objs_json)
             expected = {
                 'force': [
                     'false'
                 ]
             }
 
+            self.assertEqual(len(report.errors), 1)
+            self.assertEqual(report.errors[0]['id'], 'Git')
             self.assertEqual(cm.output[0],
                              'ERROR:archimedes.clients.dashboard:dashboard with id Git not imported, '
                              'an internal server error occurred')
@@ -192,6 +195,187 @@ class TestDashboard(unittest.TestCase):
                              'INFO:archimedes.clients.dashboard:11/12 object(s) imported')
             self.assertDictEqual(httpretty.last_request().querystring, expected)
 
+    @httpretty.activate
+    def test_import_objects_split(self):
+        """Test whether the objects are split in several requests when the payload is too big"""
+
+        dashboard_objs = read_file('data/dashboard')
+        dashboard_objs_json = json.loads(dashboard_objs)
+
+        bodies = []
+
+        def request_callback(request, uri, headers):
+            body = json.loads(request.body.decode('utf-8'))
+            bodies.append((len(request.body), body))
+            return 200, headers, json.dumps({'objects': body['objects']})
+
+        httpretty.register_uri(httpretty.POST,
+                               DASHBOARD_IMPORT_URL,
+                               body=request_callback)
+
+        max_payload_bytes = len(dashboard_objs) // 3
+        client = Dashboard(KIBANA_URL, max_payload_bytes=max_payload_bytes)
+
+        with self.assertLogs(logger, level='INFO') as cm:
+            report = client.import_objects(dashboard_objs_json)
+
+            self.assertListEqual(report.errors, [])
+            self.assertEqual(cm.output[-1],
+                             'INFO:archimedes.clients.dashboard:12/12 object(s) imported')
+
+        self.assertGreater(len(bodies), 1)
+
+        imported = []
+        for body_bytes, body in bodies:
+            if len(body['objects']) > 1:
+                self.assertLessEqual(body_bytes, max_payload_bytes)
+            self.assertEqual(body['version'], dashboard_objs_json['version'])
+            imported.extend([obj['id'] for obj in body['objects']])
+
+        self.assertListEqual(imported, [obj['id'] for obj in dashboard_objs_json['objects']])
+
+    @httpretty.activate
+    def test_import_objects_payload_too_large(self):
+        """Test whether only the requests rejected as too large are split and sent again"""
+
+        dashboard_objs = read_file('data/dashboard')
+        dashboard_objs_json = json.loads(dashboard_objs)
+        dashboard_id = 'Git'
+        imported = []
+
+        def request_callback(request, uri, headers):
+            body = json.loads(request.body.decode('utf-8'))
+            ids = [obj['id'] for obj in body['objects']]
+            if len(ids) > 3 or (dashboard_id in ids and len(ids) > 1):
+                return 413, headers, json.dumps({'statusCode': 413, 'error': 'Request Entity Too Large'})
+
+            imported.extend(ids)
+            return 200, headers, json.dumps({'objects': body['objects']})
+
+        httpretty.register_uri(httpretty.POST,
+                               DASHBOARD_IMPORT_URL,
+                               body=request_callback)
+
+        client = Dashboard(KIBANA_URL)
+
+        with self.assertLogs(logger, level='INFO') as cm:
+            report = client.import_objects(dashboard_objs_json)
+
+            self.assertListEqual(report.errors, [])
+            self.assertEqual(cm.output[0],
+                             'WARNING:archimedes.clients.dashboard:Payload of 12 object(s) too large, splitting it')
+            self.assertEqual(cm.output[-1],
+                             'INFO:archimedes.clients.dashboard:12/12 object(s) imported')
+
+        self.assertListEqual(imported, [obj['id'] for obj in dashboard_objs_json['objects']])
+
+    @httpretty.activate
+    def test_import_objects_single_object_too_large(self):
+        """Test whether an object is reported as not imported when it alone exceeds the payload limit"""
+
+        dashboard_objs = read_file('data/dashboard')
+        dashboard_objs_json = json.loads(dashboard_objs)
+
+        httpretty.register_uri(httpretty.POST,
+                               DASHBOARD_IMPORT_URL,
+                               body=json.dumps({'statusCode': 413, 'error': 'Request Entity Too Large'}),
+                               status=413)
+
+        dashboard_objs_json['objects'] = dashboard_objs_json['objects'][:1]
+        client = Dashboard(KIBANA_URL)
+
+        with self.assertLogs(logger, level='INFO') as cm:
+            report = client.import_objects(dashboard_objs_json)
+
+            self.assertEqual(len(report.errors), 1)
+            self.assertEqual(report.retries, 0)
+            self.assertEqual(report.errors[0]['error']['statusCode'], 413)
+            self.assertEqual(cm.output[-1],
+                             'INFO:archimedes.clients.dashboard:0/1 object(s) imported')
+
+    @httpretty.activate
+    @unittest.mock.patch('archimedes.clients.dashboard.time.sleep')
+    def test_import_objects_retry(self, mock_sleep):
+        """Test whether only the objects not imported because of transient errors are sent again"""
+
+        dashboard_objs = read_file('data/dashboard')
+        dashboard_objs_json = json.loads(dashboard_objs)
+        bodies = []
+
+        def request_callback(request, uri, headers):
+            body = json.loads(request.body.decode('utf-8'))
+            bodies.append(body)
+
+            objs = []
+            for obj in body['objects']:
+                obj = {'id': obj['id'], 'type': obj['type']}
+                if obj['id'] == 'git_top_authors':
+                    obj['error'] = {'message': 'Version conflict', 'statusCode': 409}
+                elif obj['id'] == 'git_main_numbers' and len(bodies) < 3:
+                    obj['error'] = {'message': 'An internal server error occurred', 'statusCode': 500}
+                elif obj['id'] == 'Git':
+                    obj['error'] = {'message': 'An internal server error occurred'}
+                objs.append(obj)
+
+            return 200, headers, json.dumps({'objects': objs})
+
+        httpretty.register_uri(httpretty.POST,
+                               DASHBOARD_IMPORT_URL,
+                               body=request_callback)
+
+        client = Dashboard(KIBANA_URL, import_retries=2)
+
+        with self.assertLogs(logger, level='INFO') as cm:
+            report = client.import_objects(dashboard_objs_json)
+
+            self.assertEqual(cm.output[0],
+                             'WARNING:archimedes.clients.dashboard:Retrying 1 object(s) not imported, attempt 1/2')
+            self.assertEqual(cm.output[1],
+                             'WARNING:archimedes.clients.dashboard:Retrying 1 object(s) not imported, attempt 2/2')
+            self.assertEqual(cm.output[2],
+                             'WARNING:archimedes.clients.dashboard:visualization with id git_top_authors not imported, '
+                             'version conflict')
+            self.assertEqual(cm.output[3],
+                             'ERROR:archimedes.clients.dashboard:dashboard with id Git not imported, '
+                             'an internal server error occurred')
+            self.assertEqual(cm.output[4],
+                             'INFO:archimedes.clients.dashboard:10/12 object(s) imported')
+
+        self.assertEqual(len(bodies), 3)
+        self.assertEqual(len(bodies[0]['objects']), 12)
+        self.assertListEqual([obj['id'] for obj in bodies[1]['objects']], ['git_main_numbers'])
+        self.assertListEqual([obj['id'] for obj in bodies[2]['objects']], ['git_main_numbers'])
+
+        self.assertEqual(report.retries, 2)
+        self.assertEqual(len(report.imported), 10)
+        self.assertListEqual([obj['id'] for obj in report.conflicts], ['git_top_authors'])
+        self.assertListEqual([obj['id'] for obj in report.errors], ['Git'])
+
+        stats = client.stats.to_dict()['dashboards/import']
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['retries'], 2)
+        self.assertListEqual([call[0][0] for call in mock_sleep.call_args_list], [1, 2])
+
+    @httpretty.activate
+    @unittest.mock.patch('archimedes.clients.dashboard.time.sleep')
+    def test_import_objects_no_retry(self, mock_sleep):
+        """Test whether the objects not imported because of non transient errors are not sent again"""
+
+        dashboard_objs = read_file('data/dashboard_error')
+        dashboard_objs_json = json.loads(dashboard_objs)
+
+        httpretty.register_uri(httpretty.POST,
+                               DASHBOARD_IMPORT_URL,
+                               body=dashboard_objs,
+                               status=200)
+
+        client = Dashboard(KIBANA_URL)
+        report = client.import_objects(dashboard_objs_json)
+
+        self.assertEqual(report.retries, 0)
+        self.assertEqual(len(report.errors), 1)
+        mock_sleep.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main(warnings='ignore')
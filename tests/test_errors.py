@@ -61,6 +61,33 @@ class TestBaseError(unittest.TestCase):
         self.assertRaises(KeyError, MockErrorArgs, **kwargs)
 
 
+class TestBatchError(unittest.TestCase):
+
+    def test_message(self):
+        """Test BatchError message"""
+
+        e = errors.BatchError(cause='unknown operation')
+        self.assertEqual('unknown operation', str(e))
+
+
+class TestCassetteError(unittest.TestCase):
+
+    def test_message(self):
+        """Test CassetteError message"""
+
+        e = errors.CassetteError(cause='interaction not found')
+        self.assertEqual('interaction not found', str(e))
+
+
+class TestDaemonError(unittest.TestCase):
+
+    def test_message(self):
+        """Test DaemonError message"""
+
+        e = errors.DaemonError(cause='address already in use')
+        self.assertEqual('address already in use', str(e))
+
+
 class TestImportError(unittest.TestCase):
 
     def test_message(self):
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from archimedes.clients.dashboard import (DASHBOARD,
+                                          INDEX_PATTERN,
+                                          SEARCH,
+                                          VISUALIZATION)
+from archimedes.manager import Manager
+from archimedes.registry import Registry
+from benchmarks.generator import generate_objects, write_repo
+
+
+PARAMS = {
+    'dashboards': 3,
+    'panels': 20,
+    'visualizations': 30,
+    'searches': 4,
+    'index_patterns': 2,
+    'fields': 10
+}
+
+
+class TestGenerator(unittest.TestCase):
+    """Generator tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='archimedes_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_generate_objects(self):
+        """Test whether the objects are generated according to the parameters"""
+
+        objs = generate_objects(**PARAMS)
+
+        types = [obj['type'] for obj in objs]
+        self.assertEqual(types.count(DASHBOARD), 3)
+        self.assertEqual(types.count(VISUALIZATION), 30)
+        self.assertEqual(types.count(SEARCH), 4)
+        self.assertEqual(types.count(INDEX_PATTERN), 2)
+
+        for obj in objs:
+            if obj['type'] == DASHBOARD:
+                self.assertEqual(len(json.loads(obj['attributes']['panelsJSON'])), 20)
+            elif obj['type'] == INDEX_PATTERN:
+                self.assertEqual(len(json.loads(obj['attributes']['fields'])), 10)
+
+    def test_generate_objects_seed(self):
+        """Test whether the objects depend only on the seed"""
+
+        objs = generate_objects(seed=1, **PARAMS)
+
+        self.assertListEqual(generate_objects(seed=1, **PARAMS), objs)
+        self.assertNotEqual(generate_objects(seed=2, **PARAMS), objs)
+
+    def test_write_repo(self):
+        """Test whether the objects and the registry are written to disk"""
+
+        objs = generate_objects(**PARAMS)
+        write_repo(self.tmp_path, objs)
+
+        manager = Manager(self.tmp_path)
+        found = [obj for _, obj in manager.find_all()]
+        self.assertEqual(len(found), len(objs))
+
+        registry = Registry(self.tmp_path)
+        alias, meta = registry.find('1')
+        self.assertEqual(meta.id, objs[0]['id'])
+        self.assertEqual(len(registry.content), len(objs))
+
+    def test_write_repo_references(self):
+        """Test whether the dependencies found with and without references are the same"""
+
+        files = []
+        for references in [False, True]:
+            root_path = os.path.join(self.tmp_path, str(references))
+            objs = generate_objects(references=references, **PARAMS)
+            write_repo(root_path, objs)
+
+            manager = Manager(root_path)
+            dashboard = objs[-1]
+            dashboard_path = os.path.join(root_path, manager.build_file_name(DASHBOARD, dashboard['id']))
+            files.append([os.path.relpath(f, root_path) for f in manager.find_dashboard_files(dashboard_path)])
+
+        self.assertGreater(len(files[0]), 20)
+        self.assertListEqual(files[0], files[1])
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
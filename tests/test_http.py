@@ -23,8 +23,10 @@ import json
 import unittest
 
 import httpretty
+import requests
 
-from archimedes.clients.http import HttpClient, HEADERS
+from archimedes import codec
+from archimedes.clients.http import HttpClient, HttpStats, HEADERS
 
 
 KIBANA_URL = 'http://example.com/'
@@ -42,6 +44,11 @@ class TestHttpClient(unittest.TestCase):
         self.assertIsNotNone(client.session)
         self.assertEqual(client.session.headers['kbn-xsrf'], HEADERS.get('kbn-xsrf'))
         self.assertEqual(client.session.headers['Content-Type'], HEADERS.get('Content-Type'))
+        self.assertIsInstance(client.stats, HttpStats)
+
+        stats = HttpStats()
+        client = HttpClient(KIBANA_URL, stats=stats)
+        self.assertEqual(client.stats, stats)
 
     @httpretty.activate
     def test_fetch(self):
@@ -106,6 +113,155 @@ class TestHttpClient(unittest.TestCase):
         response = client.post(KIBANA_URL, data, params)
         self.assertDictEqual(response, json.loads(output))
 
+    @httpretty.activate
+    def test_post_lines(self):
+        """Test the method post_lines"""
+
+        output = '{"id": 1}\n\n{"id": 2}\n'
+        data = {"param": "abcdef"}
+
+        httpretty.register_uri(httpretty.POST,
+                               KIBANA_URL,
+                               body=output,
+                               status=200)
+
+        client = HttpClient(KIBANA_URL)
+        lines = [line for line in client.post_lines(KIBANA_URL, data)]
+        self.assertListEqual(lines, ['{"id": 1}', '{"id": 2}'])
+        self.assertDictEqual(json.loads(httpretty.last_request().body.decode('utf-8')), data)
+
+    @httpretty.activate
+    def test_post_stream(self):
+        """Test the method post_stream"""
+
+        output = '{"success": true}'
+
+        httpretty.register_uri(httpretty.POST,
+                               KIBANA_URL,
+                               body=output,
+                               status=200)
+
+        client = HttpClient(KIBANA_URL)
+        response = client.post_stream(KIBANA_URL, (chunk for chunk in [b'a', b'b']), params={'overwrite': 'true'})
+        self.assertDictEqual(response, json.loads(output))
+
+        request = httpretty.last_request()
+        self.assertEqual(request.headers['Transfer-Encoding'], 'chunked')
+        self.assertDictEqual(request.querystring, {'overwrite': ['true']})
+
+    @httpretty.activate
+    def test_stats(self):
+        """Test whether the requests are recorded in the stats"""
+
+        output = '{"result": "success"}'
+        data = {"param": "abcdef"}
+
+        httpretty.register_uri(httpretty.GET,
+                               KIBANA_URL + 'api/saved_objects/_find',
+                               body=output,
+                               status=200)
+        httpretty.register_uri(httpretty.POST,
+                               KIBANA_URL + 'api/kibana/dashboards/import',
+                               body=output,
+                               status=200)
+        httpretty.register_uri(httpretty.POST,
+                               KIBANA_URL + 'api/saved_objects/_export',
+                               body='{"id": 1}\n{"id": 2}\n',
+                               status=200)
+        httpretty.register_uri(httpretty.DELETE,
+                               KIBANA_URL + 'api/saved_objects/search/1',
+                               body='{}',
+                               status=500)
+
+        client = HttpClient(KIBANA_URL)
+        _ = client.fetch(KIBANA_URL + 'api/saved_objects/_find', params={'page': 1})
+        _ = client.fetch(KIBANA_URL + 'api/saved_objects/_find', params={'page': 2})
+        _ = client.post(KIBANA_URL + 'api/kibana/dashboards/import', data, params=None)
+        _ = [line for line in client.post_lines(KIBANA_URL + 'api/saved_objects/_export', data)]
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _ = client.delete(KIBANA_URL + 'api/saved_objects/search/1')
+
+        stats = client.stats.to_dict()
+        self.assertListEqual(sorted(stats.keys()), ['_export', '_find', 'dashboards/import', 'delete_object'])
+
+        self.assertEqual(stats['_find']['requests'], 2)
+        self.assertEqual(stats['_find']['bytes_in'], 2 * len(output))
+        self.assertEqual(stats['_find']['bytes_out'], 0)
+        self.assertEqual(sum(stats['_find']['latency']['histogram'].values()), 2)
+        self.assertGreater(stats['_find']['latency']['total'], 0)
+
+        self.assertEqual(stats['dashboards/import']['requests'], 1)
+        self.assertEqual(stats['dashboards/import']['bytes_out'], len(codec.encode(data)))
+
+        self.assertEqual(stats['_export']['bytes_in'], len('{"id": 1}\n{"id": 2}\n'))
+
+        self.assertEqual(stats['delete_object']['requests'], 1)
+        self.assertEqual(stats['delete_object']['errors'], 1)
+
+        client.stats.reset()
+        self.assertDictEqual(client.stats.to_dict(), {})
+
+    @httpretty.activate
+    def test_stats_stream(self):
+        """Test whether the bytes of a streamed body are recorded in the stats"""
+
+        httpretty.register_uri(httpretty.POST,
+                               KIBANA_URL + 'api/saved_objects/_import',
+                               body='{}',
+                               status=200)
+
+        client = HttpClient(KIBANA_URL)
+        _ = client.post_stream(KIBANA_URL + 'api/saved_objects/_import', (chunk for chunk in [b'abc', b'de']))
+
+        self.assertEqual(client.stats.to_dict()['_import']['bytes_out'], 5)
+
+
+class TestHttpStats(unittest.TestCase):
+    """HttpStats tests"""
+
+    def test_endpoint(self):
+        """Test whether the requests are grouped by endpoint"""
+
+        self.assertEqual(HttpStats.endpoint('GET', 'http://example.com/api/saved_objects/_find?page=1'), '_find')
+        self.assertEqual(HttpStats.endpoint('POST', 'http://example.com/kibana/api/saved_objects/_bulk_get'),
+                         '_bulk_get')
+        self.assertEqual(HttpStats.endpoint('GET', 'http://example.com/api/saved_objects/search/1'), 'get_object')
+        self.assertEqual(HttpStats.endpoint('PUT', 'http://example.com/api/saved_objects/search/1'), 'update_object')
+        self.assertEqual(HttpStats.endpoint('POST', 'http://example.com/api/saved_objects/search/1'), 'create_object')
+        self.assertEqual(HttpStats.endpoint('DELETE', 'http://example.com/api/saved_objects/search/1'), 'delete_object')
+        self.assertEqual(HttpStats.endpoint('GET', 'http://example.com/api/kibana/dashboards/export?dashboard=1'),
+                         'dashboards/export')
+        self.assertEqual(HttpStats.endpoint('POST', 'http://example.com/api/kibana/dashboards/import'),
+                         'dashboards/import')
+        self.assertEqual(HttpStats.endpoint('GET', 'http://example.com/api/status'), 'status')
+        self.assertEqual(HttpStats.endpoint('GET', 'http://example.com/other'), 'other')
+
+    def test_record(self):
+        """Test whether the latencies are recorded in the histogram"""
+
+        stats = HttpStats()
+        stats.record('_find', 0.005, bytes_in=10)
+        stats.record('_find', 0.3, bytes_in=20, retries=2)
+        stats.record('_find', 60, error=True)
+        stats.add_retries('_find')
+        stats.add_bytes_in('_find', 5)
+
+        result = stats.to_dict()['_find']
+        self.assertEqual(result['requests'], 3)
+        self.assertEqual(result['errors'], 1)
+        self.assertEqual(result['retries'], 3)
+        self.assertEqual(result['bytes_in'], 35)
+        self.assertEqual(result['latency']['min'], 0.005)
+        self.assertEqual(result['latency']['max'], 60)
+        self.assertEqual(result['latency']['histogram']['10'], 1)
+        self.assertEqual(result['latency']['histogram']['500'], 1)
+        self.assertEqual(result['latency']['histogram']['inf'], 1)
+        self.assertEqual(sum(result['latency']['histogram'].values()), 3)
+
+        table = stats.format().split('\n')
+        self.assertEqual(len(table), 2)
+        self.assertTrue(table[1].startswith('_find'))
+
 
 if __name__ == "__main__":
     unittest.main(warnings='ignore')
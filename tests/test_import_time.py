@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARCHIMEDES_BIN = os.path.join(ROOT_PATH, 'bin', 'archimedes')
+
+# modules needed only to contact Kibana
+REMOTE_MODULES = ['requests', 'urllib3', 'grimoirelab_toolkit', 'archimedes.kibana', 'archimedes.clients.http']
+
+# microseconds allowed to import archimedes.archimedes, with a wide margin for slow machines
+IMPORT_TIME_BUDGET = 150000
+
+
+def import_times(args):
+    """Run Python with `-X importtime` and return the cumulative import time of each module."""
+
+    env = dict(os.environ, PYTHONPATH=ROOT_PATH)
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, check=True)
+
+    times = {}
+    for line in result.stderr.decode('utf-8').splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+
+    return times
+
+
+class TestImportTime(unittest.TestCase):
+    """Import time tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='archimedes_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_import_archimedes(self):
+        """Test whether importing Archimedes does not load the HTTP stack"""
+
+        times = import_times(['-c', 'import archimedes.archimedes'])
+
+        self.assertIn('archimedes.archimedes', times)
+        for module in REMOTE_MODULES:
+            self.assertNotIn(module, times)
+        self.assertLess(times['archimedes.archimedes'], IMPORT_TIME_BUDGET)
+
+    def test_local_commands(self):
+        """Test whether local commands do not load the HTTP stack"""
+
+        report_path = os.path.join(self.tmp_path, 'report.json')
+        commands = [
+            ['--registry', '--show'],
+            ['--inspect', '--local'],
+            ['--registry', '--show', '--stats', '--report', report_path]
+        ]
+        for command in commands:
+            times = import_times([ARCHIMEDES_BIN, 'http://example.com', self.tmp_path] + command)
+
+            for module in REMOTE_MODULES:
+                self.assertNotIn(module, times)
+
+        with open(report_path) as f:
+            report = json.load(f)
+        self.assertDictEqual(report['requests'], {})
+
+    def test_remote_modules(self):
+        """Test whether the HTTP stack is loaded when Kibana is used"""
+
+        times = import_times(['-c', 'import archimedes.archimedes; '
+                                    'archimedes.archimedes.Archimedes("http://example.com", ".").kibana'])
+
+        for module in REMOTE_MODULES:
+            self.assertIn(module, times)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
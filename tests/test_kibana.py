@@ -19,17 +19,36 @@
 #   Valerio Cosentino <valcos@bitergia.com>
 #
 
+import concurrent.futures
+import json
 import unittest
+import unittest.mock
 
-from archimedes.kibana import Kibana
+import httpretty
+import requests
+
+from archimedes.kibana import (DASHBOARD_API,
+                               SAVED_OBJECTS_API,
+                               Kibana)
+from archimedes.clients.common import ImportReport
 from archimedes.clients.saved_objects import SavedObjects
 from archimedes.clients.dashboard import (Dashboard,
                                           DASHBOARD,
                                           VISUALIZATION)
-from archimedes.errors import (ObjectTypeError,
+from archimedes.errors import (DataExportError,
+                               ObjectTypeError,
                                NotFoundError)
 
+from benchmarks.fake_kibana import FakeKibana
+from request_budget import RequestBudgetMixin
+
 KIBANA_URL = 'http://example.com/'
+STATUS_URL = KIBANA_URL + Kibana.API_STATUS_URL
+IMPORT_URL = KIBANA_URL + SavedObjects.API_SAVED_OBJECTS_URL + '/' + SavedObjects.API_IMPORT_ENDPOINT
+DASHBOARD_IMPORT_URL = KIBANA_URL + Dashboard.API_DASHBOARDS_URL + '/' + Dashboard.API_IMPORT_COMMAND
+EXPORT_URL = KIBANA_URL + SavedObjects.API_SAVED_OBJECTS_URL + '/' + SavedObjects.API_EXPORT_ENDPOINT
+FIND_URL = KIBANA_URL + SavedObjects.API_SAVED_OBJECTS_URL + '/' + SavedObjects.API_FIND_ENDPOINT
+OBJECT_URL = KIBANA_URL + SavedObjects.API_SAVED_OBJECTS_URL + '/{}/{}'
 
 DASHBOARD_ID = 'dashboard-id'
 DASHBOARD_TITLE = 'dashboard-title'
@@ -78,6 +97,7 @@ class MockedKibana(Kibana):
 
         self.dashboard = MockedDashboard(base_url, content)
         self.saved_objects = MockedSavedObjects(base_url, content)
+        self.version = '6.8.6'
 
     def find_all(self):
         objs = []
@@ -193,23 +213,285 @@ class TestKibana(unittest.TestCase):
         with self.assertRaises(NotFoundError):
             kibana.find_by_title("unknown", "unknown")
 
+    @httpretty.activate
     def test_find_by_id(self):
         """Test whether an object is found by id"""
 
         expected = OBJECTS[0][0]
 
-        kibana = MockedKibana(KIBANA_URL, OBJECTS)
+        httpretty.register_uri(httpretty.GET,
+                               OBJECT_URL.format(DASHBOARD, DASHBOARD_ID),
+                               body=json.dumps(expected),
+                               status=200)
+
+        kibana = Kibana(KIBANA_URL)
         obj = kibana.find_by_id(DASHBOARD, DASHBOARD_ID)
 
         self.assertDictEqual(obj, expected)
 
+    @httpretty.activate
     def test_find_by_id_not_found(self):
         """Test whether an error is thrown when the object is not found"""
 
-        kibana = MockedKibana(KIBANA_URL, OBJECTS)
+        httpretty.register_uri(httpretty.GET,
+                               OBJECT_URL.format("unknown", "unknown"),
+                               body=json.dumps({'statusCode': 400, 'error': 'Bad Request',
+                                                'message': "Unsupported saved object type: 'unknown': Bad Request"}),
+                               status=400)
+        httpretty.register_uri(httpretty.GET,
+                               OBJECT_URL.format(DASHBOARD, 'unknown'),
+                               body='{"statusCode": 404}',
+                               status=404)
 
-        with self.assertRaises(NotFoundError):
-            kibana.find_by_id("unknown", "unknown")
+        kibana = Kibana(KIBANA_URL)
+
+        with self.assertLogs('archimedes.kibana', level='ERROR'):
+            with self.assertRaises(NotFoundError):
+                kibana.find_by_id("unknown", "unknown")
+
+            with self.assertRaises(NotFoundError):
+                kibana.find_by_id(DASHBOARD, "unknown")
+
+    @httpretty.activate
+    def test_find_by_id_http_error(self):
+        """Test whether the server errors are not reported as objects not found"""
+
+        httpretty.register_uri(httpretty.GET,
+                               OBJECT_URL.format(DASHBOARD, DASHBOARD_ID),
+                               body='{"statusCode": 500}',
+                               status=500)
+
+        kibana = Kibana(KIBANA_URL)
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            kibana.find_by_id(DASHBOARD, DASHBOARD_ID)
+
+    @httpretty.activate
+    def test_find_existing(self):
+        """Test whether the objects already in Kibana are identified with a single request"""
+
+        body = {
+            'saved_objects': [
+                {'id': DASHBOARD_ID, 'type': DASHBOARD, 'attributes': {'title': DASHBOARD_TITLE}},
+                {'id': VISUALIZATION_ID, 'type': VISUALIZATION, 'error': {'statusCode': 404}}
+            ]
+        }
+        httpretty.register_uri(httpretty.POST,
+                               KIBANA_URL + SavedObjects.API_SAVED_OBJECTS_URL + '/' +
+                               SavedObjects.API_BULK_GET_ENDPOINT,
+                               body=json.dumps(body),
+                               status=200)
+
+        kibana = Kibana(KIBANA_URL)
+        existing = kibana.find_existing(OBJECTS[0])
+
+        self.assertSetEqual(existing, {(DASHBOARD, DASHBOARD_ID)})
+
+        self.assertSetEqual(kibana.find_existing([]), set())
+
+    @httpretty.activate
+    def test_get_version(self):
+        """Test whether the version of Kibana is retrieved only once"""
+
+        calls = []
+
+        def request_callback(request, uri, headers):
+            calls.append(uri)
+            return 200, headers, json.dumps({'version': {'number': '7.10.2'}})
+
+        httpretty.register_uri(httpretty.GET,
+                               STATUS_URL,
+                               body=request_callback)
+
+        kibana = Kibana(KIBANA_URL)
+        self.assertEqual(kibana.get_version(), '7.10.2')
+        self.assertEqual(kibana.get_version(), '7.10.2')
+        self.assertEqual(len(calls), 1)
+
+    @httpretty.activate
+    def test_get_version_error(self):
+        """Test whether an empty version is returned, and not cached, when the status API is not available"""
+
+        httpretty.register_uri(httpretty.GET,
+                               STATUS_URL,
+                               responses=[
+                                   httpretty.Response(body='{"statusCode": 503}', status=503),
+                                   httpretty.Response(body='{"statusCode": 503}', status=503),
+                                   httpretty.Response(body=json.dumps({'version': {'number': '7.10.2'}}), status=200)
+                               ])
+
+        kibana = Kibana(KIBANA_URL)
+        with self.assertLogs('archimedes.kibana', level='WARNING'):
+            self.assertEqual(kibana.get_version(), '')
+        self.assertIsNone(kibana.version)
+
+        # the status API is queried again on the next call
+        with self.assertLogs('archimedes.kibana', level='WARNING'):
+            self.assertEqual(kibana.get_version(), '')
+        self.assertEqual(kibana.get_version(), '7.10.2')
+        self.assertEqual(kibana.get_version(), '7.10.2')
+        self.assertEqual(len(httpretty.latest_requests()), 3)
+
+    @httpretty.activate
+    def test_export_by_id_dashboard_7(self):
+        """Test whether dashboards are exported with their references using the _export endpoint"""
+
+        objs = OBJECTS[0]
+        summary = {'exportedCount': 2, 'missingRefCount': 0, 'missingReferences': []}
+        body = '\n'.join([json.dumps(obj) for obj in objs + [summary]])
+
+        httpretty.register_uri(httpretty.GET,
+                               STATUS_URL,
+                               body=json.dumps({'version': {'number': '7.10.2'}}),
+                               status=200)
+        httpretty.register_uri(httpretty.POST,
+                               EXPORT_URL,
+                               body=body,
+                               status=200)
+
+        kibana = Kibana(KIBANA_URL)
+        exported = kibana.export_by_id(DASHBOARD, DASHBOARD_ID)
+
+        self.assertListEqual(exported['objects'], objs)
+        self.assertEqual(exported['version'], '7.10.2')
+
+        request = json.loads(httpretty.last_request().body.decode('utf-8'))
+        expected = {
+            'objects': [{'type': DASHBOARD, 'id': DASHBOARD_ID}],
+            'includeReferencesDeep': True
+        }
+        self.assertDictEqual(request, expected)
+
+    @httpretty.activate
+    def test_export_by_id_dashboard_7_not_found(self):
+        """Test whether an error is thrown when the dashboard cannot be exported with the _export endpoint"""
+
+        httpretty.register_uri(httpretty.GET,
+                               STATUS_URL,
+                               body=json.dumps({'version': {'number': '7.10.2'}}),
+                               status=200)
+        httpretty.register_uri(httpretty.POST,
+                               EXPORT_URL,
+                               body='{"statusCode": 400}',
+                               status=400)
+
+        kibana = Kibana(KIBANA_URL)
+        with self.assertRaises(DataExportError):
+            kibana.export_by_id(DASHBOARD, DASHBOARD_ID)
+
+    @httpretty.activate
+    def test_import_objects_7(self):
+        """Test whether objects are imported with the SavedObjects API on Kibana 7.x"""
+
+        body = {
+            'success': False,
+            'successCount': 1,
+            'errors': [
+                {'id': VISUALIZATION_ID, 'type': VISUALIZATION, 'title': VISUALIZATION_TITLE,
+                 'error': {'type': 'conflict'}}
+            ]
+        }
+
+        httpretty.register_uri(httpretty.GET,
+                               STATUS_URL,
+                               body=json.dumps({'version': {'number': '7.10.2'}}),
+                               status=200)
+        httpretty.register_uri(httpretty.POST,
+                               IMPORT_URL,
+                               body=json.dumps(body),
+                               status=200)
+
+        kibana = Kibana(KIBANA_URL)
+        report = kibana.import_objects({'objects': (obj for obj in OBJECTS[0])})
+
+        self.assertEqual(kibana.import_api, SAVED_OBJECTS_API)
+        self.assertListEqual(report.imported, [{'type': DASHBOARD, 'id': DASHBOARD_ID}])
+        self.assertEqual(len(report.conflicts), 1)
+        self.assertEqual(report.conflicts[0]['id'], VISUALIZATION_ID)
+        self.assertEqual(report.conflicts[0]['error']['statusCode'], 409)
+        self.assertListEqual(report.errors, [])
+        self.assertDictEqual(httpretty.last_request().querystring, {'overwrite': ['false']})
+
+    @httpretty.activate
+    def test_import_objects_6(self):
+        """Test whether objects are imported with the Dashboard API on older Kibana instances"""
+
+        httpretty.register_uri(httpretty.GET,
+                               STATUS_URL,
+                               body=json.dumps({'version': {'number': '6.8.6'}}),
+                               status=200)
+        httpretty.register_uri(httpretty.POST,
+                               DASHBOARD_IMPORT_URL,
+                               body=json.dumps({'objects': OBJECTS[0]}),
+                               status=200)
+
+        kibana = Kibana(KIBANA_URL)
+        report = kibana.import_objects({'objects': (obj for obj in OBJECTS[0])}, force=True)
+
+        self.assertEqual(kibana.import_api, DASHBOARD_API)
+        self.assertEqual(len(report.imported), 2)
+        self.assertDictEqual(httpretty.last_request().querystring, {'force': ['true']})
+
+    @httpretty.activate
+    def test_get_stats(self):
+        """Test whether the requests sent through both APIs are recorded in the same stats"""
+
+        httpretty.register_uri(httpretty.GET,
+                               STATUS_URL,
+                               body=json.dumps({'version': {'number': '6.8.6'}}),
+                               status=200)
+        httpretty.register_uri(httpretty.POST,
+                               DASHBOARD_IMPORT_URL,
+                               body=json.dumps({'objects': OBJECTS[0]}),
+                               status=200)
+
+        kibana = Kibana(KIBANA_URL)
+        self.assertIs(kibana.dashboard.stats, kibana.stats)
+        self.assertIs(kibana.saved_objects.stats, kibana.stats)
+
+        _ = kibana.import_objects({'objects': OBJECTS[0]})
+
+        stats = kibana.get_stats()
+        self.assertListEqual(sorted(stats.keys()), ['dashboards/import', 'status'])
+        self.assertEqual(stats['status']['requests'], 1)
+        self.assertEqual(stats['dashboards/import']['requests'], 1)
+
+        kibana.reset_stats()
+        self.assertDictEqual(kibana.get_stats(), {})
+
+    def test_import_api_cached(self):
+        """Test whether the import API is selected once per Kibana instance"""
+
+        kibana = Kibana(KIBANA_URL)
+        kibana.get_version = unittest.mock.Mock(return_value='7.10.2')
+        kibana.saved_objects.import_objects = unittest.mock.Mock(return_value=ImportReport())
+
+        for _ in range(2):
+            kibana.import_objects({'objects': OBJECTS[0]})
+
+        kibana.get_version.assert_called_once()
+        self.assertEqual(kibana.saved_objects.import_objects.call_count, 2)
+        self.assertEqual(kibana.import_api, SAVED_OBJECTS_API)
+
+        # the API selected by an instance is not shared with the others
+        other = Kibana(KIBANA_URL)
+        self.assertIsNone(other.import_api)
+
+    def test_import_api_version_unknown(self):
+        """Test whether the import API is not cached when the version cannot be retrieved"""
+
+        kibana = Kibana(KIBANA_URL)
+        kibana.get_version = unittest.mock.Mock(side_effect=['', '7.10.2'])
+        kibana.dashboard.import_objects = unittest.mock.Mock(return_value=ImportReport())
+        kibana.saved_objects.import_objects = unittest.mock.Mock(return_value=ImportReport())
+
+        kibana.import_objects({'objects': OBJECTS[0]})
+        self.assertIsNone(kibana.import_api)
+        kibana.dashboard.import_objects.assert_called_once()
+
+        kibana.import_objects({'objects': OBJECTS[0]})
+        self.assertEqual(kibana.import_api, SAVED_OBJECTS_API)
+        kibana.saved_objects.import_objects.assert_called_once()
 
     def test_find_all(self):
         """Test whether all objects in Kibana are retrieved"""
@@ -222,5 +504,160 @@ class TestKibana(unittest.TestCase):
         self.assertDictEqual(objs[1], OBJECTS[0][1])
 
 
+class TestKibanaRequestBudget(RequestBudgetMixin, unittest.TestCase):
+    """Tests of the number of requests sent by Kibana"""
+
+    @httpretty.activate
+    def test_find_by_id(self):
+        """Test whether an object is found by id with a single request"""
+
+        httpretty.register_uri(httpretty.GET,
+                               OBJECT_URL.format(DASHBOARD, DASHBOARD_ID),
+                               body=json.dumps(OBJECTS[0][0]),
+                               status=200)
+
+        kibana = Kibana(KIBANA_URL)
+        with self.assertMaxRequests(1, endpoints={'get_object': 1}):
+            kibana.find_by_id(DASHBOARD, DASHBOARD_ID)
+
+    @httpretty.activate
+    def test_find_by_title(self):
+        """Test whether finding an object by title sends a request per page plus one"""
+
+        pages = [
+            httpretty.Response(body=json.dumps({'page': 1, 'saved_objects': [OBJECTS[0][1]]}), status=200),
+            httpretty.Response(body=json.dumps({'page': 2, 'saved_objects': []}), status=200)
+        ]
+        httpretty.register_uri(httpretty.GET, FIND_URL, responses=pages)
+
+        kibana = Kibana(KIBANA_URL)
+        with self.assertMaxRequests(2, endpoints={'_find': 2}):
+            kibana.find_by_title(VISUALIZATION, VISUALIZATION_TITLE)
+
+    @httpretty.activate
+    def test_find_by_id_not_found_cached(self):
+        """Test whether an object not found is not searched again until the cache expires"""
+
+        httpretty.register_uri(httpretty.GET,
+                               OBJECT_URL.format(DASHBOARD, DASHBOARD_ID),
+                               body=json.dumps({'statusCode': 404}),
+                               status=404)
+
+        kibana = Kibana(KIBANA_URL)
+        with self.assertMaxRequests(1, endpoints={'get_object': 1}):
+            for _ in range(3):
+                with self.assertLogs('archimedes.kibana', level='ERROR') as cm:
+                    with self.assertRaises(NotFoundError):
+                        kibana.find_by_id(DASHBOARD, DASHBOARD_ID)
+                self.assertEqual(cm.output[-1], 'ERROR:archimedes.kibana:No dashboard found with ID: ' + DASHBOARD_ID)
+
+        # importing objects forgets the objects not found
+        with unittest.mock.patch.object(Dashboard, 'import_objects'), \
+                unittest.mock.patch.object(Kibana, 'get_version', return_value='6.8.6'):
+            kibana.import_objects({'objects': []})
+
+        with self.assertMaxRequests(1, endpoints={'get_object': 1}):
+            with self.assertLogs('archimedes.kibana', level='ERROR'):
+                with self.assertRaises(NotFoundError):
+                    kibana.find_by_id(DASHBOARD, DASHBOARD_ID)
+
+        kibana = Kibana(KIBANA_URL, not_found_ttl=0)
+        with self.assertMaxRequests(2, endpoints={'get_object': 2}):
+            for _ in range(2):
+                with self.assertLogs('archimedes.kibana', level='ERROR'):
+                    with self.assertRaises(NotFoundError):
+                        kibana.find_by_id(DASHBOARD, DASHBOARD_ID)
+
+    @httpretty.activate
+    def test_find_by_title_not_found_cached(self):
+        """Test whether a title not found is not searched again"""
+
+        httpretty.register_uri(httpretty.GET, FIND_URL,
+                               body=json.dumps({'page': 1, 'saved_objects': []}),
+                               status=200)
+
+        kibana = Kibana(KIBANA_URL)
+        with self.assertMaxRequests(1, endpoints={'_find': 1}):
+            for _ in range(2):
+                with self.assertLogs('archimedes.kibana', level='ERROR'):
+                    with self.assertRaises(NotFoundError):
+                        kibana.find_by_title(DASHBOARD, DASHBOARD_TITLE)
+
+    def test_concurrent_lookups(self):
+        """Test whether concurrent searches of the same object send a single request"""
+
+        objs = [OBJECTS[0][0], OBJECTS[0][1]]
+        with FakeKibana(objs, latency=0.2) as fake:
+            kibana = Kibana(fake.url)
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+                with self.assertMaxRequests(3, endpoints={'get_object': 1, '_find': 2}):
+                    by_id = [executor.submit(kibana.find_by_id, DASHBOARD, DASHBOARD_ID) for _ in range(4)]
+                    by_title = [executor.submit(kibana.find_by_title, DASHBOARD, 'unknown') for _ in range(4)]
+                    concurrent.futures.wait(by_id + by_title)
+
+            for future in by_id:
+                self.assertEqual(future.result()['id'], DASHBOARD_ID)
+            for future in by_title:
+                self.assertIsInstance(future.exception(), NotFoundError)
+
+    @httpretty.activate
+    def test_export_dashboard_7(self):
+        """Test whether a dashboard and its references are exported with a request, plus the version one"""
+
+        summary = {'exportedCount': 2, 'missingRefCount': 0, 'missingReferences': []}
+        httpretty.register_uri(httpretty.GET,
+                               STATUS_URL,
+                               body=json.dumps({'version': {'number': '7.10.2'}}),
+                               status=200)
+        httpretty.register_uri(httpretty.POST,
+                               EXPORT_URL,
+                               body='\n'.join([json.dumps(obj) for obj in OBJECTS[0] + [summary]]),
+                               status=200)
+
+        kibana = Kibana(KIBANA_URL)
+        with self.assertMaxRequests(2, endpoints={'_export': 1}):
+            kibana.export_by_id(DASHBOARD, DASHBOARD_ID)
+
+        with self.assertMaxRequests(1, endpoints={'status': 0}):
+            kibana.export_by_id(DASHBOARD, DASHBOARD_ID)
+
+    @httpretty.activate
+    def test_import_objects_7(self):
+        """Test whether objects are imported with a request, plus the version one"""
+
+        httpretty.register_uri(httpretty.GET,
+                               STATUS_URL,
+                               body=json.dumps({'version': {'number': '7.10.2'}}),
+                               status=200)
+        httpretty.register_uri(httpretty.POST,
+                               IMPORT_URL,
+                               body=json.dumps({'success': True, 'successCount': 2}),
+                               status=200)
+
+        kibana = Kibana(KIBANA_URL)
+        with self.assertMaxRequests(2, endpoints={'_import': 1}):
+            kibana.import_objects({'objects': OBJECTS[0]})
+
+    @httpretty.activate
+    def test_budget_exceeded(self):
+        """Test whether the test fails when the requests exceed the budget"""
+
+        httpretty.register_uri(httpretty.GET,
+                               OBJECT_URL.format(DASHBOARD, DASHBOARD_ID),
+                               body=json.dumps(OBJECTS[0][0]),
+                               status=200)
+
+        kibana = Kibana(KIBANA_URL)
+        with self.assertRaisesRegex(AssertionError, '2 request\\(s\\) sent, expected at most 1'):
+            with self.assertMaxRequests(1):
+                kibana.find_by_id(DASHBOARD, DASHBOARD_ID)
+                kibana.find_by_id(DASHBOARD, DASHBOARD_ID)
+
+        with self.assertRaisesRegex(AssertionError, '1 request\\(s\\) sent to get_object, expected at most 0'):
+            with self.assertMaxRequests(endpoints={'get_object': 0}):
+                kibana.find_by_id(DASHBOARD, DASHBOARD_ID)
+
+
 if __name__ == "__main__":
     unittest.main(warnings='ignore')
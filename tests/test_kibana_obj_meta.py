@@ -193,6 +193,15 @@ class TestMetaObj(unittest.TestCase):
 
         self.assertEqual(str_repr, json.dumps(expected, sort_keys=True, indent=4))
 
+    def test_to_dict(self):
+        """Test whether the metadata is converted to a dict"""
+
+        obj = KibanaObjMeta.create_from_obj(DASHBOARD_OBJ)
+        self.assertDictEqual(obj.to_dict(), json.loads(repr(obj)))
+
+        obj = KibanaObjMeta('1', 'title', 'search', 1)
+        self.assertDictEqual(obj.to_dict(), {'id': '1', 'title': 'title', 'type': 'search', 'version': 1})
+
     def test_repr_no_title(self):
         """Test whether the repr method properly works for object without a title"""
 
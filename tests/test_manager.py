@@ -19,12 +19,14 @@
 #   Valerio Cosentino <valcos@bitergia.com>
 #
 
+import concurrent.futures
 import json
 import os
 import shutil
 import subprocess
 import tempfile
 import unittest
+import unittest.mock
 
 from archimedes.clients.dashboard import (DASHBOARD,
                                           INDEX_PATTERN,
@@ -34,10 +36,13 @@ from archimedes.errors import (NotFoundError,
                                ObjectTypeError)
 from archimedes.manager import (logger,
                                 Manager,
+                                INDEX_PATTERN_REF_NAME,
                                 VISUALIZATIONS_FOLDER,
                                 SEARCHES_FOLDER,
                                 INDEX_PATTERNS_FOLDER,
                                 JSON_EXT)
+from archimedes.kibana_obj_meta import KibanaObjMeta
+from archimedes.spans import SPANS
 
 
 EXPECTED_DASHBOARD = 'dashboard_Maniphest-Backlog.json'
@@ -116,6 +121,23 @@ class TestManager(unittest.TestCase):
             visualization_path = os.path.join(self.tmp_full, VISUALIZATIONS_FOLDER, visualization_file_name)
             self.assertIn(visualization_path, dashboard_files)
 
+    def test_find_dashboard_files_spans(self):
+        """Test whether the lookups, the loads and the resolution of the dependencies are measured"""
+
+        manager = Manager(self.tmp_full)
+        dashboard_file_path = os.path.join(self.tmp_full, EXPECTED_DASHBOARD)
+
+        SPANS.enable()
+        try:
+            _ = manager.find_dashboard_files(dashboard_file_path)
+        finally:
+            SPANS.disable()
+
+        phases = SPANS.to_dict()['phases']
+        self.assertListEqual(sorted(phases.keys()), ['load_json', 'manager.lookup', 'manager.resolve'])
+        self.assertGreaterEqual(phases['manager.lookup']['count'], len(EXPECTED_VISUALIZATIONS))
+        self.assertLessEqual(phases['manager.resolve']['total'], SPANS.to_dict()['wall_time'])
+
     def test_find_dashboard_files_no_viz(self):
         """Test whether only the dashboard file is returned when the visualization folder does not exit"""
 
@@ -191,6 +213,148 @@ class TestManager(unittest.TestCase):
         index_pattern = manager.find_index_pattern(json.loads(visualization))
         self.assertEqual(index_pattern, "7c2496c0-b013-11e8-8771-a349686d998a")
 
+    def test_find_index_pattern_references(self):
+        """Test whether the index pattern id is retrieved from the references of an object"""
+
+        visualization = json.loads(read_file('data/object_visualization'))
+        visualization['references'] = [
+            {'name': 'kibanaSavedObjectMeta.searchSourceJSON.filter[0].meta.index',
+             'type': INDEX_PATTERN, 'id': 'filter-index-pattern'},
+            {'name': INDEX_PATTERN_REF_NAME, 'type': INDEX_PATTERN, 'id': 'ref-index-pattern'}
+        ]
+        manager = Manager(self.tmp_full)
+
+        with unittest.mock.patch('archimedes.manager.codec.loads') as mock_loads:
+            index_pattern = manager.find_index_pattern(visualization)
+            mock_loads.assert_not_called()
+
+        self.assertEqual(index_pattern, 'ref-index-pattern')
+
+    def test_find_index_pattern_memoized(self):
+        """Test whether the nested JSON of an object is decoded once while it does not change"""
+
+        visualization = json.loads(read_file('data/object_visualization'))
+        manager = Manager(self.tmp_full)
+
+        with unittest.mock.patch('archimedes.manager.codec.loads', wraps=json.loads) as mock_loads:
+            self.assertEqual(manager.find_index_pattern(visualization), "7c2496c0-b013-11e8-8771-a349686d998a")
+            self.assertEqual(manager.find_index_pattern(json.loads(read_file('data/object_visualization'))),
+                             "7c2496c0-b013-11e8-8771-a349686d998a")
+            self.assertEqual(mock_loads.call_count, 1)
+
+            meta = visualization['attributes']['kibanaSavedObjectMeta']
+            meta['searchSourceJSON'] = json.dumps({'index': 'new-index-pattern'})
+            self.assertEqual(manager.find_index_pattern(visualization), 'new-index-pattern')
+            self.assertEqual(mock_loads.call_count, 2)
+
+    def test_find_saved_search(self):
+        """Test whether the saved search id is retrieved from the references or the attributes"""
+
+        manager = Manager(self.tmp_full)
+
+        obj = {'attributes': {'savedSearchId': 'search-id'}}
+        self.assertEqual(manager.find_saved_search(obj), 'search-id')
+
+        obj = {
+            'attributes': {'savedSearchRefName': 'search_0'},
+            'references': [
+                {'name': INDEX_PATTERN_REF_NAME, 'type': INDEX_PATTERN, 'id': 'ip-id'},
+                {'name': 'search_0', 'type': SEARCH, 'id': 'ref-search-id'}
+            ]
+        }
+        self.assertEqual(manager.find_saved_search(obj), 'ref-search-id')
+
+        obj = {'attributes': {}, 'references': []}
+        self.assertIsNone(manager.find_saved_search(obj))
+
+    def test_find_panels(self):
+        """Test whether the panels are retrieved from the references or the panelsJSON attribute"""
+
+        manager = Manager(self.tmp_full)
+
+        panels = [{'type': VISUALIZATION, 'id': 'vis-id', 'panelIndex': '1'}]
+        dashboard = {'type': DASHBOARD, 'id': 'dash-id', 'attributes': {'panelsJSON': json.dumps(panels)}}
+        self.assertListEqual(manager.find_panels(dashboard), panels)
+
+        dashboard = {
+            'type': DASHBOARD,
+            'id': 'dash-id',
+            'attributes': {'panelsJSON': json.dumps([{'panelRefName': 'panel_0'}, {'panelRefName': 'panel_1'}])},
+            'references': [
+                {'name': 'kibanaSavedObjectMeta.searchSourceJSON.filter[0].meta.index', 'type': INDEX_PATTERN,
+                 'id': 'ip-id'},
+                {'name': 'panel_0', 'type': VISUALIZATION, 'id': 'vis-id'},
+                {'name': 'panel_1', 'type': SEARCH, 'id': 'search-id'}
+            ]
+        }
+        self.assertListEqual(manager.find_panels(dashboard),
+                             [{'type': VISUALIZATION, 'id': 'vis-id'}, {'type': SEARCH, 'id': 'search-id'}])
+
+    def test_find_panels_reference_not_found(self):
+        """Test whether an exception is thrown when a panel points to a missing reference"""
+
+        manager = Manager(self.tmp_full)
+
+        dashboard = {
+            'type': DASHBOARD,
+            'id': 'dash-id',
+            'attributes': {'panelsJSON': json.dumps([{'panelRefName': 'panel_0'}])},
+            'references': []
+        }
+        with self.assertLogs(logger, level='ERROR') as cm:
+            with self.assertRaises(NotFoundError):
+                manager.find_panels(dashboard)
+            self.assertEqual(cm.output[0],
+                             'ERROR:archimedes.manager:Reference panel_0 not found in dashboard dash-id')
+
+    def test_nested_json_bounded(self):
+        """Test whether the oldest nested JSON values are evicted when the cache is full"""
+
+        manager = Manager(self.tmp_full)
+
+        with unittest.mock.patch('archimedes.manager.NESTED_JSON_CACHE_SIZE', 2):
+            for obj_id in ['a', 'b', 'c']:
+                dashboard = {'type': DASHBOARD, 'id': obj_id, 'attributes': {'panelsJSON': '[]'}}
+                manager.find_panels(dashboard)
+
+        self.assertListEqual([key[1] for key in manager.nested_json], ['b', 'c'])
+
+    def test_find_dashboard_files_references(self):
+        """Test whether the files of a dashboard are retrieved using the references of the objects"""
+
+        ip_ref = {'name': INDEX_PATTERN_REF_NAME, 'type': INDEX_PATTERN, 'id': 'ip-id'}
+        search_source = {'kibanaSavedObjectMeta': {'searchSourceJSON': '{"indexRefName": "%s"}' % ip_ref['name']}}
+        objs = [
+            {'type': INDEX_PATTERN, 'id': 'ip-id', 'attributes': {'title': 'ip'}},
+            {'type': SEARCH, 'id': 'search-id', 'attributes': dict(search_source, title='search'),
+             'references': [ip_ref]},
+            {'type': VISUALIZATION, 'id': 'vis-id', 'attributes': {'title': 'vis', 'savedSearchRefName': 'search_0'},
+             'references': [{'name': 'search_0', 'type': SEARCH, 'id': 'search-id'}]},
+            {'type': DASHBOARD, 'id': 'dash-id',
+             'attributes': {'title': 'dash', 'panelsJSON': '[{"panelRefName": "panel_0"}]'},
+             'references': [{'name': 'kibanaSavedObjectMeta.searchSourceJSON.filter[0].meta.index',
+                             'type': INDEX_PATTERN, 'id': 'ip-id'},
+                            {'name': 'panel_0', 'type': VISUALIZATION, 'id': 'vis-id'}]}
+        ]
+
+        tmp_path = tempfile.mkdtemp(prefix='archimedes_')
+        manager = Manager(tmp_path)
+        for obj in objs:
+            manager.save_obj(obj)
+
+        dashboard_path = os.path.join(tmp_path, 'dashboard_dash-id.json')
+        dashboard_files = manager.find_dashboard_files(dashboard_path)
+
+        expected = [
+            os.path.join(tmp_path, SEARCHES_FOLDER, 'search_search-id.json'),
+            os.path.join(tmp_path, INDEX_PATTERNS_FOLDER, 'index-pattern_ip-id.json'),
+            os.path.join(tmp_path, VISUALIZATIONS_FOLDER, 'visualization_vis-id.json'),
+            dashboard_path
+        ]
+        self.assertListEqual(dashboard_files, expected)
+
+        shutil.rmtree(tmp_path)
+
     def test_build_folder_path(self):
         """Test whether the folder path is properly built"""
 
@@ -332,6 +496,188 @@ class TestManager(unittest.TestCase):
         searches = [obj for obj in objs if obj['type'] == SEARCH]
         self.assertEqual(len(searches), 1)
 
+    def test_find_all_type(self):
+        """Test whether only the objects of a given type are found on disk"""
+
+        manager = Manager(self.tmp_full)
+        objs = [t[1] for t in manager.find_all(VISUALIZATION)]
+
+        self.assertEqual(len(objs), 8)
+        self.assertTrue(all(obj['type'] == VISUALIZATION for obj in objs))
+
+        objs = [t[1] for t in manager.find_all(INDEX_PATTERN)]
+        self.assertEqual(len(objs), 1)
+        self.assertEqual(objs[0]['type'], INDEX_PATTERN)
+
+    def test_find_all_meta_only(self):
+        """Test whether only the metadata of the objects is returned"""
+
+        manager = Manager(self.tmp_full)
+        objs = {path: obj for path, obj in manager.find_all()}
+        metas = [t for t in manager.find_all(meta_only=True)]
+
+        self.assertListEqual([path for path, _ in metas], list(objs.keys()))
+        for path, meta in metas:
+            obj = objs[path]
+            expected = {key: obj[key] for key in ['id', 'type', 'version', 'updated_at'] if key in obj}
+            expected['attributes'] = {'title': obj['attributes']['title']}
+            self.assertDictEqual(meta, expected)
+            self.assertEqual(repr(KibanaObjMeta.create_from_obj(meta)), repr(KibanaObjMeta.create_from_obj(obj)))
+
+    @unittest.mock.patch('archimedes.manager.PARALLEL_SCAN_MIN_FILES', 0)
+    def test_find_all_parallel(self):
+        """Test whether the objects decoded by a pool of processes are returned in the same order"""
+
+        manager = Manager(self.tmp_full)
+
+        expected = [t for t in manager.find_all(workers=1)]
+        self.assertListEqual([t for t in manager.find_all(workers=2)], expected)
+
+        expected = [t for t in manager.find_all(VISUALIZATION, meta_only=True, workers=1)]
+        self.assertListEqual([t for t in manager.find_all(VISUALIZATION, meta_only=True, workers=2)], expected)
+        self.assertEqual(len(expected), 8)
+
+    @unittest.mock.patch('archimedes.manager.SCAN_CHUNK_SIZE', 1)
+    @unittest.mock.patch('archimedes.manager.PARALLEL_SCAN_MIN_FILES', 0)
+    def test_find_all_parallel_closed(self):
+        """Test whether the files not decoded yet are discarded when the generator is closed"""
+
+        executors = []
+
+        class MockExecutor:
+            """Executor running only the first task submitted"""
+
+            def __init__(self, max_workers, mp_context):
+                self.mp_context = mp_context
+                self.futures = []
+                self.shutdown_wait = None
+                executors.append(self)
+
+            def submit(self, fn, *args):
+                future = concurrent.futures.Future()
+                if not self.futures:
+                    future.set_result(fn(*args))
+                self.futures.append(future)
+                return future
+
+            def shutdown(self, wait=True):
+                self.shutdown_wait = wait
+
+        manager = Manager(self.tmp_full)
+        expected = next(manager.find_all(workers=1))
+
+        with unittest.mock.patch('concurrent.futures.ProcessPoolExecutor', MockExecutor):
+            objs = manager.find_all(workers=2)
+            self.assertEqual(next(objs), expected)
+            objs.close()
+
+        executor = executors[0]
+        self.assertNotEqual(executor.mp_context.get_start_method(), 'fork')
+        self.assertGreater(len(executor.futures), 1)
+        self.assertTrue(all(future.cancelled() for future in executor.futures[1:]))
+        self.assertFalse(executor.shutdown_wait)
+
+    def test_find_files_order(self):
+        """Test whether the files are always found in the same order"""
+
+        manager = Manager(self.tmp_full)
+        files = [f[1] for f in manager.find_files()]
+
+        root_files = [f for f in files if os.path.dirname(f) == self.tmp_full]
+        self.assertListEqual(root_files, sorted(root_files))
+        self.assertListEqual(files[:len(root_files)], root_files)
+
+        folders = [os.path.dirname(f) for f in files[len(root_files):]]
+        self.assertListEqual(folders, sorted(folders))
+        self.assertListEqual(files[len(root_files):], sorted(files[len(root_files):]))
+
+    def test_find_files(self):
+        """Test whether the paths and types of the object files are found without reading them"""
+
+        manager = Manager(self.tmp_full)
+        files = [f for f in manager.find_files()]
+
+        self.assertEqual(len(files), 11)
+        for obj_type, file_path in files:
+            self.assertTrue(os.path.basename(file_path).startswith(obj_type + '_'))
+
+        types = [f[0] for f in files]
+        self.assertEqual(types.count(VISUALIZATION), 8)
+        self.assertEqual(types.count(DASHBOARD), 1)
+
+        folder = os.path.join(self.tmp_full, VISUALIZATIONS_FOLDER)
+        files = [f for f in manager.find_files([folder, os.path.join(self.tmp_full, 'unknown')])]
+        self.assertEqual(len(files), 8)
+        self.assertTrue(all(os.path.dirname(file_path) == folder for _, file_path in files))
+
+    def test_find_file_type(self):
+        """Test whether the type of the objects is found from the name of a file"""
+
+        self.assertEqual(Manager.find_file_type('visualization_1.json'), VISUALIZATION)
+        self.assertEqual(Manager.find_file_type('index-pattern_1.json'), INDEX_PATTERN)
+        self.assertEqual(Manager.find_file_type('dashboard_1.json'), DASHBOARD)
+        self.assertIsNone(Manager.find_file_type('dashboard_1.json.swp'))
+        self.assertIsNone(Manager.find_file_type('notes.json'))
+
+    def test_find_files_type_folders(self):
+        """Test whether only the root folder and the type folders are scanned"""
+
+        root_path = os.path.join(self.tmp_path, 'type_folders')
+        shutil.copytree(self.tmp_full, root_path)
+
+        for folder in ['.git/objects', 'visualizations/nested', 'other']:
+            os.makedirs(os.path.join(root_path, folder))
+            shutil.copy(os.path.join(self.tmp_full, 'dashboard_Maniphest-Backlog.json'),
+                        os.path.join(root_path, folder, 'dashboard_copy.json'))
+
+        manager = Manager(root_path)
+        with unittest.mock.patch('archimedes.manager.os.scandir', wraps=os.scandir) as mock_scandir:
+            files = [f[1] for f in manager.find_files()]
+
+        folders = [call[0][0] for call in mock_scandir.call_args_list]
+        self.assertListEqual(folders, manager.find_folders())
+        self.assertListEqual(folders, [root_path,
+                                       os.path.join(root_path, INDEX_PATTERNS_FOLDER),
+                                       os.path.join(root_path, SEARCHES_FOLDER),
+                                       os.path.join(root_path, VISUALIZATIONS_FOLDER)])
+        self.assertEqual(len(files), 11)
+        self.assertFalse(any('dashboard_copy' in f for f in files))
+
+        shutil.rmtree(root_path)
+
+    def test_find_files_include_exclude(self):
+        """Test whether the folders included are scanned and the paths excluded are skipped"""
+
+        root_path = os.path.join(self.tmp_path, 'include_exclude')
+        shutil.copytree(self.tmp_full, root_path)
+
+        for folder in ['extra/a', 'extra/b', 'visualizations/nested']:
+            os.makedirs(os.path.join(root_path, folder))
+            shutil.copy(os.path.join(self.tmp_full, 'dashboard_Maniphest-Backlog.json'),
+                        os.path.join(root_path, folder, 'dashboard_copy.json'))
+
+        manager = Manager(root_path, include=['extra/*', 'visualizations/'],
+                          exclude=['extra/b', 'visualizations/*_openissues_*', 'searches'])
+        self.assertListEqual(manager.find_folders(), [root_path,
+                                                      os.path.join(root_path, 'extra', 'a'),
+                                                      os.path.join(root_path, INDEX_PATTERNS_FOLDER),
+                                                      os.path.join(root_path, VISUALIZATIONS_FOLDER)])
+
+        files = [f for f in manager.find_files()]
+        self.assertIn((DASHBOARD, os.path.join(root_path, 'extra', 'a', 'dashboard_copy.json')), files)
+
+        types = [f[0] for f in files]
+        self.assertEqual(types.count(DASHBOARD), 2)
+        self.assertEqual(types.count(VISUALIZATION), 1)
+        self.assertEqual(types.count(SEARCH), 0)
+        self.assertEqual(types.count(INDEX_PATTERN), 1)
+
+        self.assertTrue(manager.is_excluded(os.path.join(root_path, SEARCHES_FOLDER)))
+        self.assertFalse(manager.is_excluded(os.path.join(root_path, 'extra', 'a')))
+        self.assertFalse(Manager(root_path).is_excluded(os.path.join(root_path, SEARCHES_FOLDER)))
+
+        shutil.rmtree(root_path)
+
     def test_find_all_empty(self):
         """Test whether no objects are found when the archimedes folder is empty"""
 
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import json
+import os
+import unittest
+
+from archimedes.kibana_obj_meta import KibanaObjMeta
+from archimedes.meta_extractor import (extract_meta,
+                                       read_meta,
+                                       scan_meta)
+from generated_repo import GeneratedRepoTestCase
+
+PARAMS = {
+    'dashboards': 2,
+    'panels': 2,
+    'visualizations': 2,
+    'searches': 1,
+    'index_patterns': 1,
+    'fields': 50
+}
+
+
+class TestMetaExtractor(GeneratedRepoTestCase):
+    """Metadata extractor tests"""
+
+    GENERATOR_PARAMS = PARAMS
+    WRITE_REPO = False
+
+    def write(self, content, file_name='obj.json'):
+        file_path = os.path.join(self.tmp_path, file_name)
+        with open(file_path, 'w') as f:
+            f.write(content)
+
+        return file_path
+
+    def test_scan_meta(self):
+        """Test whether the metadata scanned is equal to the one of the decoded objects"""
+
+        for obj in self.objs:
+            for sort_keys in [True, False]:
+                content = json.dumps(obj, sort_keys=sort_keys, indent=4)
+                self.assertDictEqual(scan_meta(content), extract_meta(obj))
+
+    def test_scan_meta_nested_title(self):
+        """Test whether only the title in the attributes is scanned"""
+
+        obj = {
+            'attributes': {
+                'description': 'a "title" in a string\n    "title": "Wrong"',
+                'panels': [{'title': 'Panel'}],
+                'title': 'Dashboard'
+            },
+            'id': '1',
+            'references': [{'id': '2', 'title': 'Reference'}],
+            'type': 'dashboard'
+        }
+        meta = scan_meta(json.dumps(obj, sort_keys=True, indent=4))
+        self.assertDictEqual(meta, {'id': '1', 'type': 'dashboard', 'attributes': {'title': 'Dashboard'}})
+
+        del obj['attributes']['title']
+        meta = scan_meta(json.dumps(obj, sort_keys=True, indent=4))
+        self.assertDictEqual(meta['attributes'], {})
+
+        obj['migrationVersion'] = {'title': '7.0.0'}
+        with self.assertRaises(ValueError):
+            scan_meta(json.dumps(obj, sort_keys=True, indent=4))
+
+    def test_scan_meta_not_supported(self):
+        """Test whether an error is thrown when the content does not follow the layout supported"""
+
+        obj = self.objs[0]
+
+        with self.assertRaises(ValueError):
+            scan_meta(json.dumps(obj))
+        with self.assertRaises(ValueError):
+            scan_meta(json.dumps(obj, indent=2))
+        with self.assertRaises(ValueError):
+            scan_meta(json.dumps({'objects': self.objs}, indent=4))
+
+    def test_read_meta(self):
+        """Test whether the metadata of a file is read"""
+
+        for obj in self.objs:
+            file_path = self.write(json.dumps(obj, sort_keys=True, indent=4))
+            self.assertDictEqual(read_meta(file_path), extract_meta(obj))
+
+    def test_read_meta_decoded(self):
+        """Test whether the files in other layouts are fully decoded"""
+
+        obj = self.objs[0]
+
+        file_path = self.write(json.dumps(obj))
+        self.assertDictEqual(read_meta(file_path), extract_meta(obj))
+
+        file_path = self.write(json.dumps({'objects': self.objs}, indent=4))
+        self.assertDictEqual(read_meta(file_path), {'attributes': {}})
+
+        file_path = self.write('{\n    "id": ')
+        with self.assertRaises(json.JSONDecodeError):
+            read_meta(file_path)
+
+    def test_create_from_file(self):
+        """Test whether a meta object is created from a file"""
+
+        for obj in self.objs:
+            file_path = self.write(json.dumps(obj, sort_keys=True, indent=4))
+            self.assertEqual(repr(KibanaObjMeta.create_from_file(file_path)),
+                             repr(KibanaObjMeta.create_from_obj(obj)))
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import io
+import os
+import pstats
+import shutil
+import tempfile
+import time
+import unittest
+
+from archimedes.profiler import COLLAPSED, PSTATS, Profiler
+
+
+def busy_function(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += 1
+    return total
+
+
+class TestProfiler(unittest.TestCase):
+    """Profiler tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='archimedes_')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def test_pstats(self):
+        """Test whether the profile is saved as pstats and the hottest functions are summarized"""
+
+        path = os.path.join(self.tmp_path, 'profile.pstats')
+        output = io.StringIO()
+
+        with Profiler(path, fmt=PSTATS, top=5, stream=output):
+            busy_function(0.01)
+
+        stats = pstats.Stats(path)
+        functions = [func for _, _, func in stats.stats.keys()]
+        self.assertIn('busy_function', functions)
+
+        summary = output.getvalue()
+        self.assertIn('busy_function', summary)
+        self.assertIn('Ordered by: cumulative time', summary)
+
+    def test_collapsed(self):
+        """Test whether the stack is sampled and saved as collapsed stacks"""
+
+        path = os.path.join(self.tmp_path, 'profile.collapsed')
+        output = io.StringIO()
+
+        with Profiler(path, fmt=COLLAPSED, top=5, interval=0.001, stream=output):
+            busy_function(0.1)
+
+        with open(path, 'r') as f:
+            lines = f.read().splitlines()
+
+        self.assertGreater(len(lines), 0)
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            self.assertGreater(int(count), 0)
+        self.assertTrue(any('busy_function (test_profiler.py:' in line for line in lines))
+
+        summary = output.getvalue().splitlines()
+        self.assertRegex(summary[0], r'^\d+ samples, every 1 ms$')
+        self.assertLessEqual(len(summary), 2 + 5)
+        self.assertTrue(any('busy_function' in line for line in summary))
+
+    def test_unknown_format(self):
+        """Test whether an error is thrown when the format is unknown"""
+
+        with self.assertRaises(ValueError):
+            _ = Profiler(os.path.join(self.tmp_path, 'profile'), fmt='xxx')
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -111,6 +111,29 @@ class TestRegistry(unittest.TestCase):
         self.assertEqual(registry.path, registry_path)
         self.assertTrue(os.path.exists(registry_path))
 
+    def test_refresh(self):
+        """Test whether the registry is reloaded only when modified by another process"""
+
+        registry = Registry(self.tmp_path)
+        self.assertFalse(registry.refresh())
+
+        registry.add(KibanaObjMeta.create_from_obj(DASHBOARD_OBJ))
+        self.assertFalse(registry.refresh())
+        self.assertEqual(len(registry.content), 1)
+
+        other = Registry(self.tmp_path)
+        other.clear()
+        mtime = registry.mtime + 1000000000
+        os.utime(registry.path, ns=(mtime, mtime))
+
+        self.assertTrue(registry.refresh())
+        self.assertDictEqual(registry.content, {})
+        self.assertFalse(registry.refresh())
+
+        os.remove(registry.path)
+        self.assertTrue(registry.refresh())
+        self.assertDictEqual(registry.content, {})
+
     def test_find_all(self):
         """Test whether the find method returns all entries when no obj type is given"""
 
@@ -22,20 +22,26 @@
 import json
 import os
 import unittest
+import unittest.mock
 
 import httpretty
 import requests
 
+from archimedes.clients.common import IMPORT_MAX_RETRIES, MAX_PAYLOAD_BYTES
 from archimedes.clients.http import HEADERS
 from archimedes.clients.saved_objects import (logger,
                                               SavedObjects)
 
+from request_budget import RequestBudgetMixin
+
 
 KIBANA_URL = 'http://example.com/'
 SAVED_OBJECTS_URL = KIBANA_URL + SavedObjects.API_SAVED_OBJECTS_URL
 
 OBJECT_TYPE = "index-pattern"
 OBJECT_ID = "7c2496c0-b013-11e8-8771-a349686d998a"
+IMPORT_URL = SAVED_OBJECTS_URL + '/' + SavedObjects.API_IMPORT_ENDPOINT
+BULK_GET_URL = SAVED_OBJECTS_URL + '/' + SavedObjects.API_BULK_GET_ENDPOINT
 OBJECT_URL = KIBANA_URL + SavedObjects.API_SAVED_OBJECTS_URL + "/" + OBJECT_TYPE + "/" + OBJECT_ID
 
 
@@ -45,6 +51,13 @@ def read_file(filename, mode='r'):
     return content
 
 
+def read_ndjson_multipart(body):
+    """Read the objects of the NDJSON file uploaded within a multipart body"""
+
+    content = body.split(b'\r\n\r\n', 1)[1].rsplit(b'\r\n--', 1)[0]
+    return [json.loads(line.decode('utf-8')) for line in content.splitlines()]
+
+
 class TestSavedObjects(unittest.TestCase):
     """SavedObjects API tests"""
 
@@ -54,6 +67,8 @@ class TestSavedObjects(unittest.TestCase):
         client = SavedObjects(KIBANA_URL)
 
         self.assertEqual(client.base_url, KIBANA_URL)
+        self.assertEqual(client.max_payload_bytes, MAX_PAYLOAD_BYTES)
+        self.assertEqual(client.import_retries, IMPORT_MAX_RETRIES)
         self.assertIsNotNone(client.session)
         self.assertEqual(client.session.headers['kbn-xsrf'], HEADERS.get('kbn-xsrf'))
         self.assertEqual(client.session.headers['Content-Type'], HEADERS.get('Content-Type'))
@@ -205,6 +220,30 @@ class TestSavedObjects(unittest.TestCase):
         obj = client.get_object(OBJECT_TYPE, OBJECT_ID)
         self.assertDictEqual(obj, json.loads(obj_data))
 
+    @httpretty.activate
+    def test_find_page(self):
+        """Test the method find_page"""
+
+        page_data = read_file('data/objects_1')
+
+        httpretty.register_uri(httpretty.GET,
+                               SAVED_OBJECTS_URL + '/_find',
+                               body=page_data,
+                               status=200)
+
+        client = SavedObjects(KIBANA_URL)
+        page = client.find_page('visualization', page=2, per_page=50, sort_field='updated_at', sort_order='desc')
+        self.assertDictEqual(page, json.loads(page_data))
+
+        expected = {
+            'page': ['2'],
+            'per_page': ['50'],
+            'type': ['visualization'],
+            'sort_field': ['updated_at'],
+            'sort_order': ['desc']
+        }
+        self.assertDictEqual(httpretty.last_request().querystring, expected)
+
     @httpretty.activate
     def test_get_object_not_found(self):
         """Test whether a warning is logged when the object is not found"""
@@ -239,6 +278,267 @@ class TestSavedObjects(unittest.TestCase):
         with self.assertRaises(requests.exceptions.HTTPError):
             _ = client.get_object(OBJECT_TYPE, OBJECT_ID)
 
+    @httpretty.activate
+    def test_bulk_get(self):
+        """Test whether several objects are retrieved with a single request"""
+
+        body = {
+            'saved_objects': [
+                {'id': OBJECT_ID, 'type': OBJECT_TYPE, 'attributes': {'title': 'maniphest'}},
+                {'id': 'missing', 'type': OBJECT_TYPE, 'error': {'statusCode': 404, 'message': 'Not found'}}
+            ]
+        }
+
+        httpretty.register_uri(httpretty.POST,
+                               BULK_GET_URL,
+                               body=json.dumps(body),
+                               status=200)
+
+        client = SavedObjects(KIBANA_URL)
+        objs = client.bulk_get([{'id': OBJECT_ID, 'type': OBJECT_TYPE, 'attributes': {}},
+                                {'id': 'missing', 'type': OBJECT_TYPE}], fields=['title'])
+
+        self.assertListEqual(objs, body['saved_objects'])
+
+        expected = [
+            {'id': OBJECT_ID, 'type': OBJECT_TYPE, 'fields': ['title']},
+            {'id': 'missing', 'type': OBJECT_TYPE, 'fields': ['title']}
+        ]
+        self.assertListEqual(json.loads(httpretty.last_request().body.decode('utf-8')), expected)
+
+    @httpretty.activate
+    def test_bulk_get_not_supported(self):
+        """Test whether an empty list is returned when the endpoint is not supported"""
+
+        for status in [400, 404]:
+            httpretty.register_uri(httpretty.POST,
+                                   BULK_GET_URL,
+                                   body='{"statusCode": %s}' % status,
+                                   status=status)
+
+            client = SavedObjects(KIBANA_URL)
+            with self.assertLogs(logger, level='WARNING') as cm:
+                objs = client.bulk_get([{'id': OBJECT_ID, 'type': OBJECT_TYPE}])
+                self.assertEqual(cm.output[0],
+                                 'WARNING:archimedes.clients.saved_objects:'
+                                 'Impossible to get objects in bulk, url ' + BULK_GET_URL)
+                self.assertListEqual(objs, [])
+
+    @httpretty.activate
+    def test_bulk_get_http_error(self):
+        """Test whether an exception is thrown when the HTTP error is not 400 or 404"""
+
+        httpretty.register_uri(httpretty.POST,
+                               BULK_GET_URL,
+                               body='{"statusCode": 500}',
+                               status=500)
+
+        client = SavedObjects(KIBANA_URL)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            _ = client.bulk_get([{'id': OBJECT_ID, 'type': OBJECT_TYPE}])
+
+    @httpretty.activate
+    def test_import_objects(self):
+        """Test whether objects are imported as a NDJSON file using a multipart request"""
+
+        body = {'success': True, 'successCount': 2}
+
+        httpretty.register_uri(httpretty.POST,
+                               IMPORT_URL,
+                               body=json.dumps(body),
+                               status=200)
+
+        objs = [{'id': OBJECT_ID, 'type': OBJECT_TYPE}, {'id': 'search-id', 'type': 'search'}]
+        client = SavedObjects(KIBANA_URL)
+        report = client.import_objects((obj for obj in objs), overwrite=True)
+
+        self.assertListEqual(report.imported, objs)
+        self.assertListEqual(report.conflicts, [])
+        self.assertListEqual(report.errors, [])
+
+        request = httpretty.last_request()
+        self.assertDictEqual(request.querystring, {'overwrite': ['true']})
+        self.assertTrue(request.headers['Content-Type'].startswith('multipart/form-data; boundary='))
+        self.assertEqual(request.headers['kbn-xsrf'], HEADERS.get('kbn-xsrf'))
+        self.assertListEqual(read_ndjson_multipart(request.body), objs)
+
+    @httpretty.activate
+    def test_import_objects_split(self):
+        """Test whether the objects are split in several requests when the payload is too big"""
+
+        objs = [{'id': str(i), 'type': 'search', 'attributes': {'title': 'Search ' + str(i)}} for i in range(12)]
+        bodies = []
+
+        def request_callback(request, uri, headers):
+            bodies.append((len(request.body), read_ndjson_multipart(request.body)))
+            return 200, headers, json.dumps({'success': True})
+
+        httpretty.register_uri(httpretty.POST, IMPORT_URL, body=request_callback)
+
+        max_payload_bytes = 500
+        client = SavedObjects(KIBANA_URL, max_payload_bytes=max_payload_bytes)
+
+        with self.assertLogs(logger, level='INFO') as cm:
+            report = client.import_objects(obj for obj in objs)
+            self.assertEqual(cm.output[-1],
+                             'INFO:archimedes.clients.saved_objects:12/12 object(s) imported')
+
+        self.assertGreater(len(bodies), 1)
+
+        imported = []
+        for body_bytes, body in bodies:
+            self.assertLessEqual(body_bytes, max_payload_bytes)
+            imported.extend(body)
+
+        self.assertListEqual(imported, objs)
+        self.assertEqual(len(report.imported), 12)
+
+    @httpretty.activate
+    def test_import_objects_payload_too_large(self):
+        """Test whether only the requests rejected as too large are split and sent again"""
+
+        objs = [{'id': str(i), 'type': 'search'} for i in range(8)]
+        imported = []
+
+        def request_callback(request, uri, headers):
+            body = read_ndjson_multipart(request.body)
+            ids = [obj['id'] for obj in body]
+            if len(ids) > 3 or ('7' in ids and len(ids) > 1):
+                return 413, headers, json.dumps({'statusCode': 413, 'error': 'Request Entity Too Large'})
+
+            imported.extend(ids)
+            return 200, headers, json.dumps({'success': True})
+
+        httpretty.register_uri(httpretty.POST, IMPORT_URL, body=request_callback)
+
+        client = SavedObjects(KIBANA_URL)
+
+        with self.assertLogs(logger, level='INFO') as cm:
+            report = client.import_objects(obj for obj in objs)
+
+            self.assertListEqual(report.errors, [])
+            self.assertEqual(cm.output[0],
+                             'WARNING:archimedes.clients.saved_objects:Payload of 8 object(s) too large, splitting it')
+            self.assertEqual(cm.output[-1],
+                             'INFO:archimedes.clients.saved_objects:8/8 object(s) imported')
+
+        self.assertListEqual(imported, [obj['id'] for obj in objs])
+
+    @httpretty.activate
+    def test_import_objects_single_object_too_large(self):
+        """Test whether an object is reported as not imported when it alone exceeds the payload limit"""
+
+        httpretty.register_uri(httpretty.POST,
+                               IMPORT_URL,
+                               body=json.dumps({'statusCode': 413, 'error': 'Request Entity Too Large'}),
+                               status=413)
+
+        client = SavedObjects(KIBANA_URL)
+
+        with self.assertLogs(logger, level='INFO') as cm:
+            report = client.import_objects([{'id': OBJECT_ID, 'type': OBJECT_TYPE}])
+
+            self.assertEqual(len(report.errors), 1)
+            self.assertEqual(report.retries, 0)
+            self.assertEqual(report.errors[0]['error']['statusCode'], 413)
+            self.assertEqual(cm.output[-1],
+                             'INFO:archimedes.clients.saved_objects:0/1 object(s) imported')
+
+    @httpretty.activate
+    @unittest.mock.patch('archimedes.clients.saved_objects.time.sleep')
+    def test_import_objects_retry(self, mock_sleep):
+        """Test whether only the objects not imported because of transient errors are sent again"""
+
+        objs = [{'id': str(i), 'type': 'search'} for i in range(5)]
+        bodies = []
+
+        def request_callback(request, uri, headers):
+            body = read_ndjson_multipart(request.body)
+            bodies.append(body)
+
+            if len(bodies) == 1:
+                return 503, headers, json.dumps({'statusCode': 503, 'error': 'Service Unavailable'})
+
+            errors = []
+            for obj in body:
+                if obj['id'] == '1':
+                    errors.append({'id': '1', 'type': 'search', 'error': {'type': 'conflict'}})
+                elif obj['id'] == '2' and len(bodies) < 4:
+                    errors.append({'id': '2', 'type': 'search',
+                                   'error': {'type': 'unknown', 'message': 'Too Many Requests', 'statusCode': 429}})
+                elif obj['id'] == '3':
+                    errors.append({'id': '3', 'type': 'search',
+                                   'error': {'type': 'missing_references', 'references': []}})
+
+            return 200, headers, json.dumps({'success': not errors, 'errors': errors})
+
+        httpretty.register_uri(httpretty.POST, IMPORT_URL, body=request_callback)
+
+        client = SavedObjects(KIBANA_URL, import_retries=3)
+
+        with self.assertLogs(logger, level='INFO') as cm:
+            report = client.import_objects(obj for obj in objs)
+
+            self.assertEqual(cm.output[0],
+                             'WARNING:archimedes.clients.saved_objects:Retrying 5 object(s) not imported, attempt 1/3')
+            self.assertEqual(cm.output[1],
+                             'WARNING:archimedes.clients.saved_objects:Retrying 1 object(s) not imported, attempt 2/3')
+            self.assertEqual(cm.output[2],
+                             'WARNING:archimedes.clients.saved_objects:Retrying 1 object(s) not imported, attempt 3/3')
+            self.assertEqual(cm.output[3],
+                             'WARNING:archimedes.clients.saved_objects:search with id 1 not imported, conflict')
+            self.assertEqual(cm.output[4],
+                             'ERROR:archimedes.clients.saved_objects:search with id 3 not imported, missing_references')
+            self.assertEqual(cm.output[5],
+                             'INFO:archimedes.clients.saved_objects:3/5 object(s) imported')
+
+        self.assertEqual(len(bodies), 4)
+        self.assertListEqual(bodies[0], objs)
+        self.assertListEqual(bodies[1], objs)
+        self.assertListEqual(bodies[2], [objs[2]])
+        self.assertListEqual(bodies[3], [objs[2]])
+
+        self.assertEqual(report.retries, 3)
+        self.assertListEqual([obj['id'] for obj in report.imported], ['0', '4', '2'])
+        self.assertListEqual([obj['id'] for obj in report.conflicts], ['1'])
+        self.assertEqual(report.conflicts[0]['error']['statusCode'], 409)
+        self.assertListEqual([obj['id'] for obj in report.errors], ['3'])
+
+        stats = client.stats.to_dict()['_import']
+        self.assertEqual(stats['requests'], 4)
+        self.assertEqual(stats['retries'], 3)
+        self.assertListEqual([call[0][0] for call in mock_sleep.call_args_list], [1, 2, 4])
+
+    @httpretty.activate
+    def test_import_objects_http_error(self):
+        """Test whether an exception is thrown when the import fails"""
+
+        httpretty.register_uri(httpretty.POST,
+                               IMPORT_URL,
+                               body='{"statusCode": 415}',
+                               status=415)
+
+        client = SavedObjects(KIBANA_URL)
+        with self.assertLogs(logger, level='ERROR'):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                _ = client.import_objects([{'id': OBJECT_ID, 'type': OBJECT_TYPE}])
+
+    def test_ndjson_multipart(self):
+        """Test whether the multipart body is generated lazily, one object per line"""
+
+        objs = [{'id': OBJECT_ID, 'type': OBJECT_TYPE}, {'id': 'search-id', 'type': 'search'}]
+        client = SavedObjects(KIBANA_URL)
+
+        parts = [part for part in client._ndjson_multipart(iter(objs), 'xyz')]
+
+        self.assertEqual(len(parts), 4)
+        self.assertEqual(parts[0], b'--xyz\r\n'
+                                   b'Content-Disposition: form-data; name="file"; filename="export.ndjson"\r\n'
+                                   b'Content-Type: application/ndjson\r\n\r\n')
+        self.assertEqual(json.loads(parts[1].decode('utf-8')), objs[0])
+        self.assertEqual(json.loads(parts[2].decode('utf-8')), objs[1])
+        self.assertEqual(parts[3], b'\r\n--xyz--\r\n')
+
     @httpretty.activate
     def test_delete_object(self):
         """Test the method delete_object"""
@@ -407,5 +707,46 @@ class TestSavedObjects(unittest.TestCase):
             _ = client.create_object(OBJECT_TYPE, OBJECT_ID, attributes)
 
 
+class TestSavedObjectsRequestBudget(RequestBudgetMixin, unittest.TestCase):
+    """Tests of the number of requests sent by SavedObjects"""
+
+    @httpretty.activate
+    def test_find(self):
+        """Test whether objects are found with a request per object plus one"""
+
+        pages = [
+            httpretty.Response(body=read_file('data/objects_1'), status=200),
+            httpretty.Response(body=read_file('data/objects_2'), status=200),
+            httpretty.Response(body=read_file('data/objects_empty'), status=200)
+        ]
+        httpretty.register_uri(httpretty.GET, SAVED_OBJECTS_URL + '/_find', responses=pages)
+
+        client = SavedObjects(KIBANA_URL)
+        with self.assertMaxRequests(3, endpoints={'_find': 3}):
+            _ = [obj for page_objs in client.find(obj_type='visualization') for obj in page_objs]
+
+    @httpretty.activate
+    def test_bulk_get(self):
+        """Test whether several objects are retrieved with a single request"""
+
+        httpretty.register_uri(httpretty.POST, BULK_GET_URL, body='{"saved_objects": []}', status=200)
+
+        client = SavedObjects(KIBANA_URL)
+        objs = [{'type': OBJECT_TYPE, 'id': str(i)} for i in range(100)]
+        with self.assertMaxRequests(1):
+            client.bulk_get(objs)
+
+    @httpretty.activate
+    def test_import_objects(self):
+        """Test whether several objects are imported with a single request"""
+
+        httpretty.register_uri(httpretty.POST, IMPORT_URL, body='{"success": true}', status=200)
+
+        client = SavedObjects(KIBANA_URL)
+        objs = [{'type': OBJECT_TYPE, 'id': str(i), 'attributes': {}} for i in range(100)]
+        with self.assertMaxRequests(1):
+            client.import_objects(objs)
+
+
 if __name__ == "__main__":
     unittest.main(warnings='ignore')
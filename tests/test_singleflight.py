@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import concurrent.futures
+import threading
+import unittest
+
+from archimedes.errors import NotFoundError
+from archimedes.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """SingleFlight tests"""
+
+    def test_do(self):
+        """Test whether concurrent calls with the same key run once"""
+
+        release = threading.Event()
+        calls = []
+
+        def find(value):
+            calls.append(value)
+            release.wait(5)
+            return value.upper()
+
+        flights = SingleFlight()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
+            futures = [executor.submit(flights.do, 'key', find, 'a') for _ in range(4)]
+            other = executor.submit(flights.do, 'other', find, 'b')
+            while len(calls) < 2:
+                release.wait(0.01)
+            release.wait(0.1)
+            release.set()
+
+        self.assertListEqual([future.result() for future in futures], ['A'] * 4)
+        self.assertEqual(other.result(), 'B')
+        self.assertListEqual(sorted(calls), ['a', 'b'])
+
+        # once finished, the call is run again
+        self.assertEqual(flights.do('key', find, 'c'), 'C')
+        self.assertEqual(len(calls), 3)
+
+    def test_do_error(self):
+        """Test whether the error of a call is raised to all the callers"""
+
+        release = threading.Event()
+        calls = []
+
+        def find():
+            calls.append(1)
+            release.wait(5)
+            raise NotFoundError(cause='not found')
+
+        flights = SingleFlight()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(flights.do, 'key', find) for _ in range(3)]
+            while not calls:
+                release.wait(0.01)
+            release.wait(0.1)
+            release.set()
+
+        for future in futures:
+            self.assertIsInstance(future.exception(), NotFoundError)
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+from archimedes.spans import SPANS, Spans, timed
+
+
+class FakeClock:
+    """Clock advancing one second each time it is read"""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        self.now += 1
+        return self.now
+
+
+class TestSpans(unittest.TestCase):
+    """Spans tests"""
+
+    def setUp(self):
+        SPANS.reset()
+        self.tmp_path = tempfile.mkdtemp(prefix='archimedes_')
+
+    def tearDown(self):
+        SPANS.disable()
+        shutil.rmtree(self.tmp_path)
+
+    def test_disabled(self):
+        """Test whether nothing is measured until the spans are enabled"""
+
+        spans = Spans()
+
+        with spans.span('phase'):
+            pass
+
+        self.assertDictEqual(spans.to_dict()['phases'], {})
+
+    @unittest.mock.patch('archimedes.spans.time.perf_counter', new_callable=FakeClock)
+    def test_span(self, mock_clock):
+        """Test whether the time of nested phases is aggregated by name"""
+
+        spans = Spans()
+        spans.enable()
+
+        # clock: 1 at enable
+        with spans.span('resolve'):             # 2 -> 9
+            with spans.span('load_json'):       # 3 -> 4
+                pass
+            with spans.span('resolve'):         # 5 -> 8
+                with spans.span('load_json'):   # 6 -> 7
+                    pass
+
+        phases = spans.to_dict()['phases']
+
+        self.assertDictEqual(phases['load_json'], {'count': 2, 'total': 2, 'self': 2, 'max': 1})
+        self.assertDictEqual(phases['resolve'], {'count': 2, 'total': 7, 'self': 5, 'max': 7})
+
+    @unittest.mock.patch('archimedes.spans.time.perf_counter', new_callable=FakeClock)
+    def test_span_error(self, mock_clock):
+        """Test whether a phase is measured when it raises an exception"""
+
+        spans = Spans()
+        spans.enable()
+
+        with self.assertRaises(ValueError):
+            with spans.span('phase'):
+                raise ValueError
+
+        self.assertEqual(spans.to_dict()['phases']['phase']['count'], 1)
+
+        with spans.span('other'):
+            pass
+        self.assertEqual(spans.to_dict()['phases']['other']['self'], 1)
+
+    def test_timed(self):
+        """Test whether the calls of a decorated function are measured"""
+
+        @timed('func')
+        def func(value):
+            return value * 2
+
+        self.assertEqual(func(1), 2)
+        self.assertDictEqual(SPANS.to_dict()['phases'], {})
+
+        SPANS.enable()
+        self.assertEqual(func(2), 4)
+        self.assertEqual(func(3), 6)
+        self.assertEqual(SPANS.to_dict()['phases']['func']['count'], 2)
+
+    def test_write_report(self):
+        """Test whether the report is written as JSON"""
+
+        SPANS.enable()
+
+        with SPANS.span('phase'):
+            pass
+
+        report_path = os.path.join(self.tmp_path, 'report.json')
+        SPANS.write_report(report_path, extra={'requests': {}})
+
+        with open(report_path, 'r') as f:
+            report = json.loads(f.read())
+
+        self.assertIn('started_at', report)
+        self.assertGreater(report['wall_time'], 0)
+        self.assertDictEqual(report['requests'], {})
+        self.assertEqual(report['phases']['phase']['count'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
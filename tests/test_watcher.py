@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2020 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+
+import requests
+
+from archimedes.archimedes import Archimedes
+from archimedes.clients.common import (DASHBOARD,
+                                       INDEX_PATTERN,
+                                       VISUALIZATION)
+from archimedes.manager import Manager, VISUALIZATIONS_FOLDER
+from archimedes.watcher import (DependencyIndex,
+                                InotifyMonitor,
+                                PollingMonitor,
+                                Watcher)
+from benchmarks.fake_kibana import FakeKibana
+from generated_repo import GeneratedRepoTestCase
+from request_budget import RequestBudgetMixin
+
+KIBANA_URL = 'http://example.com/'
+
+PARAMS = {
+    'dashboards': 4,
+    'panels': 3,
+    'visualizations': 8,
+    'searches': 2,
+    'index_patterns': 2,
+    'fields': 3
+}
+
+
+def obj_path(manager, obj):
+    return os.path.join(manager.build_folder_path(obj['type']), manager.build_file_name(obj['type'], obj['id']))
+
+
+def edit_obj(manager, obj, title):
+    obj = dict(obj, attributes=dict(obj['attributes'], title=title))
+    manager.save_obj(obj, force=True)
+    return obj_path(manager, obj)
+
+
+class TestDependencyIndex(GeneratedRepoTestCase):
+    """DependencyIndex tests"""
+
+    GENERATOR_PARAMS = PARAMS
+
+    def affected_dashboards(self, path):
+        """Find the dashboards affected by a file resolving the closure of each dashboard"""
+
+        return {obj['id'] for obj in self.objs if obj['type'] == DASHBOARD and
+                path in self.manager.find_dashboard_files(obj_path(self.manager, obj))}
+
+    def test_find_dashboards(self):
+        """Test whether the dashboards affected by a change are found through the reverse dependencies"""
+
+        index = DependencyIndex(self.manager)
+        index.build(path for _, path in self.manager.find_files())
+        self.assertEqual(len(index.keys), len(self.objs))
+
+        for obj in self.objs:
+            path = obj_path(self.manager, obj)
+            self.assertSetEqual(index.find_dashboards([path]), self.affected_dashboards(path))
+
+    def test_update(self):
+        """Test whether the dependencies are updated when a file changes"""
+
+        index = DependencyIndex(self.manager)
+        index.build(path for _, path in self.manager.find_files())
+
+        dashboard = next(obj for obj in self.objs if obj['type'] == DASHBOARD)
+        dashboard_path = obj_path(self.manager, dashboard)
+        panel = self.manager.find_panels(dashboard)[0]
+        panel_path = os.path.join(self.manager.build_folder_path(panel['type']),
+                                  self.manager.build_file_name(panel['type'], panel['id']))
+        self.assertIn(dashboard['id'], index.find_dashboards([panel_path]))
+
+        # the dashboard shows no panels anymore
+        attributes = dict(dashboard['attributes'], panelsJSON='[]')
+        self.manager.save_obj(dict(dashboard, attributes=attributes), force=True)
+
+        objs = index.update(dashboard_path)
+        self.assertEqual(objs[0]['attributes']['panelsJSON'], '[]')
+        self.assertNotIn(dashboard['id'], index.find_dashboards([panel_path]))
+        self.assertSetEqual(index.dependencies[dashboard_path], set())
+
+        # invalid JSON keeps the previous version
+        with open(dashboard_path, 'w') as f:
+            f.write('{"id": ')
+
+        with self.assertLogs('archimedes.watcher', level='WARNING'):
+            self.assertIsNone(index.update(dashboard_path))
+        self.assertEqual(index.keys[dashboard_path], [(DASHBOARD, dashboard['id'])])
+
+        index.remove(dashboard_path)
+        self.assertNotIn(dashboard_path, index.keys)
+        self.assertNotIn(dashboard_path, index.dependencies)
+
+
+class TestWatcher(RequestBudgetMixin, GeneratedRepoTestCase):
+    """Watcher tests"""
+
+    GENERATOR_PARAMS = PARAMS
+
+    def test_initialization(self):
+        """Test whether attributes are initialized"""
+
+        archimedes = Archimedes(KIBANA_URL, self.tmp_path)
+        watcher = Watcher(archimedes)
+
+        self.assertEqual(watcher.archimedes, archimedes)
+        self.assertEqual(watcher.debounce, 0.5)
+        self.assertEqual(watcher.poll_interval, 1.0)
+        self.assertFalse(watcher.polling)
+        self.assertListEqual(watcher.folders, [self.tmp_path,
+                                               os.path.join(self.tmp_path, 'index-patterns'),
+                                               os.path.join(self.tmp_path, 'searches'),
+                                               os.path.join(self.tmp_path, 'visualizations')])
+
+    def test_process(self):
+        """Test whether only the objects changed are imported, with a single request"""
+
+        index_pattern = next(obj for obj in self.objs if obj['type'] == INDEX_PATTERN)
+        visualization = next(obj for obj in self.objs if obj['type'] == VISUALIZATION)
+        deleted = next(obj for obj in reversed(self.objs) if obj['type'] == VISUALIZATION)
+
+        with FakeKibana(self.objs) as fake:
+            archimedes = Archimedes(fake.url, self.tmp_path)
+            watcher = Watcher(archimedes)
+            watcher.index.build(path for _, path in archimedes.manager.find_files())
+
+            vis_path = edit_obj(self.manager, visualization, 'Changed visualization')
+            ip_path = edit_obj(self.manager, index_pattern, 'changed_ip')
+            deleted_path = obj_path(self.manager, deleted)
+            os.remove(deleted_path)
+
+            expected_dashboards = watcher.index.find_dashboards([vis_path, ip_path, deleted_path])
+
+            with self.assertMaxRequests(2, endpoints={'dashboards/import': 1}):
+                result = watcher.process({vis_path, ip_path, deleted_path})
+
+            self.assertListEqual(result['changed'], sorted([vis_path, ip_path]))
+            self.assertListEqual(result['deleted'], [deleted_path])
+            self.assertListEqual(result['dashboards'], sorted(expected_dashboards))
+            self.assertEqual(result['imported'], 2)
+            self.assertEqual(result['errors'], 0)
+            self.assertIsNone(result['error'])
+            self.assertListEqual(result['pending'], [])
+
+            stored = fake.objects[(VISUALIZATION, visualization['id'])]
+            self.assertEqual(stored['attributes']['title'], 'Changed visualization')
+
+    def test_process_error(self):
+        """Test whether the files not imported because of a request error are processed again"""
+
+        visualizations = [obj for obj in self.objs if obj['type'] == VISUALIZATION][:2]
+
+        with FakeKibana(self.objs) as fake:
+            archimedes = Archimedes(fake.url, self.tmp_path)
+            watcher = Watcher(archimedes)
+            import_objects = archimedes.kibana.import_objects
+
+            vis_path = edit_obj(self.manager, visualizations[0], 'Changed visualization')
+
+            with unittest.mock.patch.object(archimedes.kibana, 'import_objects',
+                                            side_effect=requests.exceptions.ConnectionError('Connection refused')):
+                with self.assertLogs('archimedes.watcher', level='ERROR') as cm:
+                    result = watcher.process({vis_path})
+
+            self.assertEqual(cm.output[0],
+                             'ERROR:archimedes.watcher:Objects of 1 changed file(s) not imported, '
+                             'they will be retried, Connection refused')
+            self.assertEqual(result['error'], 'Connection refused')
+            self.assertEqual(result['imported'], 0)
+            self.assertListEqual(result['pending'], [vis_path])
+            self.assertSetEqual(watcher.pending, {vis_path})
+
+            other_path = edit_obj(self.manager, visualizations[1], 'Other visualization')
+
+            with unittest.mock.patch.object(archimedes.kibana, 'import_objects', wraps=import_objects):
+                result = watcher.process({other_path})
+
+            self.assertIsNone(result['error'])
+            self.assertListEqual(result['changed'], sorted([vis_path, other_path]))
+            self.assertEqual(result['imported'], 2)
+            self.assertListEqual(result['pending'], [])
+
+            stored = fake.objects[(VISUALIZATION, visualizations[0]['id'])]
+            self.assertEqual(stored['attributes']['title'], 'Changed visualization')
+
+    def test_process_excluded(self):
+        """Test whether the files excluded by the manager are not imported"""
+
+        visualizations = [obj for obj in self.objs if obj['type'] == VISUALIZATION][:2]
+
+        with FakeKibana(self.objs) as fake:
+            exclude = ['visualizations/%s_%s*' % (VISUALIZATION, visualizations[0]['id'])]
+            archimedes = Archimedes(fake.url, self.tmp_path, exclude=exclude)
+            watcher = Watcher(archimedes)
+
+            excluded_path = edit_obj(self.manager, visualizations[0], 'Excluded')
+            vis_path = edit_obj(self.manager, visualizations[1], 'Changed')
+
+            with self.assertMaxRequests(2, endpoints={'dashboards/import': 1}):
+                result = watcher.process({excluded_path, vis_path})
+
+            self.assertListEqual(result['changed'], [vis_path])
+            self.assertEqual(result['imported'], 1)
+            self.assertNotEqual(fake.objects[(VISUALIZATION, visualizations[0]['id'])]['attributes']['title'], 'Excluded')
+
+    def test_run(self):
+        """Test whether the changes are debounced and imported in a batch"""
+
+        visualizations = [obj for obj in self.objs if obj['type'] == VISUALIZATION][:3]
+
+        with FakeKibana(self.objs) as fake:
+            archimedes = Archimedes(fake.url, self.tmp_path)
+            watcher = Watcher(archimedes, debounce=0.2, poll_interval=0.05, polling=True)
+
+            stop = threading.Event()
+            results = []
+
+            def watch():
+                for result in watcher.run(stop):
+                    results.append(result)
+
+            thread = threading.Thread(target=watch)
+            thread.start()
+            try:
+                time.sleep(0.2)
+                paths = []
+                for i, obj in enumerate(visualizations):
+                    paths.append(edit_obj(self.manager, obj, 'Title %s' % i))
+                    time.sleep(0.05)
+
+                deadline = time.time() + 5
+                while not results and time.time() < deadline:
+                    time.sleep(0.05)
+            finally:
+                stop.set()
+                thread.join()
+
+            self.assertEqual(len(results), 1)
+            self.assertListEqual(results[0]['changed'], sorted(paths))
+            self.assertEqual(results[0]['imported'], 3)
+            self.assertEqual(fake.requests['dashboards/import'], 1)
+
+
+class TestMonitors(unittest.TestCase):
+    """Monitors tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='archimedes_')
+        self.manager = Manager(self.tmp_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def write(self, path, content):
+        with open(path, 'w') as f:
+            json.dump(content, f)
+
+    def check_monitor(self, monitor):
+        dashboard_path = os.path.join(self.tmp_path, 'dashboard_1.json')
+        vis_folder = os.path.join(self.tmp_path, VISUALIZATIONS_FOLDER)
+        vis_path = os.path.join(vis_folder, 'visualization_1.json')
+
+        self.assertSetEqual(monitor.wait(0.05), set())
+
+        self.write(dashboard_path, {'id': '1'})
+        self.write(os.path.join(self.tmp_path, 'notes.json'), {})
+        self.assertSetEqual(monitor.wait(0.1), {dashboard_path})
+
+        # folders created after the monitor are watched too
+        os.makedirs(vis_folder)
+        self.write(vis_path, {'id': '1'})
+        changed = monitor.wait(0.1) | monitor.wait(0.1)
+        self.assertSetEqual(changed, {vis_path})
+
+        os.remove(dashboard_path)
+        self.assertSetEqual(monitor.wait(0.1), {dashboard_path})
+
+        monitor.close()
+
+    def test_polling(self):
+        """Test whether the changes are detected by polling"""
+
+        self.check_monitor(PollingMonitor(self.manager))
+
+    def test_inotify(self):
+        """Test whether the changes are notified by inotify"""
+
+        try:
+            monitor = InotifyMonitor(self.manager)
+        except OSError:
+            self.skipTest("inotify not available")
+
+        self.check_monitor(monitor)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
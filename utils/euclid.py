@@ -21,8 +21,11 @@
 
 import argparse
 import json
+import sys
 
 from archimedes.archimedes import Archimedes, logger
+from archimedes.clients.common import MAX_PAYLOAD_BYTES
+from archimedes.profiler import Profiler, PROFILE_FORMATS, PSTATS
 
 
 DASHBOARD_TITLE2ID = {
@@ -169,6 +172,12 @@ def get_params():
     parser.add_argument('--import', dest='import_', action='store_true')
     parser.add_argument('--export', dest='export_', action='store_true')
     parser.add_argument('--all', action='store_true')
+    parser.add_argument('--max-payload-bytes', dest='max_payload_bytes', type=int, default=MAX_PAYLOAD_BYTES,
+                        help='Maximum size in bytes of each import request')
+    parser.add_argument('--profile', dest='profile', default=None,
+                        help='Profile the run and save the profile to this file')
+    parser.add_argument('--profile-format', dest='profile_format', choices=PROFILE_FORMATS, default=PSTATS,
+                        help='Save the profile as cProfile stats or as sampled collapsed stacks')
 
     args = parser.parse_args()
 
@@ -199,7 +208,18 @@ def main():
         print("One action is needed: select --import or --export")
         return
 
-    archimedes = Archimedes(args.url, args.root_path)
+    if not args.profile:
+        run(args)
+        return
+
+    with Profiler(args.profile, fmt=args.profile_format):
+        run(args)
+
+
+def run(args):
+    """Import or export the dashboards as set in `args`"""
+
+    archimedes = Archimedes(args.url, args.root_path, max_payload_bytes=args.max_payload_bytes)
     search_by = args.search_by
 
     if not args.all:
@@ -216,8 +236,11 @@ def main():
             export_batch(archimedes, dashboards, by=search_by, force=True)
     else:
         if args.import_:
-            for obj in archimedes.inspect(local=True):
-                archimedes.import_from_disk(obj.type, obj.id, obj.title)
+            report = archimedes.import_all()
+            for obj in report.errors:
+                logger.error("Impossible to import %s %s" % (obj['type'], obj['id']))
+            if report.errors:
+                sys.exit(1)
         if args.export_:
             for obj in archimedes.inspect(remote=True):
                 archimedes.export_to_disk(obj.type, obj.id, obj.title)
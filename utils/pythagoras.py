@@ -25,8 +25,10 @@ import requests
 import yaml
 
 from archimedes.archimedes import Archimedes, logger
-from archimedes.clients.dashboard import DASHBOARD
+from archimedes.clients.common import DASHBOARD
 from archimedes.clients.saved_objects import SavedObjects
+from archimedes.inventory import Inventory, INVENTORY_TTL
+from archimedes.profiler import Profiler, PROFILE_FORMATS, PSTATS
 from grimoirelab_toolkit.uris import urijoin
 
 
@@ -52,6 +54,14 @@ def get_params():
     parser.add_argument('--set-project-name', dest='set_project_name', action='store_true', help='Set project name')
     parser.add_argument('--set-config', dest='set_config', action='store_true', help='Set the Kibiter conf')
     parser.add_argument('--overwrite', dest='overwrite', action='store_true', help='Overwrite existing Kibana obj')
+    parser.add_argument('--profile', dest='profile', default=None,
+                        help='Profile the run and save the profile to this file')
+    parser.add_argument('--profile-format', dest='profile_format', choices=PROFILE_FORMATS, default=PSTATS,
+                        help='Save the profile as cProfile stats or as sampled collapsed stacks')
+    parser.add_argument('--inventory-cache', dest='inventory_cache', default=None,
+                        help='Cache the objects stored in Kibana in this folder')
+    parser.add_argument('--inventory-ttl', dest='inventory_ttl', type=float, default=INVENTORY_TTL,
+                        help='Seconds the cached objects are used before validating them')
 
     args = parser.parse_args()
 
@@ -169,7 +179,8 @@ def create_metadashboard_entry(panel_id, entry_title, menu_attr, descr):
     return entry
 
 
-def upload_dashboards(kibiter_url, archimedes_path, menu_yaml, import_dashboards=False, overwrite=False):
+def upload_dashboards(kibiter_url, archimedes_path, menu_yaml, import_dashboards=False, overwrite=False,
+                      inventory=None):
     """Upload the dashboards to a target Kibana instance.
 
     :param kibiter_url: Kibiter URL
@@ -177,11 +188,12 @@ def upload_dashboards(kibiter_url, archimedes_path, menu_yaml, import_dashboards
     :param menu_yaml: YAML containing the structure of the top menu
     :param import_dashboards: If True, import the dashboards defined in `menu_yaml`
     :param overwrite: If True, force the overwrite of existing dashboards
+    :param inventory: Inventory object caching the objects stored in Kibana
 
     :returns a dict including the project name and the metadashboard info (the list of dashboards in the menu_yaml)
     """
     menu = load_yaml(menu_yaml)
-    archimedes = Archimedes(kibiter_url, archimedes_path)
+    archimedes = Archimedes(kibiter_url, archimedes_path, inventory=inventory)
 
     project_name = menu['project']
     top_menu = []
@@ -277,8 +289,24 @@ def main():
     ```
     """
     args = get_params()
+
+    if not args.profile:
+        run(args)
+        return
+
+    with Profiler(args.profile, fmt=args.profile_format):
+        run(args)
+
+
+def run(args):
+    """Import the dashboards and set the Kibiter endpoints as set in `args`"""
+
+    inventory = None
+    if args.inventory_cache:
+        inventory = Inventory(args.inventory_cache, args.kibiter_url, ttl=args.inventory_ttl)
+
     menu_json = upload_dashboards(args.kibiter_url, args.archimedes_root_path, args.top_menu_path,
-                                  args.import_dashboards, args.overwrite)
+                                  args.import_dashboards, args.overwrite, inventory=inventory)
 
     if args.set_top_menu:
         metadashboard = menu_json['metadashboard']